@@ -0,0 +1,169 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from os import getenv
+from instrumentation import logger, shed_requests, span
+
+# What a user is told when their request is not run, by reason
+REJECTION_MESSAGES = {
+    "queue_full": "The assistant is at capacity right now. Please try again in a minute.",
+    "user_limit": "You already have several questions in progress. Please wait for them to finish.",
+    "queue_timeout": "The assistant is still busy, so your question was not started. Please try again shortly.",
+}
+
+
+class AdmissionRejected(Exception):
+    """A chat request was not admitted; `reason` is the label of the shed metric."""
+
+    def __init__(self, reason: str):
+        super().__init__(REJECTION_MESSAGES[reason])
+        self.reason = reason
+
+
+class _Ticket:
+    __slots__ = ("user", "granted", "changed")
+
+    def __init__(self, user: str):
+        self.user = user
+        self.granted = False
+        self.changed = asyncio.Event()  # Set when the ticket is granted or its position may have moved
+
+
+class AdmissionController:
+    """
+    Admission control for the chat runs of one worker.
+
+    At most `max_running` runs execute at once, and at most `max_per_user` of
+    them for the same user. A request over either limit waits in a FIFO queue
+    of at most `max_queue` entries, where each user may have at most
+    `max_per_user` requests. A waiting request starts as soon as a slot is
+    free for its user, so the queued requests of a busy user do not hold up
+    other users. Requests that find the queue full, or wait longer than
+    `queue_timeout` seconds, are rejected with AdmissionRejected.
+    """
+
+    def __init__(self, max_running: int = 16, max_per_user: int = 2, max_queue: int = 32,
+                 queue_timeout: float = 60.0):
+        self.max_running = max_running
+        self.max_per_user = max_per_user
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.running = 0
+        self._running_by_user = {}
+        self._queue = deque()
+        # Counters
+        self.admitted = 0
+        self.queued = 0
+        self.shed = 0
+
+    def _can_run(self, user: str) -> bool:
+        return self.running < self.max_running and self._running_by_user.get(user, 0) < self.max_per_user
+
+    def _start(self, user: str):
+        self.running += 1
+        self._running_by_user[user] = self._running_by_user.get(user, 0) + 1
+        self.admitted += 1
+
+    def _release(self, user: str):
+        self.running -= 1
+        if self._running_by_user[user] <= 1:
+            del self._running_by_user[user]
+        else:
+            self._running_by_user[user] -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        """Start the queued requests that can run now and tell the others their position moved."""
+        for ticket in list(self._queue):
+            if self._can_run(ticket.user):
+                self._queue.remove(ticket)
+                self._start(ticket.user)
+                ticket.granted = True
+            ticket.changed.set()
+
+    def _reject(self, reason: str, user: str):
+        self.shed += 1
+        shed_requests.inc(reason=reason)
+        logger.info("Rejected a request from %s: %s", user, reason)
+        raise AdmissionRejected(reason)
+
+    def position(self, ticket: _Ticket) -> int:
+        """1-based position of a waiting request in the queue."""
+        return self._queue.index(ticket) + 1
+
+    async def _acquire(self, user: str, on_queued):
+        if self._can_run(user):
+            self._start(user)
+            return
+        if len(self._queue) >= self.max_queue:
+            self._reject("queue_full", user)
+        if sum(ticket.user == user for ticket in self._queue) >= self.max_per_user:
+            self._reject("user_limit", user)
+
+        ticket = _Ticket(user)
+        self._queue.append(ticket)
+        self.queued += 1
+        deadline = time.monotonic() + self.queue_timeout
+        shown = None
+        try:
+            with span("admission_queue"):
+                while not ticket.granted:
+                    ticket.changed.clear()
+                    if on_queued is not None and self.position(ticket) != shown:
+                        shown = self.position(ticket)
+                        await on_queued(shown)
+                        if ticket.granted:
+                            break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._queue.remove(ticket)
+                        self._dispatch()
+                        self._reject("queue_timeout", user)
+                    try:
+                        await asyncio.wait_for(ticket.changed.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        pass
+        except BaseException:
+            # Timed out, or the user stopped the request or left while it was waiting
+            if ticket.granted:
+                self._release(user)
+            elif ticket in self._queue:
+                self._queue.remove(ticket)
+                self._dispatch()
+            raise
+
+    @asynccontextmanager
+    async def admit(self, user: str, on_queued=None):
+        """
+        Hold a run slot for `user` while the block runs, waiting in the queue if needed.
+
+        `on_queued(position)` is awaited when the request is queued and whenever
+        its position changes. Raises AdmissionRejected if it cannot be admitted.
+        """
+        await self._acquire(user, on_queued)
+        try:
+            yield
+        finally:
+            self._release(user)
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "queue_depth": len(self._queue),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "shed": self.shed,
+        }
+
+
+def create_admission() -> AdmissionController | None:
+    """Admission controller configured by the ADMISSION_* settings, or None if disabled."""
+    if getenv("ADMISSION_ENABLED", "true").lower() != "true":
+        return None
+    return AdmissionController(
+        max_running=int(getenv("ADMISSION_MAX_RUNNING", "16")),
+        max_per_user=int(getenv("ADMISSION_MAX_PER_USER", "2")),
+        max_queue=int(getenv("ADMISSION_MAX_QUEUE", "32")),
+        queue_timeout=float(getenv("ADMISSION_QUEUE_TIMEOUT", "60")),
+    )
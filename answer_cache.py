@@ -0,0 +1,260 @@
+import asyncio
+import json
+import math
+import re
+import time
+from collections import Counter, OrderedDict
+from tool_cache import CACHEABLE_TOOLS, ToolResultCache, poll_scope
+
+# Words that do not change what a question asks for
+FILLER_WORDS = {
+    "please", "can", "could", "would", "you", "me", "us", "show", "tell", "list", "give", "get",
+    "what", "which", "are", "is", "the", "a", "an", "of", "all", "my", "our", "there", "any", "currently", "now",
+}
+
+# Questions that refer to earlier turns cannot be answered from another conversation
+FOLLOW_UP_PATTERN = re.compile(
+    r"^\s*(and|also|what about|how about|same|now)\b|\b(those|these|them|it|that one|previous|above)\b",
+    re.IGNORECASE,
+)
+
+# Filters that pick the devices or entities an answer is about. The question must name their values,
+# otherwise the model took them from earlier turns and the answer does not fit the question alone.
+SCOPE_FILTERS = {"namespace", "hostname", "vrf", "ifname", "peer", "peerHostname", "prefix", "address",
+                 "macaddr", "vlan", "vni", "oifs", "area"}
+
+NAMESPACE_PATTERN = re.compile(
+    r"\b(?:namespace|ns)\s*[:=]?\s*([\w.-]+)|\bin\s+([a-z0-9]+(?:[-_.][a-z0-9]+)+)\b",
+    re.IGNORECASE,
+)
+
+
+def normalize_question(text: str) -> str:
+    """Lowercase, drop punctuation and filler words, and singularize plain plurals."""
+    words = re.findall(r"[\w.:/-]+", text.lower())
+    normalized = []
+    for word in words:
+        word = word.strip(".:-")
+        if not word or word in FILLER_WORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        normalized.append(word)
+    return " ".join(normalized)
+
+
+def extract_namespace(text: str) -> str:
+    """Namespace named in the question ("namespace eos", "in suzieq-demo"), or ""."""
+    match = NAMESPACE_PATTERN.search(text)
+    if not match:
+        return ""
+    return (match.group(1) or match.group(2)).lower()
+
+
+def is_follow_up(text: str) -> bool:
+    return bool(FOLLOW_UP_PATTERN.search(text))
+
+
+def unstated_filters(text: str, arguments: dict) -> list:
+    """Scope filters of a tool call whose values the question does not name."""
+    filters = arguments.get("filters")
+    filters = {**arguments, **(filters if isinstance(filters, dict) else {})}
+    words = {word.strip(".:-") for word in re.findall(r"[\w.:/-]+", text.lower())}
+    missing = []
+    for name in SCOPE_FILTERS & set(filters):
+        values = filters[name] if isinstance(filters[name], list) else [filters[name]]
+        for value in values:
+            value = str(value).strip().strip("'\"").lower()
+            if value and value not in words and not (" " in value and value in text.lower()):
+                missing.append(name)
+                break
+    return missing
+
+
+def trigram_vector(text: str) -> dict:
+    """Character trigram counts of `text`, normalized to unit length."""
+    padded = f"  {text} "
+    counts = Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+    norm = math.sqrt(sum(v * v for v in counts.values())) or 1.0
+    return {gram: count / norm for gram, count in counts.items()}
+
+
+def cosine(a, b) -> float:
+    if isinstance(a, dict):
+        return sum(value * b.get(key, 0.0) for key, value in a.items())
+    return float(sum(x * y for x, y in zip(a, b)))
+
+
+class _Answer:
+    __slots__ = ("key", "answer", "tool_calls", "poll_ts", "created", "expires_at", "vector")
+
+    def __init__(self, key, answer, tool_calls, poll_ts, created, expires_at, vector):
+        self.key = key
+        self.answer = answer
+        self.tool_calls = tool_calls
+        self.poll_ts = poll_ts
+        self.created = created
+        self.expires_at = expires_at
+        self.vector = vector
+
+
+class AnswerCache:
+    """
+    Final answers to repeated questions, so they can be served without the LLM.
+
+    Entries are keyed on the normalized question and its namespace, and keep
+    the SuzieQ tool calls the answer was built from. An entry is valid until
+    the shortest TTL of the tables it used (capped at `ttl`) has passed, or
+    until the tool result cache has seen a newer poll timestamp for the scope
+    (table, namespace and hostname) of one of those calls. With `similarity` above 0, a question can also match a
+    cached one in the same namespace whose vector has at least that cosine
+    similarity. Vectors are character trigrams, or sentence embeddings when
+    `embedding_model` names a sentence-transformers model.
+
+    With a `shared` store, answers are also written there, and questions with no
+    exact local match are looked up there, so any worker can serve them.
+    """
+
+    def __init__(self, tool_cache: ToolResultCache, max_entries: int = 512, ttl: float = 120.0,
+                 similarity: float = 0.0, embedding_model: str = "", shared=None):
+        self.tool_cache = tool_cache
+        self.shared = shared
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self.embedding_model = embedding_model
+        self._encoder = None
+        self._entries = OrderedDict()  # (namespace, normalized question) -> _Answer
+        # Counters
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+        self.stale = 0
+        self.stores = 0
+        self.skipped = 0
+
+    async def _vector(self, text: str):
+        if not self.embedding_model:
+            return trigram_vector(text)
+        if self._encoder is None:
+            # Optional dependency, only needed for embedding similarity
+            from sentence_transformers import SentenceTransformer
+            self._encoder = await asyncio.to_thread(SentenceTransformer, self.embedding_model)
+        vector = await asyncio.to_thread(self._encoder.encode, text, normalize_embeddings=True)
+        return vector.tolist()
+
+    def _valid(self, entry: _Answer) -> bool:
+        if entry.expires_at <= time.monotonic():
+            return False
+        for scope, poll_ts in entry.poll_ts.items():
+            latest = self.tool_cache.latest_poll(scope)
+            if latest is not None and (poll_ts is None or latest > poll_ts):
+                return False
+        return True
+
+    async def lookup(self, question: str) -> dict | None:
+        """Cached answer for `question` as {"answer", "tool_calls", "age", "matched"}, or None."""
+        if is_follow_up(question):
+            self.skipped += 1
+            return None
+        key = (extract_namespace(question), normalize_question(question))
+        entry = self._entries.get(key)
+        matched = "exact"
+        if entry is None and self.shared is not None:
+            entry = await self._from_shared(key)
+            if entry is not None:
+                matched = "shared"
+        if entry is None and self.similarity > 0:
+            vector = await self._vector(key[1])
+            best, best_score = None, self.similarity
+            for (namespace, _), candidate in self._entries.items():
+                if namespace != key[0] or candidate.vector is None:
+                    continue
+                score = cosine(vector, candidate.vector)
+                if score >= best_score:
+                    best, best_score = candidate, score
+            entry, matched = best, f"similar ({best_score:.2f})"
+        if entry is None:
+            self.misses += 1
+            return None
+        if not self._valid(entry):
+            self.stale += 1
+            self._entries.pop(entry.key, None)
+            return None
+        self._entries.move_to_end(entry.key)
+        if matched == "exact":
+            self.hits += 1
+        elif matched == "shared":
+            self.shared_hits += 1
+        else:
+            self.similar_hits += 1
+        return {"answer": entry.answer, "tool_calls": entry.tool_calls,
+                "age": time.monotonic() - entry.created, "matched": matched}
+
+    async def store(self, question: str, answer: str, tool_calls: list) -> bool:
+        """
+        Cache the final answer of a turn. Only answers built from cacheable SuzieQ
+        queries (no time windows) to questions that do not refer to earlier turns
+        are stored. Queries scoped with values the question does not name (a
+        hostname from an earlier turn, say) count as referring to earlier turns.
+        """
+        tables, scopes = set(), set()
+        for call in tool_calls:
+            if call["name"] not in CACHEABLE_TOOLS:
+                continue
+            arguments = call.get("args", {})
+            if ToolResultCache.make_key(call["name"], arguments) is None or unstated_filters(question, arguments):
+                self.skipped += 1
+                return False
+            tables.add(arguments.get("table", ""))
+            scopes.add(poll_scope(arguments.get("table", ""), arguments))
+        if not answer or not tables or is_follow_up(question):
+            self.skipped += 1
+            return False
+        poll_ts = {scope: self.tool_cache.latest_poll(scope) for scope in scopes}
+        ttl = min([self.ttl] + [self.tool_cache.ttl_for(table) for table in tables])
+        normalized = normalize_question(question)
+        key = (extract_namespace(question), normalized)
+        vector = await self._vector(normalized) if self.similarity > 0 else None
+        now = time.monotonic()
+        self._entries[key] = _Answer(key, answer, tool_calls, poll_ts, now, now + ttl, vector)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        self.stores += 1
+        if self.shared is not None:
+            value = {"answer": answer, "tool_calls": tool_calls, "tables": sorted(tables), "poll_ts": poll_ts,
+                     "created": time.time()}
+            await self.shared.put("answer", json.dumps(key), json.dumps(value, default=str), ttl)
+        return True
+
+    async def _from_shared(self, key: tuple) -> _Answer | None:
+        """Answer another worker stored for `key`, added to this worker's entries."""
+        stored = await self.shared.get("answer", json.dumps(key))
+        if stored is None:
+            return None
+        value = json.loads(stored)
+        tables = value.get("tables", [])
+        ttl = min([self.ttl] + [self.tool_cache.ttl_for(table) for table in tables])
+        age = max(0.0, time.time() - value["created"])
+        now = time.monotonic()
+        vector = await self._vector(key[1]) if self.similarity > 0 else None
+        entry = _Answer(key, value["answer"], value["tool_calls"], value["poll_ts"], now - age,
+                        now - age + ttl, vector)
+        self._entries[key] = entry
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "similar_hits": self.similar_hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "stores": self.stores,
+            "skipped": self.skipped,
+        }
@@ -1,19 +1,29 @@
 #from langchain_ollama import ChatOllama
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import SystemMessage, AIMessage, ToolMessage
+from langchain_core.messages import SystemMessage, AIMessage, HumanMessage, ToolMessage
 from langgraph.graph.message import add_messages
 from langgraph.graph import MessagesState, START, END, StateGraph
-from langgraph.prebuilt import ToolNode
-from langgraph.checkpoint.memory import MemorySaver
 from typing import Dict, Annotated, TypedDict
+import asyncio
+import time
 import uuid
 from langchain.callbacks.tracers.langchain import wait_for_all_tracers
 from os import getenv
 from dotenv import load_dotenv
-# Import tools and shutdown logic from client.py
-from client import tools as mcp_tools # Renamed to avoid conflict
+# MCP tools are loaded lazily by get_graph()
+from client import get_tools
 # Import the new local tool
-from utils import humanize_timestamp_tool
+from utils import humanize_timestamp_tool, humanize_timestamps_tool
+from shaping import get_result_page
+from checkpointer import create_checkpointer, DurableCheckpointer
+from compaction import compact_messages
+from prompts import PROMPT_CACHE_ENABLED, SYSTEM_MESSAGE, add_examples, layout_prompt
+from tool_executor import ParallelToolNode
+from router import make_router, route_after_router
+from startup import startup_phase, startup_timings
+from tiering import (LARGE_MODEL, SMALL_MODEL, TIER_ESCALATE_ON_LOW_CONFIDENCE, TIERING_ENABLED, choose_tier,
+                     low_confidence, message_text)
+from instrumentation import llm_calls, logger, record_llm_usage, run_limits, span
 
 # Load environment variables from .env file
 load_dotenv()
@@ -30,221 +40,147 @@ load_dotenv()
     max_tokens_per_chunk=50
 ) """
 
-llm = ChatOpenAI(
-  openai_api_key=getenv("OPENROUTER_API_KEY"),
-  openai_api_base=getenv("OPENROUTER_BASE_URL"),
-  model_name="anthropic/claude-3.7-sonnet",
-  temperature=0.0,
-  top_p=0.9,
-  frequency_penalty=0.0,
-  presence_penalty=0.0,
-  extra_body={
-      #"usage": {"include": True},
-      "data_collection": "deny",
-      "provider": {
-          "order": ["Amazon Bedrock", "Azure"],
-          "sort": "latency"
-      },
-      "models": ["anthropic/claude-3.5-sonnet", "openai/gpt-4o"]
-      }
-)
-
-system_template = """You are a Network Observability Assistant that uses SuzieQ tools to answer network state queries precisely.
-
-THOUGHT PROCESS:
-1. Understand the user's query and the specific network information needed.
-2. Identify the appropriate SuzieQ table (e.g., device, interface, bgp, routes, ospf, mac, lldp, evpnVni, route, mlag, vlan, fs).
-3. Choose the correct tool: 'run_suzieq_show' for detailed data or 'run_suzieq_summarize' for aggregated views.
-4. Determine necessary filters (hostname, vrf, state, namespace, status, vendor, mtu, adminState, portmode, vlan, asn, bfdStatus, afiSafi, area, helloTime, networkType, moveCount, ifname, vni, prefix, protocol, numNexthops, prefixlen, start_time, end_time, view, type, version, usedPercent, etc.) to narrow down the results.
-5. Construct the tool call with the 'table' and optional 'filters' arguments.
-6. Analyze the JSON response and formulate a clear answer for the user.
-7. If the results contain timestamp fields (usually in milliseconds since epoch), use the 'humanize_timestamp_tool' to convert them to readable dates for better comprehension.
-
-AVAILABLE TOOLS:
-
-1.  **run_suzieq_show**: Retrieves detailed information from a specific SuzieQ table.
-    *   `table` (String, Required): The SuzieQ table name (e.g., "device", "interface", "bgp", "ospf", "mac", "lldp", "evpnVni", "route", "mlag", "vlan", "fs").
-    *   `filters` (Dictionary, Optional): Key-value pairs for filtering (e.g., { "hostname": "leaf01", "state": "up" }). Supports comparison operators (e.g., { "mtu": "> 9000" }, { "state": "!Established" }). Supports time-based filters (e.g., { "start_time": "2 hours ago", "end_time": "now", "view": "changes" }). Omit or use {} for no filters.
-    *   Returns: JSON string with detailed results.
-
-2.  **run_suzieq_summarize**: Provides a summarized overview of data in a SuzieQ table.
-    *   `table` (String, Required): The SuzieQ table name to summarize (e.g., "device", "interface", "bgp", "ospf", "route", "vlan").
-    *   `filters` (Dictionary, Optional): Key-value pairs for filtering (e.g., { "hostname": "leaf01", "namespace": "dual-bgp" }). Omit or use {} for no filters.
-    *   Returns: JSON string with summarized results.
-
-3.  **humanize_timestamp_tool**: Converts a UNIX epoch timestamp (in milliseconds) to a human-readable datetime string.
-    *   `timestamp_ms` (Integer, Required): The UNIX epoch timestamp in milliseconds (e.g., 1678886400000).
-    *   `tz` (String, Optional): The target timezone (e.g., 'America/New_York', 'Europe/London'). Defaults to 'UTC'.
-    *   Returns: A string representing the human-readable datetime in the specified timezone (e.g., "2023-03-15 12:00:00 UTC").
-
-# Refined SuzieQ Query Examples (Production Tested)
-
-## Basic Device and Status Queries
-### Device Information
-
-*   Show all devices in namespace 'suzieq-demo':
-    `{ "table": "device", "filters": { "namespace": "suzieq-demo" } }` (using run_suzieq_show)
-*   Show devices with status 'alive':
-    `{ "table": "device", "filters": { "status": "alive" } }` (using run_suzieq_show)
-*   Show Arista devices:
-    `{ "table": "device", "filters": { "vendor": "Arista" } }` (using run_suzieq_show)
-
-### Device Uptime Queries
-
-*   Show uptime for all devices:
-    `{ "table": "device", "filters": { "columns": ["namespace", "hostname", "bootupTimestamp", "status"] } }` (using run_suzieq_show)
-*   Show basic uptime information:
-    `{ "table": "device", "filters": { "columns": ["hostname", "bootupTimestamp", "status"] } }` (using run_suzieq_show)
-*   Show alive devices with their uptime:
-    `{ "table": "device", "filters": { "status": "alive", "columns": ["namespace", "hostname", "bootupTimestamp"] } }` (using run_suzieq_show)
-*   Show devices in a specific namespace with uptime:
-    `{ "table": "device", "filters": { "namespace": "suzieq-demo", "columns": ["hostname", "bootupTimestamp", "status"] } }` (using run_suzieq_show)
-*   Show alive devices in a specific namespace:
-    `{ "table": "device", "filters": { "namespace": "suzieq-demo", "status": "alive", "columns": ["hostname", "bootupTimestamp"] } }` (using run_suzieq_show)
-*   Show uptime for devices from a specific vendor:
-    `{ "table": "device", "filters": { "vendor": "Arista", "columns": ["namespace", "hostname", "bootupTimestamp", "status"] } }` (using run_suzieq_show)
-*   Show uptime for specific model devices:
-    `{ "table": "device", "filters": { "model": "cEOSLab", "columns": ["namespace", "hostname", "bootupTimestamp", "status"] } }` (using run_suzieq_show)
-
-### Interface Analysis
-
-*   Show interfaces with MTU greater than 9000:
-    `{ "table": "interface", "filters": { "mtu": "> 9000" } }` (using run_suzieq_show)
-*   Show 'down' interfaces:
-    `{ "table": "interface", "filters": { "state": "down" } }` (using run_suzieq_show)
-*   Show ethernet interfaces:
-    `{ "table": "interface", "filters": { "type": "ethernet" } }` (using run_suzieq_show)
-
-## Routing Protocol Analysis
-### BGP Analysis
-
-*   Show BGP sessions in 'NotEstd' state:
-    `{ "table": "bgp", "filters": { "state": "NotEstd" } }` (using run_suzieq_show)
-*   Show BGP sessions in VRF 'default':
-    `{ "table": "bgp", "filters": { "vrf": "default" } }` (using run_suzieq_show)
-*   Show BGP sessions for ASN 65001:
-    `{ "table": "bgp", "filters": { "asn": "65001" } }` (using run_suzieq_show)
-*   Summarize BGP sessions:
-    `{ "table": "bgp" }` (using run_suzieq_summarize)
-
-## Routing Table Analysis
-
-*   Show routes for prefix '10.10.10.1/32':
-    `{ "table": "route", "filters": { "prefix": "10.10.10.1/32" } }` (using run_suzieq_show)
-*   Show routes learned via 'ibgp':
-    `{ "table": "route", "filters": { "protocol": "ibgp" } }` (using run_suzieq_show)
-*   Show routes for VRF 'default':
-    `{ "table": "route", "filters": { "vrf": "default" } }` (using run_suzieq_show)
-*   Show routes with prefix length greater than 24:
-    `{ "table": "route", "filters": { "prefixlen": "> 24" } }` (using run_suzieq_show)
-
-## High-Level Network Status Summaries
-
-*   Summarize BGP sessions:
-    `{ "table": "bgp" }` (using run_suzieq_summarize)
-*   Summarize interface states across the network:
-    `{ "table": "interface" }` (using run_suzieq_summarize)
-*   Summarize route distribution:
-    `{ "table": "route" }` (using run_suzieq_summarize)
-
-## Working with Timestamps from SuzieQ Output
-
-### Converting Timestamps to Human Readable Format
-SuzieQ output often contains Unix epoch timestamps in milliseconds. Use humanize_timestamp_tool to convert these for improved readability.
-
-*   Convert a timestamp from a device's 'lastBoot' field:
-    `timestamp_ms: 1678886400000` (using humanize_timestamp_tool)
-    Result: "2023-03-15 12:00:00 UTC"
-
-*   Convert a timestamp to local timezone (Eastern Time):
-    `timestamp_ms: 1678886400000, tz: "America/New_York"` (using humanize_timestamp_tool)
-    Result: "2023-03-15 08:00:00 EDT" (or EST depending on DST)
-
-### Common Timestamp Fields in SuzieQ Tables
-Look for these common timestamp fields in SuzieQ output for potential conversion:
-* device table: "bootupTimestamp", "pollTimestamp", "lastBoot"
-* interface table: "timestamp", "lastChange"
-* bgp table: "estdTime", "timestamp"
-* ospf table: "timestamp", "lastChangeTime"
-* route table: "timestamp"
-
-### Workflow for Processing Timestamps
-1. First retrieve data using run_suzieq_show or run_suzieq_summarize
-2. Identify timestamp fields in milliseconds (usually large 13-digit numbers)
-3. Use humanize_timestamp_tool on each timestamp to convert to readable format
-4. Include both original timestamp and converted value in the response for clarity
-
-Example flow:
-```
-# First get device information
-{ "table": "device", "filters": { "hostname": "leaf01" } } (using run_suzieq_show)
-
-# Then convert any timestamp fields found in the response
-timestamp_ms: 1678886400000 (using humanize_timestamp_tool)
-```
-
-## Multi-Parameter Complex Queries
-
-*   Show BGP sessions in VRF 'default' and namespace 'suzieq-demo':
-    `{ "table": "bgp", "filters": { "vrf": "default", "namespace": "suzieq-demo" } }` (using run_suzieq_show)
-*   Show ethernet interfaces in namespace 'suzieq-demo':
-    `{ "table": "interface", "filters": { "type": "ethernet", "namespace": "suzieq-demo" } }` (using run_suzieq_show)
-*   Show routes with next-hop through interface 'Ethernet1':
-    `{ "table": "route", "filters": { "oifs": "Ethernet1" } }` (using run_suzieq_show)
-
-QUERY GUIDELINES:
-*   Be specific about the table you want to query (e.g., device, interface, bgp, ospf, mac, lldp, evpnVni, route, mlag, vlan, fs).
-*   Use filters to request data only for relevant devices, VRFs, states, interfaces, protocols, etc. Understand filter keys and potential values/operators.
-*   Use `run_suzieq_summarize` for overviews, counts, and aggregated status.
-*   Use `run_suzieq_show` for detailed attribute information, specific entries, or time-based analysis.
-
-RESPONSE FORMAT:
-1. Directly answer the user's query using the information retrieved from the tools.
-2. Present the data clearly, often referencing the source table and filters used.
-3. If applicable, suggest relevant follow-up questions based on the results.
-
-Remember:
-*   Only use the provided tools (`run_suzieq_show`, `run_suzieq_summarize`).
-*   Ensure the 'table' parameter is always provided.
-*   Format filters correctly as a dictionary if used. Pay attention to data types and operators (e.g., ">", "!=").
-"""
-
-system_content = [
-    {
-        "type": "text",
-        "text": system_template,
-        "cache_control": {"type": "ephemeral"}
-    }
-]
+# OpenRouter fallbacks of each tier's model, tried when it is unavailable
+MODEL_FALLBACKS = {
+    "large": ["anthropic/claude-3.5-sonnet", "openai/gpt-4o"],
+    "small": ["openai/gpt-4o-mini"],
+}
+# The small model can also be served elsewhere, e.g. by Ollama's OpenAI-compatible API
+# (http://localhost:11434/v1); OpenRouter routing options are then not sent
+SMALL_MODEL_BASE_URL = getenv("SMALL_MODEL_BASE_URL", "")
+SMALL_MODEL_API_KEY = getenv("SMALL_MODEL_API_KEY", "")
+
+def create_llm(tier: str = "large"):
+  """Chat model of one tier of the assistant node (created when the graph is built)."""
+  if tier == "small" and SMALL_MODEL_BASE_URL:
+    return ChatOpenAI(
+      openai_api_key=SMALL_MODEL_API_KEY or "none",
+      openai_api_base=SMALL_MODEL_BASE_URL,
+      model_name=SMALL_MODEL,
+      temperature=0.0,
+      top_p=0.9,
+      stream_usage=True,
+    )
+  return ChatOpenAI(
+    openai_api_key=getenv("OPENROUTER_API_KEY"),
+    openai_api_base=getenv("OPENROUTER_BASE_URL"),
+    model_name=SMALL_MODEL if tier == "small" else LARGE_MODEL,
+    temperature=0.0,
+    top_p=0.9,
+    frequency_penalty=0.0,
+    presence_penalty=0.0,
+    # Report token usage (including prompt cache reads) when streaming too
+    stream_usage=True,
+    extra_body={
+        # Usage details include prompt cache reads/writes and the cost of each request
+        "usage": {"include": True},
+        "data_collection": "deny",
+        # Prompt caches are per provider: sorting by latency would spread requests
+        # over providers and miss the cache, so keep the fixed order when caching
+        "provider": {
+            "order": ["Amazon Bedrock", "Azure"],
+            **({} if PROMPT_CACHE_ENABLED else {"sort": "latency"})
+        },
+        "models": MODEL_FALLBACKS[tier]
+        }
+  )
 
 # Define the state structure (simplified)
 class State(TypedDict):
     messages: Annotated[list, add_messages]
     
-# Combine MCP tools with local tools
-all_tools = []
-if mcp_tools: # Check if mcp_tools were loaded
-    all_tools.extend(mcp_tools)
-all_tools.append(humanize_timestamp_tool)
-
-# Bind tools to the LLM
-if all_tools:
-    llm_with_tools = llm.bind_tools(all_tools)
-else:
-    llm_with_tools = llm # Fallback to LLM without tools
-
-def assistant(state: State):
+# Local tools, always available; MCP tools are added when the graph is built
+local_tools = [humanize_timestamp_tool, humanize_timestamps_tool, get_result_page]
+
+# Set by get_graph(): the LLM bound to all tools of this worker, and the small model
+# used for simple turns (None when tiering is disabled)
+llm_with_tools = None
+small_llm_with_tools = None
+
+# Bound the number of in-flight LLM requests per process. Extra requests wait here
+# instead of piling up on the provider (and hitting its rate limits).
+LLM_MAX_CONCURRENCY = int(getenv("LLM_MAX_CONCURRENCY", "8"))
+llm_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
+# Tool calls of one assistant turn run concurrently, bounded per process, each with a timeout
+TOOL_MAX_CONCURRENCY = int(getenv("TOOL_MAX_CONCURRENCY", "8"))
+TOOL_CALL_TIMEOUT = float(getenv("TOOL_CALL_TIMEOUT", "60"))
+
+# Route well-formed questions straight to SuzieQ, without the LLM planning the tool call
+ROUTER_ENABLED = getenv("ROUTER_ENABLED", "true").lower() == "true"
+
+# Approximate token budget for the messages sent to the LLM on each call
+CONTEXT_TOKEN_BUDGET = int(getenv("CONTEXT_TOKEN_BUDGET", "30000"))
+
+# Rounds of tool calls (assistant -> tools -> assistant) allowed for one question
+MAX_TOOL_ITERATIONS = int(getenv("MAX_TOOL_ITERATIONS", "6"))
+# Graph steps per run: router, one assistant and one tools step per round, and the answer.
+# The assistant stops at MAX_TOOL_ITERATIONS, so this is only a backstop.
+RECURSION_LIMIT = 2 * MAX_TOOL_ITERATIONS + 4
+TOOL_LIMIT_NOTE = (f"_Stopped after {MAX_TOOL_ITERATIONS} rounds of tool calls for this question. "
+                   "Ask a narrower question to continue._")
+
+def tool_rounds(messages: list) -> int:
+    """Number of AI messages with tool calls since the last user question."""
+    rounds = 0
+    for msg in reversed(messages):
+        if isinstance(msg, HumanMessage):
+            break
+        if isinstance(msg, AIMessage) and msg.tool_calls:
+            rounds += 1
+    return rounds
+
+async def call_llm(tier: str, reason: str, messages: list):
+    """Ask the model of `tier`, within the per-process limit of in-flight LLM requests."""
+    model = small_llm_with_tools if tier == "small" else llm_with_tools
+    # The UI streams the reply; the tier tells it whether the reply may still be replaced
+    config = {"metadata": {"model_tier": tier}}
+    with span("llm_queue"):
+        await llm_semaphore.acquire()
+    try:
+        with span("llm", tier=tier) as attributes:
+            attributes["tier_reason"] = reason
+            response = await model.ainvoke(messages, config)
+            record_llm_usage(response, attributes, tier=tier)
+    finally:
+        llm_semaphore.release()
+    llm_calls.inc(tier=tier, reason=reason)
+    return response
+
+async def assistant(state: State):
     """Process messages with available tools."""
-    # Add system message to the conversation context
-    system_message = SystemMessage(
-        content=system_content
-    )
-    messages = state['messages']
-    if not any(isinstance(msg, SystemMessage) for msg in messages):
-        messages.insert(0, system_message)
-    
-    # Invoke the LLM (potentially with tools, depending on successful loading)
-    response = llm_with_tools.invoke(messages)
+    with span("assistant"):
+        # Add system message to the conversation context (without modifying the stored state)
+        history = [msg for msg in state['messages'] if not isinstance(msg, SystemMessage)]
+        # Query examples for each question, then elide old tool results (and, if needed,
+        # old turns) so that the prompt including the examples stays within the budget
+        messages, report = compact_messages([SYSTEM_MESSAGE, *add_examples(history)], CONTEXT_TOKEN_BUDGET)
+        if report["tokens_saved"]:
+            logger.info("Compacted history from %d to %d tokens (saved %d, elided %d tool results, "
+                        "dropped %d messages).", report["tokens_before"], report["tokens_after"],
+                        report["tokens_saved"], report["elided_tool_results"], report["dropped_messages"])
+        # Prompt cache breakpoints
+        messages = layout_prompt(messages)
+
+        # Simple turns go to the small model, analysis to the large one
+        tier, reason = choose_tier(history)
+        if tier == "small" and small_llm_with_tools is None:
+            tier, reason = "large", "small_model_unavailable"
+        # Invoke the LLM asynchronously so other chat sessions keep running meanwhile
+        response = await call_llm(tier, reason, messages)
+        if tier == "small" and TIER_ESCALATE_ON_LOW_CONFIDENCE and (doubt := low_confidence(response)):
+            logger.info("Small model reply rejected (%s), asking the large model.", doubt)
+            response = await call_llm("large", doubt, messages)
+        if response.tool_calls and tool_rounds(history) >= MAX_TOOL_ITERATIONS:
+            # Out of tool rounds for this question: answer with what the model has so far. The UI
+            # shows the note after the answer; it is the content only if the model wrote no text.
+            run_limits.inc(limit="tool_iterations")
+            response = AIMessage(
+                content=message_text(response.content).strip() or TOOL_LIMIT_NOTE,
+                id=response.id,
+                response_metadata={**response.response_metadata, "finish_reason": "tool_limit"},
+                usage_metadata=response.usage_metadata,
+            )
     return {"messages": [response]}
 
 def should_continue(state: MessagesState) -> str:
@@ -263,45 +199,133 @@ def should_continue(state: MessagesState) -> str:
     # Otherwise, reply to the user
     return "end"
 
+async def close_unfinished_turn(graph, config: dict, note: str):
+    """
+    End a turn whose run was stopped (deadline, recursion limit) with `note` as the answer.
+
+    Tool calls left without results get an error result, so the next question
+    starts from a valid history instead of resuming the stopped run.
+    """
+    state = await graph.aget_state(config)
+    messages = state.values.get("messages", [])
+    answered = {msg.tool_call_id for msg in messages if isinstance(msg, ToolMessage)}
+    pending = []
+    for msg in reversed(messages):
+        if isinstance(msg, HumanMessage):
+            break
+        if isinstance(msg, AIMessage):
+            pending += [call for call in msg.tool_calls if call["id"] not in answered]
+    closing = [ToolMessage(content=f"Error: {note}", tool_call_id=call["id"], name=call["name"], status="error")
+               for call in pending]
+    await graph.aupdate_state(config, {"messages": [*closing, AIMessage(content=note)]}, as_node="assistant")
+
 def generate_thread_id() -> str:
     """Generate a unique thread ID"""
     return str(uuid.uuid4())
 
-# Build the graph
-workflow = StateGraph(State)
-
-# Define the nodes
-workflow.add_node("assistant", assistant)
-# Add tool node only if tools were successfully loaded
-if all_tools:
-    workflow.add_node("tools", ToolNode(all_tools))
-
-# Set the entrypoint as assistant
-workflow.add_edge(START, "assistant")
-
-# Add conditional edges only if tools node exists
-if all_tools:
-    workflow.add_conditional_edges(
-        "assistant",
-        should_continue,
-        {
-            "tools": "tools",
-            "end": END
-        }
-    )
-    # Add normal edge from tools back to assistant
-    workflow.add_edge("tools", "assistant")
-else:
-     # If no tools, assistant always goes to END
-     workflow.add_edge("assistant", END)
-
-# Initialize memory
-memory = MemorySaver()
-react_graph = workflow.compile(checkpointer=memory)
+def build_graph(all_tools: list, checkpointer):
+    """Build and compile the assistant/tools graph."""
+    workflow = StateGraph(State)
+
+    # Define the nodes
+    workflow.add_node("assistant", assistant)
+    # Add tool node only if tools were successfully loaded
+    if all_tools:
+        workflow.add_node("tools", ParallelToolNode(
+            all_tools, max_concurrency=TOOL_MAX_CONCURRENCY, timeout=TOOL_CALL_TIMEOUT
+        ))
+
+    if all_tools and ROUTER_ENABLED:
+        # The router answers well-formed questions with a direct tool call, and
+        # leaves everything else to the assistant
+        workflow.add_node("router", make_router({tool.name for tool in all_tools}))
+        workflow.add_edge(START, "router")
+        workflow.add_conditional_edges(
+            "router",
+            route_after_router,
+            {
+                "tools": "tools",
+                "assistant": "assistant"
+            }
+        )
+    else:
+        # Set the entrypoint as assistant
+        workflow.add_edge(START, "assistant")
+
+    # Add conditional edges only if tools node exists
+    if all_tools:
+        workflow.add_conditional_edges(
+            "assistant",
+            should_continue,
+            {
+                "tools": "tools",
+                "end": END
+            }
+        )
+        # Add normal edge from tools back to assistant
+        workflow.add_edge("tools", "assistant")
+    else:
+         # If no tools, assistant always goes to END
+         workflow.add_edge("assistant", END)
+
+    return workflow.compile(checkpointer=checkpointer)
+
+# Built once per worker by get_graph(); nothing expensive runs at import time
+react_graph = None
+memory = None
+_graph_lock = None
+
+async def get_graph():
+    """
+    Return this worker's compiled graph, building it on first use.
+
+    Loads the MCP tools (from the schema cache when possible), creates the LLMs,
+    opens the checkpointer and compiles the graph, timing each phase. If the MCP
+    tools could not be loaded, a graph with only the local tools is returned and
+    the next call tries again.
+    """
+    global react_graph, memory, llm_with_tools, small_llm_with_tools, _graph_lock
+    if react_graph is not None:
+        return react_graph
+    if _graph_lock is None:
+        _graph_lock = asyncio.Lock()
+    async with _graph_lock:
+        if react_graph is not None:
+            return react_graph
+        started = time.perf_counter()
+        with startup_phase("mcp_tools"):
+            mcp_tools = await get_tools()
+        all_tools = [*(mcp_tools or []), *local_tools]
+        with startup_phase("llm"):
+            llm = create_llm()
+            # Fallback to LLM without tools
+            llm_with_tools = llm.bind_tools(all_tools) if all_tools else llm
+            if TIERING_ENABLED:
+                small_llm = create_llm("small")
+                small_llm_with_tools = small_llm.bind_tools(all_tools) if all_tools else small_llm
+        with startup_phase("checkpointer"):
+            # Postgres/SQLite backed, keeping only the latest checkpoints per thread
+            if memory is None:
+                memory = create_checkpointer()
+            if isinstance(memory, DurableCheckpointer):
+                await memory.setup()
+        with startup_phase("compile_graph"):
+            graph = build_graph(all_tools, memory)
+        startup_timings["total"] = round(time.perf_counter() - started, 4)
+        logger.info("Graph ready with %d tools in %.0f ms.", len(all_tools), startup_timings["total"] * 1000)
+        if mcp_tools is None:
+            logger.warning("No MCP tools were loaded. Assistant will have limited capabilities until they are.")
+            return graph
+        react_graph = graph
+        return react_graph
+
+async def close_checkpointer():
+    """Release the checkpointer's database connections."""
+    if isinstance(memory, DurableCheckpointer):
+        await memory.aclose()
 
 # Keep tracers waiting if used, shutdown is handled by atexit
 wait_for_all_tracers()
-print("Graph compiled. Setup complete. Application might run or wait for input.")
 # Note: The script will now wait for exit to trigger the atexit cleanup.
 # If this is meant to be a long-running server, ensure the main thread stays alive.
 # If it's a script that should exit after setup, you might need explicit execution and exit logic.
\ No newline at end of file
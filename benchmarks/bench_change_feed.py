@@ -0,0 +1,102 @@
+"""
+Change feed benchmark: a dashboard polling a sliding time window, fully offline.
+
+Every `--interval` seconds, asks the stand-in SuzieQ server for the changes
+of the last `--window` seconds of a table. Each poll goes both through the
+change feed (change_feed.py) and straight to the server, with the same
+absolute window. Reports per path the latency and the bytes that crossed the
+MCP link, and checks that both paths returned the same rows. The server
+writes one change row every `--change-interval` seconds.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_change_feed --polls 20 --window 7200
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+from benchmarks.fakes import FAKE_SERVER_PATH
+
+
+def milliseconds(values: list) -> dict:
+    return {"p50": round(statistics.median(values) * 1000, 1), "max": round(max(values) * 1000, 1)}
+
+
+async def main(args):
+    # Configure the app before it is imported: module-level settings read the environment.
+    os.environ["MCP_SERVER_COMMAND_PATH"] = FAKE_SERVER_PATH
+
+    from langchain_mcp_adapters.tools import convert_mcp_tool_to_langchain_tool
+
+    import client
+    from change_feed import ChangeFeedStore, feed_tool, format_time
+
+    client.pool.connection["env"] = {
+        **os.environ, "FAKE_SUZIEQ_LATENCY": str(args.server_latency),
+        "FAKE_SUZIEQ_CHANGE_INTERVAL": str(args.change_interval),
+    }
+    mcp_tools = (await client.pool.list_tools()).tools
+    show = next(convert_mcp_tool_to_langchain_tool(client.pool, tool)
+                for tool in mcp_tools if tool.name == "run_suzieq_show")
+    store = ChangeFeedStore(settle=args.settle)
+    feed_show = feed_tool(show, store)
+
+    timings = {"change_feed": [], "direct": []}
+    direct_bytes = 0
+    mismatches = 0
+    try:
+        for poll in range(args.polls):
+            now = time.time()
+            filters = {"namespace": "eos", "view": "changes",
+                       "start_time": format_time(now - args.window), "end_time": format_time(now)}
+            arguments = {"table": args.table, "filters": filters}
+
+            started = time.perf_counter()
+            feed_content, _ = await feed_show.coroutine(**arguments)
+            timings["change_feed"].append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            direct_content, _ = await show.coroutine(**arguments)
+            timings["direct"].append(time.perf_counter() - started)
+            direct_bytes += len(direct_content)
+
+            feed_rows = {json.dumps(row, sort_keys=True) for row in json.loads(feed_content)}
+            direct_rows = {json.dumps(row, sort_keys=True) for row in json.loads(direct_content)}
+            mismatches += len(feed_rows ^ direct_rows)
+            if poll + 1 < args.polls:
+                await asyncio.sleep(args.interval)
+    finally:
+        await client.shutdown_mcp_pool()
+
+    stats = store.stats()
+    result = {
+        "config": vars(args),
+        "latency_ms": {path: milliseconds(values) for path, values in timings.items()},
+        "mcp_bytes": {"change_feed": stats["fetched_bytes"], "direct": direct_bytes},
+        "mismatched_rows": mismatches,
+        "change_feed": stats,
+    }
+    for path in timings:
+        latency = result["latency_ms"][path]
+        print(f"{path:>11}  p50={latency['p50']:7.1f}ms  max={latency['max']:7.1f}ms  "
+              f"over MCP={result['mcp_bytes'][path] / 1024:9.1f}KiB")
+    print(f"polls={args.polls}  mismatched rows={mismatches}  feed: {stats}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--table", default="bgp")
+    parser.add_argument("--polls", type=int, default=10, help="Number of polls")
+    parser.add_argument("--interval", type=float, default=2.0, help="Seconds between polls")
+    parser.add_argument("--window", type=float, default=7200, help="Window length in seconds")
+    parser.add_argument("--change-interval", type=float, default=1.0, help="Seconds between change rows")
+    parser.add_argument("--settle", type=float, default=60.0, help="Seconds the newest slice starts early")
+    parser.add_argument("--server-latency", type=float, default=0.05, help="Seconds per SuzieQ query")
+    parser.add_argument("--output", help="Path for JSON results")
+    asyncio.run(main(parser.parse_args()))
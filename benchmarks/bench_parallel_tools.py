@@ -0,0 +1,81 @@
+"""
+Benchmark for parallel tool execution within one assistant turn.
+
+Builds an assistant message with N tool calls against stand-in async tools with
+different latencies and runs it through ParallelToolNode. With parallel fan-out
+the wall-clock time of the turn should be close to the slowest single call
+rather than the sum of all calls. One call fails and one exceeds the timeout to
+show that partial failures come back as error ToolMessages.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_parallel_tools --calls 8 --max-latency 1.0
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from langchain_core.messages import AIMessage
+from langchain_core.tools import StructuredTool
+
+from tool_executor import ParallelToolNode
+
+
+def make_tool(name: str, latency: float, fail: bool = False) -> StructuredTool:
+    async def call_tool(table: str) -> str:
+        await asyncio.sleep(latency)
+        if fail:
+            raise RuntimeError(f"{table}: simulated SuzieQ failure")
+        return json.dumps([{"table": table, "latency": latency}])
+
+    return StructuredTool.from_function(
+        coroutine=call_tool, name=name, description=f"Stand-in tool with {latency}s latency"
+    )
+
+
+async def run_turn(calls: int, max_latency: float, max_concurrency: int, timeout: float) -> dict:
+    latencies = [max_latency * (i + 1) / calls for i in range(calls)]
+    tools = [make_tool(f"tool_{i}", latency, fail=(i == 0)) for i, latency in enumerate(latencies)]
+    # One extra call that never finishes in time
+    tools.append(make_tool("tool_slow", timeout * 10))
+    node = ParallelToolNode(tools, max_concurrency=max_concurrency, timeout=timeout)
+    message = AIMessage(content="", tool_calls=[
+        {"id": f"call_{tool.name}", "name": tool.name, "args": {"table": "bgp"}} for tool in tools
+    ])
+
+    started = time.perf_counter()
+    result = await node.ainvoke({"messages": [message]})
+    elapsed = time.perf_counter() - started
+    errors = sum(1 for msg in result["messages"] if msg.status == "error")
+    return {
+        "calls": len(tools),
+        "max_concurrency": max_concurrency,
+        "slowest_call_seconds": round(max(max(latencies), timeout), 3),
+        "sum_of_calls_seconds": round(sum(latencies) + timeout, 3),
+        "wall_seconds": round(elapsed, 3),
+        "error_messages": errors,
+    }
+
+
+async def main(args):
+    results = [
+        await run_turn(args.calls, args.max_latency, concurrency, args.timeout)
+        for concurrency in (1, args.max_concurrency)
+    ]
+    for r in results:
+        print(f"concurrency={r['max_concurrency']:>3}  calls={r['calls']}  wall={r['wall_seconds']:.2f}s  "
+              f"slowest={r['slowest_call_seconds']:.2f}s  sum={r['sum_of_calls_seconds']:.2f}s  "
+              f"errors={r['error_messages']}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=8, help="Tool calls in the turn (plus one that times out)")
+    parser.add_argument("--max-latency", type=float, default=1.0, help="Latency of the slowest successful call")
+    parser.add_argument("--timeout", type=float, default=1.2, help="Per-call timeout in seconds")
+    parser.add_argument("--max-concurrency", type=int, default=16)
+    parser.add_argument("--output", help="Optional path for JSON results")
+    asyncio.run(main(parser.parse_args()))
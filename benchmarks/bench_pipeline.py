@@ -0,0 +1,269 @@
+"""
+End-to-end pipeline benchmark, fully offline.
+
+Drives the graph from `app.get_graph()` with a scripted chat model
+(benchmarks/fakes.py) and the stand-in SuzieQ MCP server
+(benchmarks/fake_suzieq_server.py). The server returns synthetic tables of
+`--rows` rows. Each simulated chat runs `--turns` questions, and every
+`--sessions` value is measured in turn.
+
+Two modes:
+- `graph` calls the graph directly.
+- `chainlit` runs the `chainlit_app.main` message handler, including token
+  streaming and tool-output rendering, against Chainlit's no-op emitter.
+
+Reported per concurrency level:
+- latency percentiles, and time to first token in chainlit mode;
+- throughput;
+- resident memory growth per chat thread;
+- the number and size of tool results sent to the model.
+
+Results are written as JSON with `--output`. `--baseline` compares the run
+with an earlier result file, e.g. from another commit.
+
+The server is started with `uv run python`, like the real one.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_pipeline --rows 500 --sessions 1 4 16 --output bench.json
+    python -m benchmarks.bench_pipeline --mode chainlit --baseline bench.json
+"""
+import argparse
+import asyncio
+import contextlib
+import gc
+import json
+import os
+import resource
+import statistics
+import subprocess
+import time
+
+from benchmarks.fakes import FAKE_SERVER_PATH, ScriptedChatModel, temp_files_directory
+
+# Table named in each question, so chats query a mix of tables
+TABLE_FOR = ["device", "interface", "bgp", "route"]
+
+
+def rss_bytes() -> int:
+    """Current resident set size (peak size where /proc is not available)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def percentiles(values: list) -> dict:
+    """p50/p90/p95/p99/max of `values` (seconds) in milliseconds."""
+    if not values:
+        return {}
+    if len(values) == 1:
+        values = values * 2
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return {
+        "p50": round(cuts[49] * 1000, 1),
+        "p90": round(cuts[89] * 1000, 1),
+        "p95": round(cuts[94] * 1000, 1),
+        "p99": round(cuts[98] * 1000, 1),
+        "max": round(max(values) * 1000, 1),
+    }
+
+
+def payload_totals() -> tuple:
+    """Number and total bytes of tool results observed so far."""
+    from instrumentation import tool_payload_bytes
+
+    count = sum(series[2] for series in tool_payload_bytes.series.values())
+    total = sum(series[1] for series in tool_payload_bytes.series.values())
+    return count, total
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def question(index: int, turn: int) -> str:
+    return f"question {turn} about {TABLE_FOR[(index + turn) % len(TABLE_FOR)]}"
+
+
+async def graph_turn(graph, thread_id: str, text: str):
+    from langchain_core.messages import HumanMessage
+
+    await graph.ainvoke({"messages": [HumanMessage(content=text)]},
+                        {"configurable": {"thread_id": thread_id}})
+
+
+async def chainlit_chat(turns: int, index: int) -> list:
+    """One chat driven through the Chainlit handlers, in its own Chainlit context."""
+    import chainlit as cl
+    from chainlit.context import init_http_context
+
+    import chainlit_app
+    from instrumentation import current_trace
+
+    init_http_context()
+    await chainlit_app.start()
+    timings = []
+    for turn in range(turns):
+        started = time.perf_counter()
+        await chainlit_app.main(cl.Message(content=question(index, turn)))
+        timings.append({"seconds": time.perf_counter() - started,
+                        "first_token": current_trace.get().marks.get("first_token")})
+    return timings
+
+
+async def run_level(args, graph, sessions: int) -> dict:
+    """Run `sessions` concurrent chats and collect the numbers for this level."""
+
+    async def chat(index: int) -> list:
+        if args.mode == "chainlit":
+            return await chainlit_chat(args.turns, index)
+        thread_id = f"bench-{sessions}-{index}"
+        timings = []
+        for turn in range(args.turns):
+            started = time.perf_counter()
+            await graph_turn(graph, thread_id, question(index, turn))
+            timings.append({"seconds": time.perf_counter() - started, "first_token": None})
+        return timings
+
+    gc.collect()
+    rss_before = rss_bytes()
+    payloads_before = payload_totals()
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(*(chat(i) for i in range(sessions)), return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    rss_after = rss_bytes()
+    payloads_after = payload_totals()
+
+    errors = [o for o in outcomes if isinstance(o, Exception)]
+    timings = [t for o in outcomes if not isinstance(o, Exception) for t in o]
+    tool_results = payloads_after[0] - payloads_before[0]
+    tool_bytes = payloads_after[1] - payloads_before[1]
+    first_tokens = [t["first_token"] for t in timings if t["first_token"] is not None]
+    return {
+        "mode": args.mode,
+        "sessions": sessions,
+        "requests": len(timings),
+        "errors": len(errors),
+        "first_error": repr(errors[0]) if errors else None,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(timings) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": percentiles([t["seconds"] for t in timings]),
+        "first_token_ms": percentiles(first_tokens),
+        "rss_growth_per_thread_bytes": int((rss_after - rss_before) / sessions),
+        "tool_results": int(tool_results),
+        "tool_payload_bytes_avg": int(tool_bytes / tool_results) if tool_results else 0,
+    }
+
+
+def compare(results: list, baseline_path: str):
+    """Print the change of the main numbers relative to an earlier result file."""
+    with open(baseline_path) as f:
+        baseline = {(r["mode"], r["sessions"]): r for r in json.load(f)["results"]}
+    for r in results:
+        before = baseline.get((r["mode"], r["sessions"]))
+        if not before:
+            continue
+        changes = []
+        for label, new, old in (
+            ("p50", r["latency_ms"].get("p50"), before["latency_ms"].get("p50")),
+            ("p95", r["latency_ms"].get("p95"), before["latency_ms"].get("p95")),
+            ("throughput", r["throughput_rps"], before["throughput_rps"]),
+        ):
+            if new is not None and old:
+                changes.append(f"{label} {(new - old) / old * 100:+.1f}%")
+        print(f"vs baseline  sessions={r['sessions']:>3}  " + "  ".join(changes))
+
+
+async def main(args):
+    # Configure the app before it is imported: module-level settings read the environment.
+    os.environ["MCP_SERVER_COMMAND_PATH"] = FAKE_SERVER_PATH
+    # Keep the stand-in server's tool schemas apart from the real server's
+    os.environ["MCP_TOOL_SCHEMA_CACHE"] = ".cache/mcp_tool_schemas.bench.json"
+    os.environ.setdefault("CHECKPOINTER", "memory")
+    os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+    if args.no_tool_cache:
+        os.environ["TOOL_CACHE_ENABLED"] = "false"
+    if args.no_answer_cache:
+        os.environ["ANSWER_CACHE_ENABLED"] = "false"
+    if args.mode == "chainlit":
+        # chainlit_app registers an OAuth callback, which needs a configured provider
+        os.environ.setdefault("OAUTH_GITHUB_CLIENT_ID", "benchmark")
+        os.environ.setdefault("OAUTH_GITHUB_CLIENT_SECRET", "benchmark")
+        os.environ.setdefault("CHAINLIT_AUTH_SECRET", "benchmark" * 4)
+
+    import app
+    import client
+    from shaping import shaping_totals
+    from startup import startup_timings
+
+    # MCP stdio servers only get a minimal environment unless one is given
+    client.pool.connection["env"] = {
+        **os.environ, "FAKE_SUZIEQ_ROWS": str(args.rows), "FAKE_SUZIEQ_LATENCY": str(args.server_latency),
+    }
+    graph = await app.get_graph()
+    await client.start_mcp_pool()
+    if args.mode == "chainlit":
+        # Import before the chats start: Chainlit initializes context variables on import
+        import chainlit_app
+    app.llm_with_tools = app.small_llm_with_tools = ScriptedChatModel(
+        latency=args.llm_latency, token_latency=args.token_latency, tool_calls=args.tool_calls,
+    )
+
+    results = []
+    # Element files of the rendered tool results go to a temporary directory
+    files = temp_files_directory() if args.mode == "chainlit" else contextlib.nullcontext()
+    try:
+        with files:
+            for sessions in args.sessions:
+                r = await run_level(args, graph, sessions)
+                results.append(r)
+                lat = r["latency_ms"]
+                print(f"sessions={sessions:>3}  requests={r['requests']:>4}  errors={r['errors']}  "
+                      f"throughput={r['throughput_rps']:6.2f} req/s  p50={lat.get('p50', 0):7.1f}ms  "
+                      f"p95={lat.get('p95', 0):7.1f}ms  p99={lat.get('p99', 0):7.1f}ms  "
+                      f"rss/thread={r['rss_growth_per_thread_bytes'] / 1024:7.1f}KiB  "
+                      f"payload avg={r['tool_payload_bytes_avg']}B")
+                if r["first_error"]:
+                    print(f"  first error: {r['first_error']}")
+    finally:
+        await client.shutdown_mcp_pool()
+        await app.close_checkpointer()
+
+    if args.baseline:
+        compare(results, args.baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "commit": git_commit(),
+                "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+                "startup": startup_timings,
+                "results": results,
+                "tool_cache": client.tool_cache_stats(),
+                "mcp_pool": client.mcp_pool_stats(),
+                "shaping": shaping_totals,
+                "answer_cache": chainlit_app.answer_cache.stats() if args.mode == "chainlit" else None,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["graph", "chainlit"], default="graph")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 4, 16], help="Concurrent chat threads")
+    parser.add_argument("--turns", type=int, default=3, help="Questions per chat thread")
+    parser.add_argument("--rows", type=int, default=200, help="Rows in each synthetic SuzieQ table")
+    parser.add_argument("--tool-calls", type=int, default=1, help="SuzieQ queries the model asks for per question")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Seconds before each model reply")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Seconds per streamed word")
+    parser.add_argument("--server-latency", type=float, default=0.05, help="Seconds per SuzieQ query")
+    parser.add_argument("--no-tool-cache", action="store_true", help="Disable the tool result cache")
+    parser.add_argument("--no-answer-cache", action="store_true",
+                        help="Disable the answer cache (chainlit mode; chats repeat each other's questions)")
+    parser.add_argument("--output", help="Path for JSON results")
+    parser.add_argument("--baseline", help="Earlier JSON results to compare with")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,169 @@
+"""
+Prompt layout and prompt cache benchmark, fully offline.
+
+Runs scripted multi-turn chats through the graph, with the scripted model
+from benchmarks/fakes.py and the stand-in SuzieQ server. It records the
+messages each model call receives and replays them against a simulated
+provider prompt cache with Anthropic's rules:
+- the prefix up to each cache breakpoint is written to the cache;
+- a later call reads the longest cached prefix that ends at one of its
+  breakpoints, or up to 20 messages before one;
+- prefixes under `--min-cache-tokens` are not cached;
+- cache_control markers do not change a prefix.
+
+Reported:
+- prompt tokens per call, and the share read from the cache;
+- cache writes;
+- the input cost relative to no caching (a cache read costs 0.1x, a write
+  1.25x);
+- the size of the base system prompt and of the per-question examples.
+
+Token counts are estimates and leave out the tool schemas. Compare with
+`PROMPT_CACHE_ENABLED=false` to see the same chats without breakpoints.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_prompt --chats 4 --turns 6
+"""
+import argparse
+import asyncio
+import json
+import os
+
+from benchmarks.fakes import FAKE_SERVER_PATH, ScriptedChatModel
+
+QUESTIONS = [
+    "show bgp sessions that are not established",
+    "which interfaces are down",
+    "how long have the devices been up",
+    "list the routes in vrf default",
+    "summarize the network",
+    "check mtu on the uplinks",
+]
+
+# Cache pricing relative to uncached input tokens
+CACHE_READ_PRICE = 0.1
+CACHE_WRITE_PRICE = 1.25
+LOOKBACK = 20
+
+
+class RecordingChatModel(ScriptedChatModel):
+    """Scripted model that keeps the messages of every call."""
+
+    calls: list = []
+
+    def _reply(self, messages):
+        self.calls.append(list(messages))
+        return super()._reply(messages)
+
+
+def _identity(msg) -> str:
+    """What the provider sees of a message, without cache_control markers."""
+    content = msg.content
+    if isinstance(content, str):
+        content = [{"type": "text", "text": content}] if content else []
+    blocks = [{k: v for k, v in block.items() if k != "cache_control"} if isinstance(block, dict) else block
+              for block in content]
+    return json.dumps([msg.type, blocks, getattr(msg, "tool_calls", None), getattr(msg, "tool_call_id", None)],
+                      sort_keys=True, default=str)
+
+
+def _has_breakpoint(msg) -> bool:
+    return isinstance(msg.content, list) and any(
+        isinstance(block, dict) and "cache_control" in block for block in msg.content
+    )
+
+
+def simulate_cache(calls: list, min_tokens: int) -> dict:
+    """Replay the recorded calls against a simulated prompt cache."""
+    from langchain_core.messages.utils import count_tokens_approximately
+
+    cache = set()
+    totals = {"calls": len(calls), "input_tokens": 0, "cache_read_tokens": 0, "cache_write_tokens": 0}
+    for messages in calls:
+        keys, prefix = [], ""
+        for msg in messages:
+            prefix += _identity(msg)
+            keys.append(hash(prefix))
+        tokens = [count_tokens_approximately(messages[:i + 1]) for i in range(len(messages))]
+        breakpoints = [i for i, msg in enumerate(messages) if _has_breakpoint(msg)]
+
+        read = 0
+        for point in breakpoints:
+            for i in range(point, max(point - LOOKBACK, -1), -1):
+                if keys[i] in cache:
+                    read = max(read, tokens[i])
+                    break
+        written = 0
+        for point in breakpoints:
+            if tokens[point] >= min_tokens and keys[point] not in cache:
+                cache.add(keys[point])
+                written = max(written, tokens[point] - read)
+
+        totals["input_tokens"] += tokens[-1]
+        totals["cache_read_tokens"] += read
+        totals["cache_write_tokens"] += written
+    uncached = totals["input_tokens"] - totals["cache_read_tokens"] - totals["cache_write_tokens"]
+    cost = (uncached + CACHE_READ_PRICE * totals["cache_read_tokens"]
+            + CACHE_WRITE_PRICE * totals["cache_write_tokens"])
+    totals["cache_read_share"] = round(totals["cache_read_tokens"] / totals["input_tokens"], 3)
+    totals["relative_input_cost"] = round(cost / totals["input_tokens"], 3)
+    return totals
+
+
+async def main(args):
+    # Configure the app before it is imported: module-level settings read the environment.
+    os.environ["MCP_SERVER_COMMAND_PATH"] = FAKE_SERVER_PATH
+    os.environ["MCP_TOOL_SCHEMA_CACHE"] = ".cache/mcp_tool_schemas.bench.json"
+    os.environ.setdefault("CHECKPOINTER", "memory")
+    os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+    # Every question goes through the model, as on the LLM path
+    os.environ.setdefault("ROUTER_ENABLED", "false")
+
+    from langchain_core.messages import HumanMessage
+    from langchain_core.messages.utils import count_tokens_approximately
+
+    import app
+    import client
+    from prompts import PROMPT_CACHE_ENABLED, SYSTEM_MESSAGE, render_examples, select_examples
+
+    client.pool.connection["env"] = {**os.environ, "FAKE_SUZIEQ_LATENCY": "0"}
+    graph = await app.get_graph()
+    model = RecordingChatModel(latency=0, answer_words=args.answer_words)
+    app.llm_with_tools = app.small_llm_with_tools = model
+    try:
+        for chat in range(args.chats):
+            config = {"configurable": {"thread_id": f"prompt-{chat}"}}
+            for turn in range(args.turns):
+                text = QUESTIONS[(chat + turn) % len(QUESTIONS)]
+                await graph.ainvoke({"messages": [HumanMessage(content=text)]}, config)
+    finally:
+        await client.shutdown_mcp_pool()
+        await app.close_checkpointer()
+
+    example_tokens = [count_tokens_approximately([HumanMessage(content=render_examples(select_examples(q)))])
+                      for q in QUESTIONS]
+    result = {
+        "prompt_cache_enabled": PROMPT_CACHE_ENABLED,
+        "system_prompt_tokens": count_tokens_approximately([SYSTEM_MESSAGE]),
+        "example_tokens_avg": round(sum(example_tokens) / len(example_tokens)),
+        **simulate_cache(model.calls, args.min_cache_tokens),
+    }
+    print(f"system prompt={result['system_prompt_tokens']} tokens  "
+          f"examples per question={result['example_tokens_avg']} tokens  "
+          f"calls={result['calls']}  input={result['input_tokens']} tokens")
+    print(f"cache read={result['cache_read_tokens']} tokens ({result['cache_read_share']:.0%})  "
+          f"cache write={result['cache_write_tokens']} tokens  "
+          f"input cost vs. no caching={result['relative_input_cost']:.2f}x")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": {k: v for k, v in vars(args).items() if k != "output"}, **result}, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=4, help="Chat threads")
+    parser.add_argument("--turns", type=int, default=6, help="Questions per chat")
+    parser.add_argument("--answer-words", type=int, default=60, help="Words in each scripted answer")
+    parser.add_argument("--min-cache-tokens", type=int, default=1024, help="Smallest cacheable prefix")
+    parser.add_argument("--output", help="Path for JSON results")
+    asyncio.run(main(parser.parse_args()))
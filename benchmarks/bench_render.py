@@ -0,0 +1,161 @@
+"""
+Telemetry Response rendering benchmark, fully offline.
+
+Runs chats through the `chainlit_app.main` message handler with the scripted
+model and the stand-in SuzieQ server. Chainlit's emitter is replaced by one
+that counts what would go over the websocket. Each chat runs `--turns`
+questions and each run is measured twice:
+
+- `preview`: the rendering in rendering.py. Each step gets a table preview,
+  and the full table is attached once as an element.
+- `raw`: every tool result is put into its step in full, as before. The old
+  code also streamed the result token by token, so the real traffic was
+  about twice the number shown.
+
+Reported per message:
+- websocket bytes;
+- bytes of step output, which the data layer writes to Step.output;
+- bytes of element files, which are fetched over HTTP or from storage.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_render --rows 2000 --chats 4 --turns 4
+    SHAPING_ENABLED=false python -m benchmarks.bench_render --rows 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from benchmarks.fakes import FAKE_SERVER_PATH, ScriptedChatModel, temp_files_directory
+
+TABLES = ["device", "interface", "bgp", "route", "mac"]
+
+
+class Counts:
+    def __init__(self):
+        self.websocket = 0
+        self.step_output = 0
+        self.element_files = 0
+        self.messages = 0
+
+
+def count_emitter(emitter, counts: Counts):
+    """Wrap the emitter methods that send steps, tokens and elements so their payloads are counted."""
+
+    def size(payload) -> int:
+        return len(json.dumps(payload, default=str))
+
+    def wrap(name, measure):
+        original = getattr(emitter, name)
+
+        async def counted(*args, **kwargs):
+            counts.websocket += measure(*args, **kwargs)
+            return await original(*args, **kwargs)
+
+        setattr(emitter, name, counted)
+
+    def step(step_dict):
+        if step_dict.get("type") == "tool":
+            counts.step_output += len(step_dict.get("output") or "")
+        return size(step_dict)
+
+    wrap("send_step", step)
+    wrap("update_step", step)
+    wrap("stream_start", lambda step_dict: size(step_dict))
+    wrap("send_token", lambda id, token, *args, **kwargs: len(token))
+    wrap("send_element", lambda element_dict: size(element_dict))
+    wrap("emit", lambda event, data: size(data))
+
+    session = emitter.session
+    persist_file = session.persist_file
+
+    async def counted_persist_file(name, mime, path=None, content=None):
+        counts.element_files += len(content or b"")
+        return await persist_file(name=name, mime=mime, path=path, content=content)
+
+    session.persist_file = counted_persist_file
+
+
+async def chat(index: int, turns: int, counts: Counts):
+    import chainlit as cl
+    from chainlit.context import context, init_http_context
+
+    import chainlit_app
+
+    init_http_context()
+    count_emitter(context.emitter, counts)
+    await chainlit_app.start()
+    for turn in range(turns):
+        # Every fourth question asks about a table again, as users do
+        table = TABLES[(index + turn % 3) % len(TABLES)]
+        await chainlit_app.main(cl.Message(content=f"question {turn} about {table}"))
+        counts.messages += 1
+
+
+async def main(args):
+    # Configure the app before it is imported: module-level settings read the environment.
+    os.environ["MCP_SERVER_COMMAND_PATH"] = FAKE_SERVER_PATH
+    os.environ["MCP_TOOL_SCHEMA_CACHE"] = ".cache/mcp_tool_schemas.bench.json"
+    os.environ.setdefault("CHECKPOINTER", "memory")
+    os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+    os.environ["ANSWER_CACHE_ENABLED"] = "false"
+    # chainlit_app registers an OAuth callback, which needs a configured provider
+    os.environ.setdefault("OAUTH_GITHUB_CLIENT_ID", "benchmark")
+    os.environ.setdefault("OAUTH_GITHUB_CLIENT_SECRET", "benchmark")
+    os.environ.setdefault("CHAINLIT_AUTH_SECRET", "benchmark" * 4)
+
+    import app
+    import client
+
+    client.pool.connection["env"] = {**os.environ, "FAKE_SUZIEQ_ROWS": str(args.rows)}
+    await app.get_graph()
+    await client.start_mcp_pool()
+    import chainlit_app
+    from rendering import render_tool_output, render_totals
+
+    def raw_render(content, artifact=None, attached=None, full_in_step=False):
+        return {"key": None, "output": content, "language": "json", "name": None, "frame": None, "text": None}
+
+    app.llm_with_tools = app.small_llm_with_tools = ScriptedChatModel(latency=args.llm_latency)
+    results = {}
+    try:
+        with temp_files_directory():
+            for mode, renderer in (("raw", raw_render), ("preview", render_tool_output)):
+                chainlit_app.render_tool_output = renderer
+                counts = Counts()
+                started = time.perf_counter()
+                await asyncio.gather(*(chat(index, args.turns, counts) for index in range(args.chats)))
+                results[mode] = {
+                    "seconds": round(time.perf_counter() - started, 3),
+                    "messages": counts.messages,
+                    "websocket_bytes_per_message": counts.websocket // max(counts.messages, 1),
+                    "step_output_bytes_per_message": counts.step_output // max(counts.messages, 1),
+                    "element_file_bytes_per_message": counts.element_files // max(counts.messages, 1),
+                }
+    finally:
+        await client.shutdown_mcp_pool()
+
+    for mode, r in results.items():
+        print(f"{mode:>8}  websocket={r['websocket_bytes_per_message'] / 1024:9.1f}KiB/msg  "
+              f"step output={r['step_output_bytes_per_message'] / 1024:9.1f}KiB/msg  "
+              f"element files={r['element_file_bytes_per_message'] / 1024:9.1f}KiB/msg  "
+              f"time={r['seconds']:.2f}s")
+    print(f"preview rendering: {render_totals}")
+    raw, preview = results["raw"], results["preview"]
+    websocket = raw["websocket_bytes_per_message"] / max(preview["websocket_bytes_per_message"], 1)
+    step_output = raw["step_output_bytes_per_message"] / max(preview["step_output_bytes_per_message"], 1)
+    print(f"websocket bytes {websocket:.1f}x fewer, step output {step_output:.1f}x smaller")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000, help="Rows in each synthetic SuzieQ table")
+    parser.add_argument("--chats", type=int, default=4, help="Concurrent chats")
+    parser.add_argument("--turns", type=int, default=4, help="Questions per chat")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Seconds per scripted model reply")
+    parser.add_argument("--output", help="Path for JSON results")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,212 @@
+"""
+Benchmark of the deterministic fast path (router.py), fully offline.
+
+1. Runs `route_query` over a labelled set of questions. For each question
+   the set gives the expected SuzieQ call, or None when the question should
+   be left to the LLM. Reports the hit rate, wrong routes (a call that differs
+   from the expected one) and missed routes, and the time `route_query`
+   takes per question.
+2. Runs the questions through the graph with the router, and the routed ones
+   again without it. The LLM is the scripted model from benchmarks/fakes.py (with
+   `--llm-latency` per call) and SuzieQ is the stand-in server. Reports the
+   latency of the routed questions on the fast path next to the same questions
+   planned by the LLM, and of the questions that fall back to the LLM.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_router
+    python -m benchmarks.bench_router --llm-latency 1.5 --repeat 3 --output router.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+from benchmarks.fakes import FAKE_SERVER_PATH, ScriptedChatModel
+
+SHOW = "run_suzieq_show"
+SUMMARIZE = "run_suzieq_summarize"
+
+# (question, expected (tool, table, filters) or None for the LLM)
+CORPUS = [
+    ("Show 'down' interfaces", (SHOW, "interface", {"state": "down"})),
+    ("show interfaces with mtu greater than 9000", (SHOW, "interface", {"mtu": "> 9000"})),
+    ("List all ethernet interfaces", (SHOW, "interface", {"type": "ethernet"})),
+    ("interfaces on leaf01", (SHOW, "interface", {"hostname": "leaf01"})),
+    ("show administratively down interfaces on spine02", (SHOW, "interface", {"hostname": "spine02",
+                                                                               "adminState": "down"})),
+    ("List all devices", (SHOW, "device", {})),
+    ("Which devices are Arista?", (SHOW, "device", {"vendor": "Arista"})),
+    ("show devices in namespace suzieq-demo", (SHOW, "device", {"namespace": "suzieq-demo"})),
+    ("show devices in suzieq-demo", (SHOW, "device", {"namespace": "suzieq-demo"})),
+    ("show device uptime", (SHOW, "device", {"columns": ["namespace", "hostname", "bootupTimestamp", "status"]})),
+    ("Show BGP sessions that are not established", (SHOW, "bgp", {"state": "NotEstd"})),
+    ("bgp sessions in vrf default in namespace suzieq-demo", (SHOW, "bgp", {"namespace": "suzieq-demo",
+                                                                              "vrf": "default"})),
+    ("show bgp peers with asn 65001", (SHOW, "bgp", {"asn": "65001"})),
+    ("bgp peers with peer asn 65000", (SHOW, "bgp", {"peerAsn": "65000"})),
+    ("summarize bgp", (SUMMARIZE, "bgp", {})),
+    ("summarize interfaces in namespace eos", (SUMMARIZE, "interface", {"namespace": "eos"})),
+    ("show routes for 10.10.10.1/32", (SHOW, "route", {"prefix": "10.10.10.1/32"})),
+    ("how many routes have prefixlen > 24", (SHOW, "route", {"prefixlen": "> 24"})),
+    ("show routes learned via ibgp", (SHOW, "route", {"protocol": "ibgp"})),
+    ("show static routes on leaf01", (SHOW, "route", {"hostname": "leaf01", "protocol": "static"})),
+    ("show routes in vrf default", (SHOW, "route", {"vrf": "default"})),
+    ("show ospf neighbors that are not full", (SHOW, "ospf", {"adjState": "!full"})),
+    ("show lldp neighbors on spine01", (SHOW, "lldp", {"hostname": "spine01"})),
+    ("show mac addresses in vlan 10", (SHOW, "mac", {"vlan": "10"})),
+    ("list vlans", (SHOW, "vlan", {})),
+    ("show evpn vnis", (SHOW, "evpnVni", {})),
+    ("show file system usage above 80", (SHOW, "fs", {"usedPercent": "> 80"})),
+    # Left to the LLM: time windows, follow-ups, several tables, reasoning, unknown words
+    ("interfaces that went down in the last hour", None),
+    ("what changed in bgp since yesterday", None),
+    ("what about those?", None),
+    ("and on spine01?", None),
+    ("why is bgp down on leaf01", None),
+    ("compare ospf and bgp sessions", None),
+    ("show bgp routes", None),
+    ("summarize down interfaces", None),
+    ("is my network healthy", None),
+    ("show me the weather", None),
+    ("which interfaces have the most errors", None),
+    ("show ospf routes", None),
+    # "in <name>" is a namespace only if it is a known one
+    ("show interfaces in leaf-01", None),
+    ("show bgp sessions in dc1.fabric", None),
+    # Addresses are route prefixes only
+    ("show bgp for 10.0.0.1", None),
+    ("show interfaces for 10.0.0.1/24", None),
+]
+
+
+def percentiles(values: list) -> dict:
+    """p50/p95/max of `values` (seconds) in milliseconds."""
+    if not values:
+        return {}
+    if len(values) == 1:
+        values = values * 2
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return {"p50": round(cuts[49] * 1000, 1), "p95": round(cuts[94] * 1000, 1),
+            "max": round(max(values) * 1000, 1)}
+
+
+def evaluate(repeat: int) -> dict:
+    """Hit rate, accuracy and matching time of `route_query` on the corpus."""
+    from router import route_query
+
+    hits = correct = wrong = missed = 0
+    failures = []
+    for text, expected in CORPUS:
+        intent = route_query(text)
+        got = (intent.tool, intent.table, intent.filters) if intent else None
+        hits += got is not None
+        if got == expected:
+            correct += 1
+        elif got is not None:
+            wrong += 1
+            failures.append({"question": text, "expected": expected, "got": got})
+        else:
+            missed += 1
+            failures.append({"question": text, "expected": expected, "got": None})
+
+    rounds = max(repeat, 1) * 200
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for text, _ in CORPUS:
+            route_query(text)
+    per_query_us = (time.perf_counter() - started) / (rounds * len(CORPUS)) * 1e6
+
+    routable = sum(expected is not None for _, expected in CORPUS)
+    return {
+        "questions": len(CORPUS),
+        "routable": routable,
+        "hits": hits,
+        "hit_rate": round(hits / len(CORPUS), 3),
+        "accuracy": round(correct / len(CORPUS), 3),
+        "wrong_routes": wrong,
+        "missed_routes": missed,
+        "route_query_us": round(per_query_us, 1),
+        "failures": failures,
+    }
+
+
+async def end_to_end(args) -> dict:
+    """Latency of the corpus questions through the graph, with and without the router."""
+    from langchain_core.messages import HumanMessage
+    from langgraph.checkpoint.memory import MemorySaver
+
+    import app
+    import client
+    from router import route_query, router_stats
+
+    client.pool.connection["env"] = {**os.environ, "FAKE_SUZIEQ_LATENCY": str(args.server_latency)}
+    all_tools = [*app.local_tools, *(await client.get_tools() or [])]
+    await client.start_mcp_pool()
+    app.llm_with_tools = app.small_llm_with_tools = ScriptedChatModel(latency=args.llm_latency)
+
+    graphs = {}
+    for enabled in (True, False):
+        app.ROUTER_ENABLED = enabled
+        graphs[enabled] = app.build_graph(all_tools, MemorySaver())
+
+    # fast_path: routed questions with the router; llm_planned: the same questions without it;
+    # fallback: questions the router leaves to the LLM (includes the router's overhead)
+    timings = {"fast_path": [], "llm_planned": [], "fallback": []}
+    try:
+        for round_ in range(args.repeat):
+            for index, (text, _) in enumerate(CORPUS):
+                routed = route_query(text) is not None
+                for enabled, graph in graphs.items():
+                    if not (enabled or routed):
+                        continue
+                    config = {"configurable": {"thread_id": f"router-{enabled}-{round_}-{index}"}}
+                    started = time.perf_counter()
+                    await graph.ainvoke({"messages": [HumanMessage(content=text)]}, config)
+                    seconds = time.perf_counter() - started
+                    if not routed:
+                        timings["fallback"].append(seconds)
+                    else:
+                        timings["fast_path" if enabled else "llm_planned"].append(seconds)
+    finally:
+        await client.shutdown_mcp_pool()
+    return {"latency_ms": {path: percentiles(values) for path, values in timings.items()},
+            "router_stats": dict(router_stats)}
+
+
+async def main(args):
+    # Configure the app before it is imported: module-level settings read the environment.
+    os.environ["MCP_SERVER_COMMAND_PATH"] = FAKE_SERVER_PATH
+    os.environ["MCP_TOOL_SCHEMA_CACHE"] = ".cache/mcp_tool_schemas.bench.json"
+    os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+    os.environ.setdefault("ROUTER_NAMESPACES", "suzieq-demo,eos")
+    # Both paths run the same queries; the tool result cache would favour whichever runs second
+    os.environ.setdefault("TOOL_CACHE_ENABLED", "false")
+
+    quality = evaluate(args.repeat)
+    print(f"questions={quality['questions']}  routable={quality['routable']}  hits={quality['hits']}  "
+          f"hit rate={quality['hit_rate']:.0%}  accuracy={quality['accuracy']:.0%}  "
+          f"wrong={quality['wrong_routes']}  missed={quality['missed_routes']}  "
+          f"route_query={quality['route_query_us']:.1f}us")
+    for failure in quality["failures"]:
+        print(f"  {failure['question']!r}: expected {failure['expected']}, got {failure['got']}")
+
+    latency = await end_to_end(args)
+    for path, values in latency["latency_ms"].items():
+        print(f"{path:>11}  p50={values.get('p50', 0):7.1f}ms  p95={values.get('p95', 0):7.1f}ms  "
+              f"max={values.get('max', 0):7.1f}ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": {key: value for key, value in vars(args).items() if key != "output"},
+                       "routing": quality, **latency}, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=1, help="Rounds over the question set")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Seconds per scripted model reply")
+    parser.add_argument("--server-latency", type=float, default=0.05, help="Seconds per SuzieQ query")
+    parser.add_argument("--output", help="Path for JSON results")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,97 @@
+"""
+Cold-start vs warm-start benchmark.
+
+Starts fresh Python processes that import `app` and build the graph with
+`app.get_graph()`, as a Chainlit worker does on startup. A cold start has no
+MCP tool schema cache, so the SuzieQ MCP server is started to discover the
+tools. A warm start reads the schemas from the cache written by the previous
+run. Reports the import time, the time until the graph is ready and the
+duration of each startup phase.
+
+MCP_SERVER_COMMAND_PATH must point to a SuzieQ MCP server (in .env or the
+environment). The checkpointer defaults to "memory" unless CHECKPOINTER is set.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_startup --runs 3
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+CHILD = """
+import asyncio, json, time
+started = time.perf_counter()
+import app, client
+imported = time.perf_counter() - started
+
+async def run():
+    await app.get_graph()
+    await client.shutdown_mcp_pool()
+
+asyncio.run(run())
+print(json.dumps({
+    "import_seconds": round(imported, 4),
+    "ready_seconds": round(time.perf_counter() - started, 4),
+    "phases": app.startup_timings,
+}))
+"""
+
+
+def start_once(env: dict) -> dict:
+    result = subprocess.run([sys.executable, "-c", CHILD], env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Startup failed:\n{result.stderr or result.stdout}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def summarize(mode: str, runs: list) -> dict:
+    phases = sorted({name for run in runs for name in run["phases"]})
+    return {
+        "mode": mode,
+        "runs": len(runs),
+        "import_seconds": round(statistics.median(run["import_seconds"] for run in runs), 3),
+        "ready_seconds": round(statistics.median(run["ready_seconds"] for run in runs), 3),
+        "phases": {
+            name: round(statistics.median(run["phases"].get(name, 0.0) for run in runs), 3)
+            for name in phases
+        },
+    }
+
+
+def main(args):
+    if not os.getenv("MCP_SERVER_COMMAND_PATH"):
+        from dotenv import load_dotenv
+        load_dotenv()
+    if not os.getenv("MCP_SERVER_COMMAND_PATH"):
+        sys.exit("MCP_SERVER_COMMAND_PATH is not set; point it to a SuzieQ MCP server.")
+
+    cache_path = os.path.join(tempfile.mkdtemp(prefix="bench-startup-"), "mcp_tool_schemas.json")
+    env = dict(os.environ, MCP_TOOL_SCHEMA_CACHE=cache_path)
+    env.setdefault("CHECKPOINTER", "memory")
+    env.setdefault("OPENROUTER_API_KEY", "benchmark")
+
+    cold, warm = [], []
+    for _ in range(args.runs):
+        if os.path.exists(cache_path):
+            os.remove(cache_path)
+        cold.append(start_once(env))
+        warm.append(start_once(env))
+
+    results = [summarize("cold", cold), summarize("warm", warm)]
+    for r in results:
+        phases = "  ".join(f"{name}={seconds:.3f}s" for name, seconds in r["phases"].items())
+        print(f"{r['mode']:>4}: import={r['import_seconds']:.3f}s  ready={r['ready_seconds']:.3f}s  {phases}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="Cold and warm starts to measure (median is reported)")
+    parser.add_argument("--output", help="Optional path for JSON results")
+    main(parser.parse_args())
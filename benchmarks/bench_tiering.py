@@ -0,0 +1,322 @@
+"""
+Model tiering benchmark and answer quality eval (tiering.py).
+
+Runs the assistant node over an eval set of single turns. Each case is a
+question, optionally with the tool calls and results already in the turn,
+and gives:
+- the tier the policy should pick;
+- what a good reply contains. For a plan turn, these are the SuzieQ tables
+  it must query. For an answer turn, these are facts from the results it
+  must state; each fact is a list of accepted spellings.
+
+Every case runs twice: with tiering, and with the large model only
+(the baseline). Reported per tier: LLM calls, latency, tokens and cost,
+plus escalations and the routing accuracy of the policy. Each turn is also
+compared with its baseline for latency and cost. The node is streamed like
+in the app, and for replies with text the time to the first token the user
+sees is reported: checked small-model replies are held back for their first
+TIER_STREAM_HOLD_CHARS characters.
+
+By default the run is offline. Both tiers are the scripted model from
+benchmarks/fakes.py with `--small-latency` and `--large-latency` per reply
+and `--token-latency` per streamed word.
+Cost is estimated from the token counts and `--small-price` and
+`--large-price`. Scripted replies do not answer the questions, so quality is
+only graded with `--live`. `--live` calls the models configured by
+SMALL_MODEL and LARGE_MODEL on OpenRouter and uses the cost OpenRouter
+reports. It grades every reply and exits with status 1 if the pass rate with
+tiering is more than `--max-quality-drop` below the baseline.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_tiering
+    python -m benchmarks.bench_tiering --live --output tiering.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+from benchmarks.fakes import FAKE_SERVER_PATH, ScriptedChatModel
+
+
+def bgp_rows(hostname: str = "leaf01") -> list:
+    return [
+        {"namespace": "dc1", "hostname": hostname, "vrf": "default", "peer": "10.0.0.1", "peerHostname": "spine01",
+         "state": "Established", "asn": 65011, "peerAsn": 65000, "estdTime": "2026-10-15 08:12:40"},
+        {"namespace": "dc1", "hostname": hostname, "vrf": "default", "peer": "10.0.0.2", "peerHostname": "spine02",
+         "state": "NotEstd", "asn": 65011, "peerAsn": 65000, "estdTime": "2026-10-16 22:03:11"},
+    ]
+
+
+def interface_rows(count: int = 6) -> list:
+    states = ["down", "up", "up", "down", "up", "down"]
+    return [{"namespace": "dc1", "hostname": "leaf01", "ifname": f"swp{i + 1}", "state": states[i % len(states)],
+             "adminState": "up", "type": "ethernet", "mtu": 9216,
+             "speed": 100000 if i % 2 else 25000} for i in range(count)]
+
+
+DEVICE_ROWS = [
+    {"namespace": "dc1", "hostname": "spine01", "model": "vEOS", "version": "4.31.1F", "vendor": "Arista",
+     "status": "alive", "bootupTimestamp": "2026-09-30 04:00:00"},
+    {"namespace": "dc1", "hostname": "spine02", "model": "vEOS", "version": "4.31.1F", "vendor": "Arista",
+     "status": "alive", "bootupTimestamp": "2026-10-16 21:58:02"},
+    {"namespace": "dc1", "hostname": "leaf01", "model": "VX", "version": "5.9.1", "vendor": "Cumulus",
+     "status": "alive", "bootupTimestamp": "2026-09-30 04:02:10"},
+    {"namespace": "dc1", "hostname": "leaf02", "model": "VX", "version": "5.9.1", "vendor": "Cumulus",
+     "status": "dead", "bootupTimestamp": "2026-09-30 04:02:12"},
+]
+MAC_ROWS = [{"namespace": "dc1", "hostname": "leaf01", "vlan": 10, "macaddr": f"44:38:39:00:00:{i:02x}",
+             "oif": f"swp{i}", "flags": "dynamic"} for i in range(1, 4)]
+LLDP_ROWS = [{"namespace": "dc1", "hostname": "leaf02", "ifname": "swp51", "peerHostname": "spine01",
+              "peerIfname": "Ethernet3"},
+             {"namespace": "dc1", "hostname": "leaf02", "ifname": "swp52", "peerHostname": "spine02",
+              "peerIfname": "Ethernet3"}]
+
+# name, question, tool results already in the turn {table: rows or error text}, expected tier,
+# tables a plan must query, facts an answer must state (each a list of accepted spellings)
+EVAL_SET = [
+    # Plan turns: one table, a lookup
+    ("plan_bgp", "show bgp sessions on leaf01", None, "small", ["bgp"], []),
+    ("plan_interfaces_down", "list interfaces that are down", None, "small", ["interface"], []),
+    ("plan_uptime", "what's the uptime of spine01", None, "small", ["device"], []),
+    ("plan_mac", "show mac addresses in vlan 10", None, "small", ["mac"], []),
+    ("plan_window", "interfaces that went down in the last hour", None, "small", ["interface"], []),
+    ("plan_ospf", "show ospf neighbors", None, "small", ["ospf"], []),
+    ("plan_route", "show routes for 10.0.0.0/24", None, "small", ["route"], []),
+    # Plan turns that need reasoning or several tables
+    ("plan_why", "why is bgp down between leaf01 and spine02", None, "large", ["bgp"], []),
+    ("plan_compare", "compare ospf and bgp sessions on spine02", None, "large", ["ospf", "bgp"], []),
+    ("plan_two_tables", "show lldp neighbors and interfaces of leaf02", None, "large", ["lldp", "interface"], []),
+    # Answer turns: small results of one table
+    ("answer_bgp", "show bgp sessions on leaf01", {"bgp": bgp_rows()}, "small", [],
+     [["10.0.0.2", "spine02"], ["notestd", "not established", "down", "idle"]]),
+    ("answer_devices", "list devices", {"device": DEVICE_ROWS}, "small", [],
+     [["spine01"], ["spine02"], ["leaf01"], ["leaf02"]]),
+    ("answer_count_down", "how many interfaces are down on leaf01", {"interface": interface_rows()}, "small", [],
+     [["3", "three"]]),
+    ("answer_dead", "which devices are not alive", {"device": DEVICE_ROWS}, "small", [], [["leaf02"]]),
+    ("answer_mac", "show mac addresses in vlan 10", {"mac": MAC_ROWS}, "small", [],
+     [["44:38:39:00:00:01"], ["swp1"]]),
+    # Answer turns that need the large model
+    ("answer_large_result", "list all interfaces on leaf01", {"interface": interface_rows(240)}, "large", [],
+     [["240"]]),
+    ("answer_tool_error", "show mlag state", {"mlag": "Error: table mlag is not available in namespace dc1"},
+     "large", [], [["not available", "no mlag", "unavailable", "not collected", "isn't available"]]),
+    ("answer_two_tables", "check bgp and interfaces on leaf01",
+     {"bgp": bgp_rows(), "interface": interface_rows()}, "large", [], [["10.0.0.2", "spine02"], ["swp1"]]),
+    ("answer_why", "why did the bgp session to spine02 go down",
+     {"bgp": bgp_rows(), "device": DEVICE_ROWS}, "large", [],
+     [["reboot", "rebooted", "restarted", "21:58", "bootup", "boot"]]),
+]
+
+
+def turn_messages(question: str, results: dict | None) -> list:
+    """Conversation of one eval case: the question, then the tool calls and results if any."""
+    from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+    messages = [HumanMessage(content=question)]
+    if results:
+        calls = [{"id": f"call_{table}", "name": "run_suzieq_show", "args": {"table": table, "namespace": "dc1"}}
+                 for table in results]
+        messages.append(AIMessage(content="", tool_calls=calls))
+        for call, value in zip(calls, results.values()):
+            error = isinstance(value, str)
+            messages.append(ToolMessage(content=value if error else json.dumps(value), tool_call_id=call["id"],
+                                        name=call["name"], status="error" if error else "success"))
+    return messages
+
+
+def grade(reply, tables: list, facts: list) -> bool:
+    """Whether a reply queries all `tables` and states all `facts`."""
+    if tables:
+        queried = {str(call["args"].get("table", "")) for call in reply.tool_calls}
+        return set(tables) <= queried
+    text = reply.content if isinstance(reply.content, str) else json.dumps(reply.content)
+    return all(any(spelling.lower() in text.lower() for spelling in fact) for fact in facts)
+
+
+def percentiles(values: list) -> dict:
+    if not values:
+        return {}
+    return {"p50": round(statistics.median(values) * 1000, 1), "max": round(max(values) * 1000, 1)}
+
+
+def parse_price(value: str) -> tuple:
+    """ "input,output" USD per million tokens."""
+    price_in, price_out = value.split(",")
+    return float(price_in), float(price_out)
+
+
+def call_cost(span: dict, prices: dict) -> float:
+    """Reported cost of an LLM call, or its estimate from the token counts."""
+    if "cost" in span:
+        return span["cost"]
+    price_in, price_out = prices[span["tier"]]
+    return (span.get("input_tokens", 0) * price_in + span.get("output_tokens", 0) * price_out) / 1e6
+
+
+def assistant_graph():
+    """The assistant node alone, to stream it like the app does."""
+    from langgraph.graph import END, START, StateGraph
+
+    import app
+
+    builder = StateGraph(app.State)
+    builder.add_node("assistant", app.assistant)
+    builder.add_edge(START, "assistant")
+    builder.add_edge("assistant", END)
+    return builder.compile()
+
+
+async def stream_turn(graph, state: dict) -> tuple:
+    """Stream one turn; returns the reply and the seconds until its first token is shown (None without text)."""
+    from tiering import TIER_ESCALATE_ON_LOW_CONFIDENCE, TIER_STREAM_HOLD_CHARS, message_text
+
+    started = time.perf_counter()
+    sizes, first_token, reply = {}, {}, None
+    async for mode, chunk in graph.astream(state, stream_mode=["messages", "updates"]):
+        if mode == "updates":
+            reply = chunk["assistant"]["messages"][0]
+            continue
+        token, metadata = chunk
+        # The same hold as the UI: checked small-model replies show once this much text is in
+        checked = metadata.get("model_tier") == "small" and TIER_ESCALATE_ON_LOW_CONFIDENCE
+        sizes[token.id] = sizes.get(token.id, 0) + len(message_text(token.content))
+        if sizes[token.id] and sizes[token.id] >= (TIER_STREAM_HOLD_CHARS if checked else 0):
+            first_token.setdefault(token.id, time.perf_counter() - started)
+    if not message_text(reply.content):
+        return reply, None
+    # Replies shorter than the hold are shown when the step ends
+    return reply, first_token.get(reply.id, time.perf_counter() - started)
+
+
+async def run_case(case: tuple, tiered: bool, small, large, prices: dict) -> dict:
+    """Run the assistant node on one eval case; returns its reply, LLM calls, latency and cost."""
+    import app
+    from instrumentation import start_trace
+
+    name, question, results, expected_tier, tables, facts = case
+    app.llm_with_tools, app.small_llm_with_tools = large, (small if tiered else None)
+    trace = start_trace(case=name)
+    state = {"messages": turn_messages(question, results)}
+    reply, first_token = await stream_turn(assistant_graph(), state)
+    calls = [span for span in trace.spans if span["step"] == "llm"]
+    assistant = next(span for span in trace.spans if span["step"] == "assistant")
+    return {
+        "case": name,
+        "tier": calls[0]["tier"],
+        "reason": calls[0]["tier_reason"],
+        "expected_tier": expected_tier,
+        "escalated": len(calls) > 1,
+        "calls": [{"tier": span["tier"], "seconds": span["seconds"], "cost": call_cost(span, prices),
+                   "input_tokens": span.get("input_tokens", 0), "output_tokens": span.get("output_tokens", 0)}
+                  for span in calls],
+        "seconds": assistant["seconds"],
+        "first_token": first_token,
+        "cost": sum(call_cost(span, prices) for span in calls),
+        "passed": grade(reply, tables, facts),
+    }
+
+
+def summarize(runs: list) -> dict:
+    """Per-tier calls, latency, tokens and cost of a set of case runs."""
+    tiers = {}
+    for run in runs:
+        for call in run["calls"]:
+            tier = tiers.setdefault(call["tier"], {"calls": 0, "seconds": [], "input_tokens": 0, "output_tokens": 0,
+                                                   "cost": 0.0})
+            tier["calls"] += 1
+            tier["seconds"].append(call["seconds"])
+            tier["input_tokens"] += call["input_tokens"]
+            tier["output_tokens"] += call["output_tokens"]
+            tier["cost"] += call["cost"]
+    for tier in tiers.values():
+        tier["latency_ms"] = percentiles(tier.pop("seconds"))
+        tier["cost"] = round(tier["cost"], 6)
+    return {
+        "tiers": tiers,
+        "turn_ms": percentiles([run["seconds"] for run in runs]),
+        "first_token_ms": percentiles([run["first_token"] for run in runs if run["first_token"] is not None]),
+        "cost": round(sum(run["cost"] for run in runs), 6),
+        "passed": sum(run["passed"] for run in runs),
+    }
+
+
+async def main(args):
+    # Configure the app before it is imported: module-level settings read the environment.
+    os.environ["MCP_SERVER_COMMAND_PATH"] = FAKE_SERVER_PATH
+    os.environ["MCP_TOOL_SCHEMA_CACHE"] = ".cache/mcp_tool_schemas.bench.json"
+    os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+
+    import app
+    import client
+
+    prices = {"small": parse_price(args.small_price), "large": parse_price(args.large_price)}
+    if args.live:
+        # The real tool schemas, so the models plan calls as they would in the app
+        all_tools = [*(await client.get_tools() or []), *app.local_tools]
+        small = app.create_llm("small").bind_tools(all_tools)
+        large = app.create_llm("large").bind_tools(all_tools)
+    else:
+        small = ScriptedChatModel(latency=args.small_latency, token_latency=args.token_latency)
+        large = ScriptedChatModel(latency=args.large_latency, token_latency=args.token_latency)
+
+    runs = {"tiered": [], "baseline": []}
+    for case in EVAL_SET:
+        for mode in runs:
+            runs[mode].append(await run_case(case, mode == "tiered", small, large, prices))
+    results = {mode: summarize(mode_runs) for mode, mode_runs in runs.items()}
+    tiered, baseline = runs["tiered"], runs["baseline"]
+
+    for mode, summary in results.items():
+        for tier, stats in sorted(summary["tiers"].items()):
+            print(f"{mode:>8} {tier:>5}  calls={stats['calls']:3d}  p50={stats['latency_ms']['p50']:7.1f}ms  "
+                  f"tokens in/out={stats['input_tokens']}/{stats['output_tokens']}  cost=${stats['cost']:.4f}")
+        print(f"{mode:>8} total  turn p50={summary['turn_ms']['p50']:7.1f}ms  "
+              f"first token p50={summary['first_token_ms'].get('p50', 0):7.1f}ms  cost=${summary['cost']:.4f}"
+              + (f"  passed={summary['passed']}/{len(EVAL_SET)}" if args.live else ""))
+    routed = sum(run["tier"] == run["expected_tier"] for run in tiered)
+    escalated = [run["case"] for run in tiered if run["escalated"]]
+    print(f"tier routing {routed}/{len(EVAL_SET)} as expected, escalations: {escalated or 'none'}")
+    for run in tiered:
+        if run["tier"] != run["expected_tier"]:
+            print(f"  {run['case']}: {run['tier']} ({run['reason']}), expected {run['expected_tier']}")
+    print(f"with tiering: cost {results['tiered']['cost'] / max(results['baseline']['cost'], 1e-12):.0%} "
+          f"and turn p50 {results['tiered']['turn_ms']['p50'] / max(results['baseline']['turn_ms']['p50'], 1e-9):.0%}"
+          f", first token p50 {results['tiered']['first_token_ms'].get('p50', 0) / max(results['baseline']['first_token_ms'].get('p50', 0), 1e-9):.0%}"
+          " of the large model only")
+
+    status = 0
+    if args.live:
+        for run, base in zip(tiered, baseline):
+            if run["passed"] != base["passed"]:
+                print(f"  {run['case']}: {'passed' if run['passed'] else 'failed'} with tiering ({run['tier']}), "
+                      f"{'passed' if base['passed'] else 'failed'} with the large model")
+        drop = (results["baseline"]["passed"] - results["tiered"]["passed"]) / len(EVAL_SET)
+        status = int(drop > args.max_quality_drop)
+        print(f"quality {'dropped' if status else 'holds'}: {results['tiered']['passed']} vs "
+              f"{results['baseline']['passed']} of {len(EVAL_SET)} cases passed")
+    else:
+        print("replies are scripted, so quality is not graded (use --live)")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(args), "results": results, "runs": runs}, f, indent=2)
+    return status
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--live", action="store_true", help="Call the configured models on OpenRouter")
+    parser.add_argument("--small-latency", type=float, default=0.4, help="Seconds per scripted small model reply")
+    parser.add_argument("--large-latency", type=float, default=1.5, help="Seconds per scripted large model reply")
+    parser.add_argument("--token-latency", type=float, default=0.02, help="Seconds per streamed scripted word")
+    parser.add_argument("--small-price", default="0.8,4", help="Small model USD per million input,output tokens")
+    parser.add_argument("--large-price", default="3,15", help="Large model USD per million input,output tokens")
+    parser.add_argument("--max-quality-drop", type=float, default=0.05,
+                        help="Largest allowed drop of the pass rate with tiering (--live)")
+    parser.add_argument("--output", help="Path for JSON results")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,209 @@
+"""
+Throughput scaling with the number of worker processes, fully offline.
+
+For each value of `--workers`, starts that many worker processes. Each has
+its own graph and MCP session pool, like the processes started by
+workers.py, and all share a SQLite checkpointer and a SQLite shared cache.
+`--chats` chats then run `--turns` questions each. Turn t of chat c runs on
+worker (c + t) % workers, so every chat moves between workers and relies on
+resuming its thread from the shared checkpoints. At the end the message
+count of every thread is checked.
+
+The model is the scripted one from benchmarks/fakes.py and SuzieQ is the
+stand-in server. Most of the work per request is therefore local CPU time
+(JSON, shaping, checkpoints), which is what additional workers parallelize.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_workers --workers 1 2 4 --chats 32 --turns 3 --rows 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.fakes import FAKE_SERVER_PATH, ScriptedChatModel
+
+# Lines of the worker protocol start with this marker; anything else is app output
+MARKER = "@@ "
+TABLES = ["device", "interface", "bgp", "route", "ospf", "lldp", "mac"]
+
+
+def question(chat: int, turn: int) -> str:
+    return f"question {turn} about {TABLES[(chat + turn) % len(TABLES)]}"
+
+
+async def serve(args):
+    """Worker process: run the turns the parent sends on stdin, reply on stdout."""
+    os.environ["MCP_SERVER_COMMAND_PATH"] = FAKE_SERVER_PATH
+    os.environ["MCP_TOOL_SCHEMA_CACHE"] = ".cache/mcp_tool_schemas.bench.json"
+    os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+
+    from langchain_core.messages import HumanMessage
+
+    import app
+    import client
+
+    def reply(message: dict):
+        sys.stdout.write(MARKER + json.dumps(message) + "\n")
+        sys.stdout.flush()
+
+    client.pool.connection["env"] = {
+        **os.environ, "FAKE_SUZIEQ_ROWS": str(args.rows), "FAKE_SUZIEQ_LATENCY": str(args.server_latency),
+    }
+    graph = await app.get_graph()
+    await client.start_mcp_pool()
+    app.llm_with_tools = app.small_llm_with_tools = ScriptedChatModel(latency=args.llm_latency)
+    reply({"ready": os.getpid()})
+
+    async def turn(chat: int, number: int) -> float:
+        started = time.perf_counter()
+        await graph.ainvoke({"messages": [HumanMessage(content=question(chat, number))]},
+                            {"configurable": {"thread_id": f"{args.run_id}-{chat}"}})
+        return time.perf_counter() - started
+
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            line = await loop.run_in_executor(None, sys.stdin.readline)
+            if not line:
+                break
+            command = json.loads(line)
+            if "turn" in command:
+                outcomes = await asyncio.gather(*(turn(chat, command["turn"]) for chat in command["chats"]),
+                                                return_exceptions=True)
+                reply({"seconds": [o for o in outcomes if not isinstance(o, Exception)],
+                       "errors": [repr(o) for o in outcomes if isinstance(o, Exception)]})
+            elif "check" in command:
+                counts = {}
+                for chat in command["check"]:
+                    state = await graph.aget_state({"configurable": {"thread_id": f"{args.run_id}-{chat}"}})
+                    counts[chat] = len(state.values.get("messages", []))
+                reply({"counts": counts, "tool_cache": client.tool_cache_stats(),
+                       "shared_store": client.shared_store_stats()})
+            else:
+                break
+    finally:
+        await client.shutdown_mcp_pool()
+        await app.close_checkpointer()
+        await client.close_shared_store()
+
+
+class Worker:
+    """Parent-side handle of a worker process."""
+
+    def __init__(self, process):
+        self.process = process
+
+    async def send(self, command: dict):
+        self.process.stdin.write((json.dumps(command) + "\n").encode())
+        await self.process.stdin.drain()
+
+    async def receive(self) -> dict:
+        while True:
+            line = await self.process.stdout.readline()
+            if not line:
+                raise RuntimeError(f"worker {self.process.pid} exited")
+            text = line.decode()
+            if text.startswith(MARKER):
+                return json.loads(text[len(MARKER):])
+
+
+async def run_level(args, workers: int, directory: str) -> dict:
+    run_id = f"w{workers}"
+    env = {
+        **os.environ,
+        "CYBERTRACE_WORKERS": str(workers),
+        "CHECKPOINTER": "sqlite",
+        "CHECKPOINT_SQLITE_PATH": os.path.join(directory, f"checkpoints-{run_id}.sqlite"),
+        "SHARED_CACHE": "none" if args.no_shared_cache else "sqlite",
+        "SHARED_CACHE_SQLITE_PATH": os.path.join(directory, f"shared-{run_id}.sqlite"),
+    }
+    command = [sys.executable, "-m", "benchmarks.bench_workers", "--serve", "--run-id", run_id,
+               "--rows", str(args.rows), "--llm-latency", str(args.llm_latency),
+               "--server-latency", str(args.server_latency)]
+    pool = []
+    for _ in range(workers):
+        process = await asyncio.create_subprocess_exec(*command, env=env, stdin=asyncio.subprocess.PIPE,
+                                                       stdout=asyncio.subprocess.PIPE,
+                                                       stderr=asyncio.subprocess.DEVNULL)
+        pool.append(Worker(process))
+    try:
+        await asyncio.gather(*(worker.receive() for worker in pool))
+
+        seconds, errors = [], []
+        started = time.perf_counter()
+        for number in range(args.turns):
+            for index, worker in enumerate(pool):
+                chats = [chat for chat in range(args.chats) if (chat + number) % workers == index]
+                await worker.send({"turn": number, "chats": chats})
+            for result in await asyncio.gather(*(worker.receive() for worker in pool)):
+                seconds.extend(result["seconds"])
+                errors.extend(result["errors"])
+        elapsed = time.perf_counter() - started
+
+        await pool[0].send({"check": list(range(args.chats))})
+        check = await pool[0].receive()
+        # Each turn adds the question, the tool call, the tool result and the answer
+        expected = 4 * args.turns
+        resumed = sum(count == expected for count in check["counts"].values())
+    finally:
+        for worker in pool:
+            if worker.process.returncode is None:
+                try:
+                    await worker.send({"quit": True})
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+        await asyncio.gather(*(worker.process.wait() for worker in pool))
+
+    cuts = statistics.quantiles(seconds, n=100, method="inclusive") if len(seconds) > 1 else seconds * 99
+    return {
+        "workers": workers,
+        "requests": len(seconds),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(seconds) / elapsed, 2),
+        "latency_ms": {"p50": round(cuts[49] * 1000, 1), "p95": round(cuts[94] * 1000, 1)},
+        "threads_resumed": f"{resumed}/{args.chats}",
+        "shared_store_worker0": check["shared_store"],
+    }
+
+
+async def main(args):
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for workers in args.workers:
+            r = await run_level(args, workers, directory)
+            results.append(r)
+            speedup = r["throughput_rps"] / results[0]["throughput_rps"]
+            print(f"workers={workers:>2}  requests={r['requests']:>4}  errors={r['errors']}  "
+                  f"throughput={r['throughput_rps']:6.2f} req/s ({speedup:.2f}x)  "
+                  f"p50={r['latency_ms']['p50']:7.1f}ms  p95={r['latency_ms']['p95']:7.1f}ms  "
+                  f"threads resumed={r['threads_resumed']}")
+            if r["first_error"]:
+                print(f"  first error: {r['first_error']}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": {k: v for k, v in vars(args).items() if k not in ("output", "serve")},
+                       "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Worker counts to measure")
+    parser.add_argument("--chats", type=int, default=32, help="Concurrent chats")
+    parser.add_argument("--turns", type=int, default=3, help="Questions per chat")
+    parser.add_argument("--rows", type=int, default=2000, help="Rows in each synthetic SuzieQ table")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Seconds per scripted model reply")
+    parser.add_argument("--server-latency", type=float, default=0.0, help="Seconds per SuzieQ query")
+    parser.add_argument("--no-shared-cache", action="store_true", help="Run without the shared cache")
+    parser.add_argument("--output", help="Path for JSON results")
+    # Internal: run as one of the worker processes
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--run-id", default="bench", help=argparse.SUPPRESS)
+    parsed = parser.parse_args()
+    asyncio.run(serve(parsed) if parsed.serve else main(parsed))
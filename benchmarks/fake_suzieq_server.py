@@ -0,0 +1,150 @@
+"""
+Stand-in SuzieQ MCP server for benchmarks.
+
+Exposes `run_suzieq_show` and `run_suzieq_summarize` with the same signatures
+as the real server and answers with synthetic tables, so the pipeline can be
+measured without a network or a SuzieQ installation. Rows are deterministic
+for a given table and size. With a `start_time` filter, run_suzieq_show
+returns one change row per FAKE_SUZIEQ_CHANGE_INTERVAL seconds of the window,
+each determined by its timestamp, so any split of a window yields the same rows.
+
+Environment:
+    FAKE_SUZIEQ_ROWS             Rows returned by run_suzieq_show before filtering (default 200)
+    FAKE_SUZIEQ_LATENCY          Seconds each call takes (default 0.05)
+    FAKE_SUZIEQ_CHANGE_INTERVAL  Seconds between change rows in time windows (default 10)
+"""
+import asyncio
+import json
+import os
+import math
+import random
+import re
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from mcp.server.fastmcp import FastMCP
+
+ROWS = int(os.getenv("FAKE_SUZIEQ_ROWS", "200"))
+LATENCY = float(os.getenv("FAKE_SUZIEQ_LATENCY", "0.05"))
+CHANGE_INTERVAL = float(os.getenv("FAKE_SUZIEQ_CHANGE_INTERVAL", "10"))
+
+# Table-specific columns: name -> list of possible values
+TABLE_COLUMNS = {
+    "device": {"model": ["vEOS", "VX", "QFX5100", "N9K-C9300v"], "vendor": ["Arista", "Cumulus", "Juniper", "Cisco"],
+               "version": ["4.23.5M", "4.2.1", "20.4R1", "9.3(8)"], "status": ["alive", "alive", "alive", "dead"]},
+    "interface": {"ifname": [f"Ethernet{i}" for i in range(1, 49)], "state": ["up", "up", "up", "down"],
+                  "adminState": ["up", "up", "down"], "type": ["ethernet", "bond", "vlan", "loopback"],
+                  "mtu": [1500, 9000, 9216]},
+    "bgp": {"vrf": ["default", "evpn-vrf", "mgmt"], "peer": [f"swp{i}" for i in range(1, 9)],
+            "state": ["Established", "Established", "Established", "NotEstd"], "asn": [65001, 65002, 65101],
+            "peerAsn": [65000, 65011, 65201], "afiSafi": ["ipv4 unicast", "l2vpn evpn"]},
+    "ospf": {"vrf": ["default"], "ifname": [f"swp{i}" for i in range(1, 9)], "area": ["0.0.0.0", "0.0.0.1"],
+             "state": ["full", "full", "down"], "adjState": ["full", "full", "init"]},
+    "route": {"vrf": ["default", "evpn-vrf"], "prefix": [f"10.{i}.0.0/24" for i in range(64)],
+              "protocol": ["bgp", "ospf", "connected", "static"]},
+    "mac": {"vlan": [10, 20, 30, 4001], "oif": ["bond01", "bond02", "vni13", "peerlink"], "flags": ["", "remote"]},
+    "lldp": {"ifname": [f"swp{i}" for i in range(1, 9)], "peerIfname": [f"swp{i}" for i in range(1, 9)]},
+}
+NAMESPACES = ["dual-evpn", "ospf-ibgp", "eos"]
+
+
+def make_rows(table: str, count: int) -> list:
+    """Deterministic synthetic rows for `table`."""
+    rnd = random.Random(f"{table}-{count}")
+    columns = TABLE_COLUMNS.get(table, {"state": ["up", "down"]})
+    now_ms = 1_700_000_000_000
+    rows = []
+    for i in range(count):
+        row = {
+            "namespace": NAMESPACES[i % len(NAMESPACES)],
+            "hostname": f"leaf{i % 32:02d}" if i % 4 else f"spine{i % 8:02d}",
+        }
+        for column, values in columns.items():
+            row[column] = rnd.choice(values)
+        if "peer" in row or table in ("lldp", "ospf"):
+            row["peerHostname"] = f"spine{rnd.randrange(8):02d}"
+        row["timestamp"] = now_ms - rnd.randrange(3_600_000)
+        row["active"] = True
+        rows.append(row)
+    return rows
+
+
+def window_seconds(value, now: float) -> float:
+    """Epoch seconds of "now", "<n> <unit>s ago" or an ISO datetime (UTC)."""
+    text = str(value).strip().lower()
+    if text == "now":
+        return now
+    match = re.match(r"^(\d+)\s*(second|minute|hour|day)s?\s+ago$", text)
+    if match:
+        return now - int(match.group(1)) * {"second": 1, "minute": 60, "hour": 3600, "day": 86400}[match.group(2)]
+    parsed = datetime.fromisoformat(str(value).strip())
+    return (parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)).timestamp()
+
+
+def make_change_rows(table: str, start: float, end: float) -> list:
+    """One change row per CHANGE_INTERVAL seconds in [start, end], determined by its timestamp."""
+    columns = TABLE_COLUMNS.get(table, {"state": ["up", "down"]})
+    rows = []
+    for step in range(math.ceil(start / CHANGE_INTERVAL), math.floor(end / CHANGE_INTERVAL) + 1):
+        rnd = random.Random(f"{table}-change-{step}")
+        row = {"namespace": rnd.choice(NAMESPACES), "hostname": f"leaf{rnd.randrange(32):02d}"}
+        for column, values in columns.items():
+            row[column] = rnd.choice(values)
+        row["timestamp"] = int(step * CHANGE_INTERVAL * 1000)
+        rows.append(row)
+    return rows
+
+
+def apply_filters(rows: list, filters: Optional[Dict[str, Any]]) -> list:
+    """Keep rows whose columns equal the filter values (other filters are ignored)."""
+    for key, value in (filters or {}).items():
+        if rows and key in rows[0]:
+            rows = [row for row in rows if str(row[key]) == str(value)]
+    return rows
+
+
+mcp = FastMCP("suzieq-fake")
+
+
+@mcp.tool()
+async def run_suzieq_show(table: str, filters: Optional[Dict[str, Any]] = None) -> str:
+    """Runs a SuzieQ 'show' query and returns the rows as a JSON string.
+
+    Args:
+        table: The SuzieQ table to query (e.g. device, interface, bgp, route).
+        filters: Optional dictionary of column filters.
+    """
+    await asyncio.sleep(LATENCY)
+    if filters and filters.get("start_time"):
+        now = time.time()
+        rows = make_change_rows(table, window_seconds(filters["start_time"], now),
+                                window_seconds(filters.get("end_time", "now"), now))
+    else:
+        rows = make_rows(table, ROWS)
+    rows = apply_filters(rows, filters)
+    if filters and filters.get("columns"):
+        columns = filters["columns"]
+        rows = [{k: v for k, v in row.items() if k in columns} for row in rows]
+    return json.dumps(rows)
+
+
+@mcp.tool()
+async def run_suzieq_summarize(table: str, filters: Optional[Dict[str, Any]] = None) -> str:
+    """Runs a SuzieQ 'summarize' query and returns the summary as a JSON string.
+
+    Args:
+        table: The SuzieQ table to summarize.
+        filters: Optional dictionary of column filters.
+    """
+    await asyncio.sleep(LATENCY)
+    rows = apply_filters(make_rows(table, ROWS), filters)
+    summary = {"rows": len(rows), "collected_at": int(time.time() * 1000)}
+    for column in TABLE_COLUMNS.get(table, {}):
+        summary[f"{column}Cnt"] = dict(Counter(str(row[column]) for row in rows).most_common(10))
+    return json.dumps(summary)
+
+
+if __name__ == "__main__":
+    mcp.run()
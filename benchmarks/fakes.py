@@ -0,0 +1,128 @@
+"""
+Stand-ins used by the benchmarks instead of OpenRouter and a live SuzieQ server.
+"""
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, List, Optional
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+FAKE_SERVER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_suzieq_server.py")
+
+TABLES = ["device", "interface", "bgp", "ospf", "route", "mac", "lldp"]
+
+
+@contextmanager
+def temp_files_directory():
+    """Persist Chainlit element files in a temporary directory instead of the repository's .files."""
+    import chainlit.config
+
+    original = chainlit.config.FILES_DIRECTORY
+    path = tempfile.mkdtemp(prefix="cybertrace-bench-files-")
+    chainlit.config.FILES_DIRECTORY = Path(path)
+    try:
+        yield path
+    finally:
+        chainlit.config.FILES_DIRECTORY = original
+        shutil.rmtree(path, ignore_errors=True)
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Chat model that follows a fixed script instead of calling an LLM.
+
+    When the last message is a user question it asks for `tool_calls` SuzieQ
+    queries. The first table is named in the question or picked from the
+    question's hash. Once the tool results are in, it answers with
+    `answer_words` words. Every reply waits `latency` seconds, and streamed
+    replies also wait `token_latency` seconds per word. Usage metadata is
+    estimated from the messages.
+    """
+
+    latency: float = 0.2
+    token_latency: float = 0.0
+    tool_calls: int = 1
+    answer_words: int = 60
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-fake"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _reply(self, messages: List[BaseMessage]) -> AIMessage:
+        usage = {"input_tokens": count_tokens_approximately(messages)}
+        last = messages[-1]
+        if isinstance(last, HumanMessage):
+            # The question is the last block; the blocks before it hold query examples
+            text = last.content if isinstance(last.content, str) else str(last.content[-1].get("text", ""))
+            first = next((t for t in TABLES if t in text), TABLES[zlib.crc32(text.encode()) % len(TABLES)])
+            tables = [TABLES[(TABLES.index(first) + i) % len(TABLES)] for i in range(self.tool_calls)]
+            calls = [
+                {"id": f"call_{i}_{time.perf_counter_ns()}", "name": "run_suzieq_show", "args": {"table": table}}
+                for i, table in enumerate(tables)
+            ]
+            usage["output_tokens"] = 20 * len(calls)
+            usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+            return AIMessage(content="", tool_calls=calls, usage_metadata=usage)
+        words = " ".join(f"word{i}" for i in range(self.answer_words))
+        usage["output_tokens"] = self.answer_words
+        usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+        return AIMessage(content=f"Summary of the results: {words}", usage_metadata=usage)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._reply(messages))])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._reply(messages))])
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency)
+        reply = self._reply(messages)
+        if reply.tool_calls:
+            chunks = [AIMessageChunk(content="", tool_call_chunks=[
+                {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": i}
+                for i, call in enumerate(reply.tool_calls)
+            ])]
+        else:
+            chunks = [AIMessageChunk(content=word + " ") for word in reply.content.split(" ")]
+        chunks[-1].usage_metadata = reply.usage_metadata
+        for chunk in chunks:
+            if self.token_latency:
+                await asyncio.sleep(self.token_latency)
+            yield ChatGenerationChunk(message=chunk)
@@ -0,0 +1,102 @@
+"""
+Load test for the assistant node.
+
+Runs the graph from `app.get_graph()` with a stand-in chat model that answers after a
+fixed (async) delay, and reports throughput at increasing numbers of concurrent
+chat sessions. With a non-blocking assistant node, throughput should grow with
+concurrency until LLM_MAX_CONCURRENCY is reached.
+
+Usage (from the repository root):
+    python -m benchmarks.load_test --latency 0.5 --sessions 1 2 4 8 16
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Any, List, Optional
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+# get_graph() builds a ChatOpenAI client, which needs some API key.
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+import app  # noqa: E402
+
+
+class SlowFakeChatModel(BaseChatModel):
+    """Chat model that replies with a fixed answer after `latency` seconds."""
+
+    latency: float = 0.5
+
+    @property
+    def _llm_type(self) -> str:
+        return "slow-fake"
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="ok"))])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="ok"))])
+
+
+async def run_sessions(graph, sessions: int, turns: int) -> float:
+    """Run `sessions` concurrent chats of `turns` questions each; return wall time."""
+
+    async def chat(thread_id: str):
+        config = {"configurable": {"thread_id": thread_id}}
+        for turn in range(turns):
+            await graph.ainvoke({"messages": [HumanMessage(content=f"question {turn}")]}, config)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(chat(f"load-{sessions}-{i}") for i in range(sessions)))
+    return time.perf_counter() - started
+
+
+async def main(args):
+    graph = await app.get_graph()
+    app.llm_with_tools = app.small_llm_with_tools = SlowFakeChatModel(latency=args.latency)
+    results = []
+    for sessions in args.sessions:
+        elapsed = await run_sessions(graph, sessions, args.turns)
+        requests = sessions * args.turns
+        results.append({
+            "sessions": sessions,
+            "requests": requests,
+            "seconds": round(elapsed, 3),
+            "throughput_rps": round(requests / elapsed, 2),
+        })
+        print(f"sessions={sessions:>3}  requests={requests:>4}  "
+              f"time={elapsed:6.2f}s  throughput={requests / elapsed:6.2f} req/s")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"llm_max_concurrency": app.LLM_MAX_CONCURRENCY, "results": results}, f, indent=2)
+    await app.close_checkpointer()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.5, help="Simulated LLM latency in seconds")
+    parser.add_argument("--turns", type=int, default=3, help="Questions per chat session")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--output", help="Optional path for JSON results")
+    asyncio.run(main(parser.parse_args()))
@@ -1,8 +1,31 @@
+import asyncio
+import contextlib
+from collections import OrderedDict
 import chainlit as cl
-from app import react_graph, generate_thread_id
-from langchain_core.messages import HumanMessage
+from app import get_graph, generate_thread_id, close_checkpointer
+from app import RECURSION_LIMIT, TOOL_LIMIT_NOTE, close_unfinished_turn
+from client import start_mcp_pool, shutdown_mcp_pool
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.errors import GraphRecursionError
 from typing import Dict, Optional
+from os import getenv
 import json # Added for potential future use with thread data
+import time
+from chainlit.data import get_data_layer
+from chainlit.server import app as chainlit_server
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from instrumentation import logger, register_gauges, render_metrics, run_limits, span, start_trace
+from client import change_feed_stats, mcp_pool_stats, tool_cache, tool_cache_stats
+from client import close_shared_store, shared_store, shared_store_stats
+from answer_cache import AnswerCache
+from shaping import shaping_totals
+from router import router_stats
+from tiering import TIER_ESCALATE_ON_LOW_CONFIDENCE, TIER_STREAM_HOLD_CHARS
+from rendering import content_hash, render_tool_output, render_totals
+from admission import AdmissionRejected, create_admission
+from data_layer import create_data_layer
 
 
 @cl.oauth_callback
@@ -17,14 +40,93 @@ def oauth_callback(
   # based on raw_user_data or provider_id
   return default_user
 
+# Chat history in Postgres (DATABASE_URL) with batched step writes and paginated resume
+batched_data_layer = create_data_layer()
+if batched_data_layer:
+  cl.data_layer(lambda: batched_data_layer)
+
+# Background warm-up started with the app; a chat only waits for it if it is still running
+warmup_task = None
+
+async def warm_up():
+  """Build the graph and start the MCP session pool."""
+  try:
+    await asyncio.gather(get_graph(), start_mcp_pool())
+  except Exception as e:
+    # The first message retries whatever failed here
+    logger.warning("Warm-up failed: %s", e)
+
+@cl.on_app_startup
+async def on_app_startup():
+  """Warm up in the background so the server accepts connections right away."""
+  global warmup_task
+  warmup_task = asyncio.create_task(warm_up())
+
+@cl.on_app_shutdown
+async def on_app_shutdown():
+  """Terminate the pooled SuzieQ MCP server processes and close the checkpointer, shared store and data layer."""
+  if warmup_task and not warmup_task.done():
+    warmup_task.cancel()
+  await shutdown_mcp_pool()
+  await close_checkpointer()
+  await close_shared_store()
+  if batched_data_layer:
+    # Write the steps that are still pending
+    await batched_data_layer.cleanup()
+
+async def metrics(request: Request) -> PlainTextResponse:
+  """Prometheus scrape endpoint with latency histograms, token counts and pool/cache gauges."""
+  return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+register_gauges("cybertrace_mcp_pool", mcp_pool_stats)
+register_gauges("cybertrace_tool_cache", tool_cache_stats)
+register_gauges("cybertrace_change_feed", change_feed_stats)
+register_gauges("cybertrace_shared_store", shared_store_stats)
+register_gauges("cybertrace_shaping", lambda: shaping_totals)
+register_gauges("cybertrace_render", lambda: render_totals)
+register_gauges("cybertrace_router", lambda: router_stats)
+if batched_data_layer:
+  register_gauges("cybertrace_data_layer", batched_data_layer.stats)
+if getenv("METRICS_ENABLED", "true").lower() == "true":
+  # Insert ahead of Chainlit's catch-all route that serves the UI
+  chainlit_server.router.routes.insert(0, Route("/metrics", metrics, methods=["GET"]))
+
 # Store settings that might be reused
 WELCOME_MESSAGE = "Ask me anything about your network..."
+# Token streaming: flush buffered tokens to the UI every N seconds or N characters
+STREAM_FLUSH_INTERVAL = float(getenv("STREAM_FLUSH_INTERVAL", "0.05"))
+STREAM_FLUSH_CHARS = int(getenv("STREAM_FLUSH_CHARS", "64"))
+# Final answers to repeated questions, served without running the graph
+ANSWER_CACHE_ENABLED = getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+answer_cache = AnswerCache(
+    tool_cache,
+    max_entries=int(getenv("ANSWER_CACHE_MAX_ENTRIES", "512")),
+    ttl=float(getenv("ANSWER_CACHE_TTL", "120")),
+    similarity=float(getenv("ANSWER_CACHE_SIMILARITY", "0")),
+    embedding_model=getenv("ANSWER_CACHE_EMBEDDING_MODEL", ""),
+    shared=shared_store,
+)
+register_gauges("cybertrace_answer_cache", answer_cache.stats)
+# Caps on concurrent runs (overall and per user) with a bounded wait queue
+admission = create_admission()
+if admission:
+    register_gauges("cybertrace_admission", admission.stats)
+# Seconds a graph run may take before it is stopped
+RUN_DEADLINE = float(getenv("RUN_DEADLINE", "300"))
+RUN_DEADLINE_NOTE = f"Stopped: the request did not finish within {RUN_DEADLINE:.0f} seconds."
+RECURSION_NOTE = "Stopped: the request took too many steps."
+
+def user_key() -> str:
+    """Admission control key: the OAuth user, or the chat session when there is no login."""
+    user = cl.user_session.get("user")
+    return user.identifier if user else cl.context.session.id
 
 @cl.on_chat_start
 async def start():
     """Initialize the chat session with a welcome message."""
-    # Generate and store thread ID
-    cl.user_session.set("thread_id", generate_thread_id())
+    # Use the Chainlit thread ID for the graph thread, so any worker can resume it
+    # from the shared checkpointer even if the session data was not persisted
+    cl.user_session.set("thread_id", cl.context.session.thread_id or generate_thread_id())
     
     # Send welcome message
     # await cl.Message(content=WELCOME_MESSAGE).send() # <-- Commented out to show default welcome screen
@@ -35,8 +137,7 @@ async def on_chat_resume(thread: Dict):
     # The 'thread' dictionary contains persisted data.
     # We need to extract the 'user_session' and then the 'thread_id'.
     
-    # Debugging: Print the structure of the thread object
-    # print(f"[DEBUG] Resuming chat, thread data: {json.dumps(thread, indent=2)}") 
+    logger.debug("Resuming chat, thread data: %s", thread)
     
     # Chainlit automatically restores messages/elements.
     # We need to manually restore the thread_id to the current session
@@ -48,84 +149,280 @@ async def on_chat_resume(thread: Dict):
             thread_id = user_session_data.get("thread_id")
             if thread_id:
                 cl.user_session.set("thread_id", thread_id)
-                print(f"[DEBUG] Restored thread_id: {thread_id} to user session.")
-            else:
-                 print("[DEBUG] 'thread_id' not found in persisted user_session.")
-                 # Handle case where thread_id is missing, maybe start a new one?
-                 # cl.user_session.set("thread_id", generate_thread_id()) 
-        else:
-            print("[DEBUG] 'user_session' not found in thread object during resume.")
-            # Handle case where user_session is missing
-            # cl.user_session.set("thread_id", generate_thread_id())
+                logger.debug("Restored thread_id %s to user session.", thread_id)
+                return
+        # Chats started by this version use the Chainlit thread ID as the graph thread
+        logger.warning("'thread_id' not found in persisted user_session; using thread %s.", thread.get("id"))
+        cl.user_session.set("thread_id", thread.get("id") or generate_thread_id())
 
     except Exception as e:
-        print(f"[DEBUG] Error restoring thread_id during on_chat_resume: {e}")
+        logger.error("Error restoring thread_id during on_chat_resume: %s", e)
         # Fallback or error handling, e.g., start a new thread
         # cl.user_session.set("thread_id", generate_thread_id())
         await cl.Message(content="Error resuming conversation. Starting a new one.").send()
 
 
+class TokenBuffer:
+    """Collects LLM tokens and forwards them to a Chainlit message in batches.
+
+    Flushing on every token would cost one websocket event per token, so tokens
+    are sent when STREAM_FLUSH_CHARS characters are buffered or STREAM_FLUSH_INTERVAL
+    seconds have passed since the last flush, whichever comes first. The first
+    `hold` characters are only sent together, or by an explicit flush.
+    """
+
+    def __init__(self, msg: cl.Message, hold: int = 0):
+        self.msg = msg
+        self.parts = []
+        self.size = 0
+        self.hold = hold
+        self.total = 0
+        self.streamed = False
+        self.last_flush = time.monotonic()
+
+    async def add(self, text: str):
+        self.parts.append(text)
+        self.size += len(text)
+        self.total += len(text)
+        if self.total < self.hold:
+            return
+        if self.size >= STREAM_FLUSH_CHARS or time.monotonic() - self.last_flush >= STREAM_FLUSH_INTERVAL:
+            await self.flush()
+
+    async def flush(self):
+        if self.parts:
+            await self.msg.stream_token("".join(self.parts))
+            self.parts = []
+            self.size = 0
+            self.streamed = True
+        self.last_flush = time.monotonic()
+
+    async def discard(self):
+        """Drop a reply that was replaced, removing the message if part of it was shown."""
+        self.parts = []
+        self.size = 0
+        if self.streamed:
+            await self.msg.remove()
+
+
+def elements_persisted() -> bool:
+    """Whether attached elements outlive the session: no data layer, or one that stores element files."""
+    data_layer = get_data_layer()
+    return data_layer is None or getattr(data_layer, "storage_client", None) is not None
+
+
+def chunk_text(content) -> str:
+    """Extract the text of a message chunk (plain string or list of content blocks)."""
+    if isinstance(content, str):
+        return content
+    return "".join(
+        block.get("text", "") if isinstance(block, dict) else str(block)
+        for block in content or []
+    )
+
+
 @cl.on_message
 async def main(message: cl.Message):
-    """Process incoming messages and generate responses."""
+    """Process incoming messages and stream responses token by token."""
+    # Assistant message currently being streamed, keyed by the LLM run that produces it
+    current_run_id = None
+    buffer = None
+    # Get thread ID; every span of this request is collected in its trace
+    thread_id = cl.user_session.get("thread_id")
+    trace = start_trace(thread_id=thread_id, message_id=message.id)
+    status = "ok"
+    question = message.content
     try:
-        print(f"[DEBUG] Received message: {message.content}")
-        print(f"[DEBUG] Message ID: {message.id}")
-        print(f"[DEBUG] Message author: {message.author}")
-        
-        # Get thread ID and prepare config
-        thread_id = cl.user_session.get("thread_id")
-        print(f"[DEBUG] Thread ID: {thread_id}")
-        
+        logger.debug("Received message %s from %s in thread %s: %s",
+                     message.id, message.author, thread_id, question)
+
+        # Prepare config
         config = {"configurable": {"thread_id": thread_id}}
-        msg_state = {"messages": [HumanMessage(content=message.content)]}
-        
-        # Keep track of processed tool outputs to avoid duplicates
+        # Built once per worker; only the first message after startup can wait here
+        graph = await get_graph()
+
+        if ANSWER_CACHE_ENABLED:
+            with span("answer_cache"):
+                cached = await answer_cache.lookup(question)
+            if cached:
+                status = "cached"
+                trace.labels["path"] = "answer_cache"
+                trace.mark("first_token")
+                await cl.Message(
+                    content=f"{cached['answer']}\n\n_Answered from cache ({cached['age']:.0f}s old)._"
+                ).send()
+                # Keep the conversation history complete for follow-up questions
+                await graph.aupdate_state(
+                    config,
+                    {"messages": [HumanMessage(content=question), AIMessage(content=cached["answer"])]},
+                    as_node="assistant",
+                )
+                return
+
+        msg_state = {"messages": [HumanMessage(content=question)]}
+        # Bound the graph steps of this run (tool rounds are also capped in the assistant)
+        run_config = {**config, "recursion_limit": RECURSION_LIMIT}
+
+        # Hashes of the tool outputs rendered in this turn, to skip duplicates
         processed_tool_outputs = set()
+        # Full results already attached to a step in this chat
+        attached_results = cl.user_session.get("attached_results")
+        if attached_results is None:
+            attached_results = OrderedDict()
+            cl.user_session.set("attached_results", attached_results)
+        # Ids of the assistant replies kept in the history (a checked small-model reply may be replaced)
+        kept_replies = set()
+        # Without element storage, full tool results are kept in their steps instead of attached
+        full_in_step = not elements_persisted()
+        # Tool calls and final answer of this turn, for the answer cache
+        turn_tool_calls = []
+        final_answer = ""
+        tool_limit = False
+
+        async def run_graph():
+            nonlocal buffer, current_run_id, final_answer, tool_limit
+            # "messages" yields LLM tokens as they are generated, "updates" yields the
+            # output of each node once it finishes (used for tool results).
+            async for mode, chunk in graph.astream(
+                msg_state, run_config, stream_mode=["messages", "updates"]
+            ):
+                if mode == "messages":
+                    token, metadata = chunk
+                    if metadata.get("langgraph_node") != "assistant":
+                        continue
+                    text = chunk_text(token.content)
+                    if not text:
+                        continue
+                    if buffer is None or token.id != current_run_id:
+                        # A new LLM call started. After tool results, finish the previous message;
+                        # within the same assistant step the previous reply was replaced, so drop it.
+                        if buffer and current_run_id in kept_replies:
+                            await buffer.flush()
+                            await buffer.msg.send()
+                        elif buffer:
+                            await buffer.discard()
+                        current_run_id = token.id
+                        checked = metadata.get("model_tier") == "small" and TIER_ESCALATE_ON_LOW_CONFIDENCE
+                        buffer = TokenBuffer(cl.Message(content=""), hold=TIER_STREAM_HOLD_CHARS if checked else 0)
+                    await buffer.add(text)
+                    if buffer.streamed:
+                        trace.mark("first_token")
+                    continue
+
+                logger.debug("Update from nodes: %s", list(chunk.keys()))
+
+                # The router's tool call (fast path) counts like one planned by the assistant
+                for node in ('router', 'assistant'):
+                    for ai_message in (chunk.get(node) or {}).get('messages', []):
+                        turn_tool_calls.extend(ai_message.tool_calls)
+                        if node == 'assistant':
+                            kept_replies.add(ai_message.id)
+                            final_answer = chunk_text(ai_message.content)
+                            tool_limit = ai_message.response_metadata.get("finish_reason") == "tool_limit"
+                            if buffer and current_run_id not in kept_replies:
+                                # A small-model reply replaced by a large-model one that was not streamed
+                                await buffer.discard()
+                                buffer = current_run_id = None
+                            if buffer and ai_message.id == current_run_id:
+                                # Checked and kept: show what is still held back
+                                await buffer.flush()
+                                trace.mark("first_token")
+                            elif final_answer:
+                                # Not streamed (e.g. only the tool-limit note)
+                                if buffer:
+                                    await buffer.flush()
+                                    await buffer.msg.send()
+                                current_run_id = ai_message.id
+                                buffer = TokenBuffer(cl.Message(content=""))
+                                trace.mark("first_token")
+                                await buffer.add(final_answer)
+
+                # Render each tool result once: a compact preview in the step, the full
+                # table as an element that is fetched over HTTP instead of the websocket
+                for message in (chunk.get('tools') or {}).get('messages', []):
+                    if not message.content:
+                        continue
+                    key = content_hash(message.content)
+                    if key in processed_tool_outputs:
+                        continue
+                    processed_tool_outputs.add(key)
+                    with span("render_tool_output"):
+                        rendered = render_tool_output(message.content, message.artifact, attached_results,
+                                                      full_in_step=full_in_step)
+                        elements = []
+                        if rendered["frame"] is not None:
+                            elements.append(cl.Dataframe(name=rendered["name"], data=rendered["frame"],
+                                                         display="inline"))
+                        elif rendered["text"] is not None:
+                            elements.append(cl.File(name=rendered["name"], content=rendered["text"].encode(),
+                                                    mime="text/plain", display="inline"))
+                        async with cl.Step(
+                            name="Telemetry Response",
+                            type="tool",
+                            show_input=False,
+                            language=rendered["language"]
+                        ) as step:
+                            step.output = rendered["output"]
+                            step.elements = elements
+
+        # Shown while the request waits for a free run slot
+        queue_msg = None
+
+        async def show_queue_position(position: int):
+            nonlocal queue_msg
+            text = f"⏳ The assistant is busy. Your question is number {position} in the queue."
+            if queue_msg is None:
+                queue_msg = cl.Message(content=text, author="System")
+                await queue_msg.send()
+            else:
+                queue_msg.content = text
+                await queue_msg.update()
+
+        stopped = None
+        try:
+            async with admission.admit(user_key(), show_queue_position) if admission else contextlib.nullcontext():
+                if queue_msg:
+                    await queue_msg.remove()
+                    queue_msg = None
+                try:
+                    await asyncio.wait_for(run_graph(), RUN_DEADLINE)
+                except asyncio.TimeoutError:
+                    stopped = ("deadline", RUN_DEADLINE_NOTE)
+                except GraphRecursionError:
+                    stopped = ("recursion", RECURSION_NOTE)
+        except AdmissionRejected as e:
+            status = "shed"
+            trace.labels["path"] = "shed"
+            if queue_msg:
+                await queue_msg.remove()
+            await cl.Message(content=f"⚠️ {e}", author="System").send()
+            return
+
+        if buffer and buffer.hold and current_run_id not in kept_replies:
+            # A small-model reply still held for its confidence check when the run stopped
+            await buffer.discard()
+        elif buffer:
+            await buffer.flush()
+            await buffer.msg.send()
 
-        async for chunk in react_graph.astream(msg_state, config):
-            print(f"\n[DEBUG] Chunk details:")
-            print(f"Chunk type: {type(chunk)}")
-            print(f"[DEBUG] Full chunk content: {chunk}")
-
-            # Handle tool outputs
-            if isinstance(chunk, dict) and 'tools' in chunk:
-                messages = chunk['tools'].get('messages', [])
-                if messages:
-                    for message in messages:
-                        if message.content and message.content not in processed_tool_outputs:
-                            tool_output = message.content
-                            async with cl.Step(
-                                name="Telemetry Response",
-                                type="tool",
-                                show_input=False,
-                                language="json"
-                            ) as step:
-                                await step.stream_token(tool_output)
-                            # Add the processed output to our set
-                            processed_tool_outputs.add(tool_output)
-
-            # Handle assistant responses after tool output
-            elif isinstance(chunk, dict) and 'assistant' in chunk:
-                messages = chunk['assistant'].get('messages', [])
-                if messages and messages[0].content:
-                    content = messages[0].content
-                    # Create message object first
-                    msg = cl.Message(content="")
-                    await msg.send() # Send placeholder to get a message ID
-                    # Stream character by character
-                    for char in content:
-                        await msg.stream_token(char)
-                        await cl.sleep(0.005) # Adjusted sleep slightly
-                    # Finalize the message content after streaming
-                    await msg.update()
+        if stopped:
+            # Close the turn so the next question starts from a valid history
+            status = stopped[0]
+            run_limits.inc(limit=stopped[0])
+            await close_unfinished_turn(graph, config, stopped[1])
+            await cl.Message(content=f"⚠️ {stopped[1]}", author="System").send()
+        elif tool_limit:
+            if not final_answer.endswith(TOOL_LIMIT_NOTE):
+                await cl.Message(content=TOOL_LIMIT_NOTE, author="System").send()
+        elif ANSWER_CACHE_ENABLED:
+            await answer_cache.store(question, final_answer, turn_tool_calls)
 
     except Exception as e:
-        print(f"[DEBUG] Error occurred: {str(e)}")
-        print(f"[DEBUG] Error type: {type(e)}")
+        status = "error"
+        logger.exception("Error processing request %s", trace.request_id)
         await cl.Message(
             content=f"❌ An error occurred: {str(e)}", 
             author="Error"
         ).send()
     finally:
-        print("[DEBUG] Executing finally block")
\ No newline at end of file
+        trace.finish(status=status)
\ No newline at end of file
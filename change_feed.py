@@ -0,0 +1,249 @@
+import asyncio
+import json
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+import pandas as pd
+from langchain_core.tools import BaseTool, StructuredTool
+from tool_cache import TIME_WINDOW_FILTERS
+
+# Tools whose time-window results are kept in the change feed
+FEED_TOOLS = {"run_suzieq_show"}
+
+# Views whose rows each belong to one point in time, so windows can be split and merged.
+# "all" also returns the state as of the window start, which a later slice would miss.
+FEED_VIEWS = {"changes"}
+
+TIME_UNITS = {"second": 1, "sec": 1, "minute": 60, "min": 60, "hour": 3600, "hr": 3600,
+              "day": 86400, "week": 604800}
+RELATIVE_TIME = re.compile(r"^(\d+(?:\.\d+)?)\s*(second|sec|minute|min|hour|hr|day|week)s?\s+ago$")
+
+
+def parse_time(value, now: float) -> float | None:
+    """
+    Epoch seconds of a SuzieQ start_time/end_time value, or None if it is not understood.
+
+    Accepts "now", "<n> <unit>s ago", epoch seconds or milliseconds, and ISO
+    datetimes (UTC unless they carry an offset).
+    """
+    if isinstance(value, (int, float)):
+        return value / 1000 if value > 1e11 else float(value)
+    if not isinstance(value, str):
+        return None
+    text = value.strip().lower()
+    if text == "now":
+        return now
+    if match := RELATIVE_TIME.match(text):
+        return now - float(match.group(1)) * TIME_UNITS[match.group(2)]
+    if re.fullmatch(r"\d+(?:\.\d+)?", text):
+        return parse_time(float(text), now)
+    try:
+        parsed = datetime.fromisoformat(value.strip())
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def format_time(seconds: float) -> str:
+    """ISO 8601 UTC datetime for a start_time/end_time filter."""
+    return datetime.fromtimestamp(seconds, tz=timezone.utc).isoformat(timespec="seconds")
+
+
+def parse_rows(content) -> pd.DataFrame | None:
+    """Rows of a JSON table result with a `_row` identity column, or None if it is not one."""
+    if not isinstance(content, str):
+        return None
+    try:
+        data = json.loads(content)
+    except ValueError:
+        return None
+    if not isinstance(data, list) or not all(isinstance(row, dict) for row in data):
+        return None
+    if data and not all(isinstance(row.get("timestamp"), (int, float)) for row in data):
+        return None
+    df = pd.DataFrame.from_records(data)
+    df["_row"] = [json.dumps(row, sort_keys=True, default=str) for row in data]
+    return df
+
+
+class _Feed:
+    __slots__ = ("frame", "start", "end", "lock")
+
+    def __init__(self):
+        self.frame = None  # Rows sorted by timestamp (epoch ms)
+        self.start = None  # Covered window, epoch seconds
+        self.end = None
+        self.lock = asyncio.Lock()
+
+
+class ChangeFeedStore:
+    """
+    Local store of SuzieQ time-window results, one feed per query scope.
+
+    A scope is a table plus its filters other than the time window, so it
+    includes the namespace. Each feed keeps the rows of the window it has
+    covered so far, as one DataFrame. A request for a window only fetches the
+    parts the feed does not cover yet: normally just the newest slice since
+    the previous request. The newest slice starts `settle` seconds early, to
+    pick up rows written late by the poller; duplicates are dropped on merge.
+    Rows older than `retention` seconds are dropped, and each feed keeps at
+    most `max_rows` rows (the newest). The least recently used feed is dropped
+    beyond `max_feeds`.
+
+    Splitting a window into slices is exact for views whose rows each belong
+    to one point in time ("changes"); other views bypass the feed.
+    """
+
+    def __init__(self, retention: float = 86400.0, max_rows: int = 100_000, max_feeds: int = 64,
+                 settle: float = 60.0):
+        self.retention = retention
+        self.max_rows = max_rows
+        self.max_feeds = max_feeds
+        self.settle = settle
+        self._feeds = OrderedDict()
+        # Counters
+        self.hits = 0
+        self.partial = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.fetched_rows = 0
+        self.fetched_bytes = 0
+        self.served_rows = 0
+
+    @staticmethod
+    def make_key(tool_name: str, arguments: dict) -> str | None:
+        """Feed key for a time-window call, or None if it cannot be served from a feed."""
+        filters = arguments.get("filters") or {}
+        if tool_name not in FEED_TOOLS or not isinstance(filters, dict):
+            return None
+        if filters.get("view") not in FEED_VIEWS or "start_time" not in filters:
+            return None
+        scope = {key: value for key, value in filters.items() if key not in TIME_WINDOW_FILTERS}
+        scope["view"] = filters["view"]
+        return json.dumps([tool_name, arguments.get("table", ""), scope], sort_keys=True, default=str)
+
+    def _feed(self, key: str) -> _Feed:
+        feed = self._feeds.get(key)
+        if feed is None:
+            feed = self._feeds[key] = _Feed()
+            while len(self._feeds) > self.max_feeds:
+                self._feeds.popitem(last=False)
+        self._feeds.move_to_end(key)
+        return feed
+
+    def _merge(self, feed: _Feed, df: pd.DataFrame, start: float, end: float):
+        frame = df if feed.frame is None else pd.concat([feed.frame, df], ignore_index=True)
+        if "timestamp" in frame.columns:
+            frame = frame.drop_duplicates(subset="_row").sort_values("timestamp", kind="stable")
+        feed.frame = frame.reset_index(drop=True)
+        feed.start = start if feed.start is None else min(feed.start, start)
+        feed.end = end if feed.end is None else max(feed.end, end)
+
+    def _trim(self, feed: _Feed, now: float):
+        cutoff = now - self.retention
+        if feed.start < cutoff:
+            feed.start = cutoff
+        if feed.frame is None or "timestamp" not in feed.frame.columns:
+            return
+        frame = feed.frame[feed.frame["timestamp"] >= feed.start * 1000]
+        if len(frame) > self.max_rows:
+            frame = frame.iloc[-self.max_rows:]
+            # The feed no longer covers the time before its oldest row
+            feed.start = frame["timestamp"].iloc[0] / 1000
+        feed.frame = frame.reset_index(drop=True)
+
+    async def query(self, key: str, filters: dict, fetch, now: float | None = None) -> str | None:
+        """
+        Rows of the window in `filters` as a JSON string, fetching only what the feed
+        is missing with `fetch(start, end)`. Returns None if the window cannot be
+        served from the feed; a fetch result that is not a table is returned as is.
+        """
+        now = time.time() if now is None else now
+        start = parse_time(filters.get("start_time"), now)
+        end = parse_time(filters.get("end_time", "now"), now)
+        if start is None or end is None or start >= end or start < now - self.retention:
+            self.bypassed += 1
+            return None
+
+        feed = self._feed(key)
+        async with feed.lock:
+            if feed.frame is None:
+                missing = [(start, end)]
+            else:
+                missing = []
+                if start < feed.start:
+                    missing.append((start, feed.start))
+                if end > feed.end:
+                    missing.append((max(feed.start, feed.end - self.settle), end))
+            if not missing:
+                self.hits += 1
+            elif feed.frame is None:
+                self.misses += 1
+            else:
+                self.partial += 1
+
+            for slice_start, slice_end in missing:
+                content = await fetch(slice_start, slice_end)
+                df = parse_rows(content)
+                if df is None:
+                    # Errors and unexpected output go to the model unchanged
+                    return content if isinstance(content, str) else json.dumps(content, default=str)
+                self.fetched_rows += len(df)
+                self.fetched_bytes += len(content)
+                self._merge(feed, df, slice_start, slice_end)
+            self._trim(feed, now)
+
+            frame = feed.frame
+            if frame is not None and "timestamp" in frame.columns:
+                frame = frame[(frame["timestamp"] >= start * 1000) & (frame["timestamp"] <= end * 1000)]
+            rows = [] if frame is None else frame["_row"].tolist()
+        self.served_rows += len(rows)
+        return "[" + ",".join(rows) + "]"
+
+    def stats(self) -> dict:
+        return {
+            "feeds": len(self._feeds),
+            "rows": sum(len(feed.frame) for feed in self._feeds.values() if feed.frame is not None),
+            "hits": self.hits,
+            "partial": self.partial,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "fetched_rows": self.fetched_rows,
+            "fetched_bytes": self.fetched_bytes,
+            "served_rows": self.served_rows,
+        }
+
+
+def feed_tool(tool: BaseTool, store: ChangeFeedStore) -> BaseTool:
+    """Wrap an MCP tool so time-window show calls only fetch what `store` is missing."""
+    if tool.name not in FEED_TOOLS or tool.coroutine is None:
+        return tool
+
+    async def call_tool(**arguments):
+        key = store.make_key(tool.name, arguments)
+        if key is not None:
+            filters = arguments["filters"]
+
+            async def fetch(start: float, end: float):
+                window = {**filters, "start_time": format_time(start), "end_time": format_time(end)}
+                content, _ = await tool.coroutine(**{**arguments, "filters": window})
+                return content
+
+            content = await store.query(key, filters, fetch)
+            if content is not None:
+                return content, None
+        elif isinstance(arguments.get("filters"), dict) and TIME_WINDOW_FILTERS & set(arguments["filters"]):
+            store.bypassed += 1
+        return await tool.coroutine(**arguments)
+
+    return StructuredTool(
+        name=tool.name,
+        description=tool.description,
+        args_schema=tool.args_schema,
+        coroutine=call_tool,
+        response_format=tool.response_format,
+        metadata=tool.metadata,
+    )
@@ -0,0 +1,260 @@
+import asyncio
+from collections import OrderedDict
+from os import getenv
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import InMemorySaver
+from shared_store import worker_count
+from instrumentation import logger
+
+# Delete all but the newest `keep` checkpoints of a thread, then the writes and
+# channel blobs that are no longer referenced by a remaining checkpoint.
+POSTGRES_PRUNE_SQL = [
+    """
+    DELETE FROM checkpoints
+    WHERE thread_id = %(thread_id)s AND checkpoint_ns = %(ns)s AND checkpoint_id NOT IN (
+        SELECT checkpoint_id FROM checkpoints
+        WHERE thread_id = %(thread_id)s AND checkpoint_ns = %(ns)s
+        ORDER BY checkpoint_id DESC LIMIT %(keep)s
+    )
+    """,
+    """
+    DELETE FROM checkpoint_writes w
+    WHERE w.thread_id = %(thread_id)s AND w.checkpoint_ns = %(ns)s AND NOT EXISTS (
+        SELECT 1 FROM checkpoints c
+        WHERE c.thread_id = w.thread_id AND c.checkpoint_ns = w.checkpoint_ns
+            AND c.checkpoint_id = w.checkpoint_id
+    )
+    """,
+    """
+    DELETE FROM checkpoint_blobs b
+    WHERE b.thread_id = %(thread_id)s AND b.checkpoint_ns = %(ns)s AND NOT EXISTS (
+        SELECT 1 FROM checkpoints c
+        WHERE c.thread_id = b.thread_id AND c.checkpoint_ns = b.checkpoint_ns
+            AND c.checkpoint -> 'channel_versions' ->> b.channel = b.version
+    )
+    """,
+]
+
+SQLITE_PRUNE_SQL = [
+    """
+    DELETE FROM checkpoints
+    WHERE thread_id = :thread_id AND checkpoint_ns = :ns AND checkpoint_id NOT IN (
+        SELECT checkpoint_id FROM checkpoints
+        WHERE thread_id = :thread_id AND checkpoint_ns = :ns
+        ORDER BY checkpoint_id DESC LIMIT :keep
+    )
+    """,
+    """
+    DELETE FROM writes
+    WHERE thread_id = :thread_id AND checkpoint_ns = :ns AND checkpoint_id NOT IN (
+        SELECT checkpoint_id FROM checkpoints WHERE thread_id = :thread_id AND checkpoint_ns = :ns
+    )
+    """,
+]
+
+
+class BoundedMemorySaver(InMemorySaver):
+    """
+    In-process saver that keeps the newest `keep_last` checkpoints per thread and
+    at most `max_threads` threads (least recently written threads are dropped).
+    """
+
+    def __init__(self, keep_last: int = 2, max_threads: int = 1000):
+        super().__init__()
+        self.keep_last = max(1, keep_last)
+        self.max_threads = max_threads
+        self._threads = OrderedDict()
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        result = super().put(config, checkpoint, metadata, new_versions)
+        thread_id = result["configurable"]["thread_id"]
+        self._threads[thread_id] = None
+        self._threads.move_to_end(thread_id)
+        self._prune(thread_id, result["configurable"]["checkpoint_ns"])
+        while len(self._threads) > self.max_threads:
+            oldest, _ = self._threads.popitem(last=False)
+            self._drop_thread(oldest)
+        return result
+
+    def _prune(self, thread_id: str, ns: str):
+        checkpoints = self.storage[thread_id][ns]
+        if len(checkpoints) <= self.keep_last:
+            return
+        keep = sorted(checkpoints, reverse=True)[: self.keep_last]
+        for checkpoint_id in set(checkpoints) - set(keep):
+            del checkpoints[checkpoint_id]
+            self.writes.pop((thread_id, ns, checkpoint_id), None)
+        referenced = set()
+        for checkpoint_id in keep:
+            saved = self.serde.loads_typed(checkpoints[checkpoint_id][0])
+            referenced.update(saved["channel_versions"].items())
+        stale = [
+            key for key in self.blobs
+            if key[0] == thread_id and key[1] == ns and (key[2], key[3]) not in referenced
+        ]
+        for key in stale:
+            del self.blobs[key]
+
+    def _drop_thread(self, thread_id: str):
+        self.storage.pop(thread_id, None)
+        for store in (self.writes, self.blobs):
+            for key in [key for key in store if key[0] == thread_id]:
+                del store[key]
+
+
+class DurableCheckpointer(BaseCheckpointSaver):
+    """
+    Checkpointer backed by Postgres (pooled psycopg connections) or SQLite.
+
+    The real saver is opened lazily on the running event loop (or up front with
+    `setup()`), so the graph can be compiled before any loop runs. After each checkpoint is written, older
+    checkpoints of the same thread are pruned so only the newest `keep_last`
+    remain. LangGraph reads pending sends from the parent checkpoint, so
+    keeping 2 is the safe minimum for graphs that use `Send`.
+    """
+
+    def __init__(self, backend: str, *, url: str | None = None, sqlite_path: str = "checkpoints.sqlite",
+                 keep_last: int = 2, pool_size: int = 5):
+        super().__init__()
+        self.backend = backend
+        self.url = url
+        self.sqlite_path = sqlite_path
+        self.keep_last = max(1, keep_last)
+        self.pool_size = pool_size
+        self._saver = None
+        self._resource = None  # Connection pool or SQLite connection
+        self._loop = None
+        self._open_task = None
+
+    async def _ensure(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._open_task = asyncio.ensure_future(self._open())
+        try:
+            return await asyncio.shield(self._open_task)
+        except Exception:
+            self._loop = None
+            raise
+
+    async def setup(self):
+        """Open the database and create the tables now instead of on the first checkpoint."""
+        await self._ensure()
+
+    async def _open(self):
+        if self.backend == "postgres":
+            from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+            from psycopg.rows import dict_row
+            from psycopg_pool import AsyncConnectionPool
+
+            pool = AsyncConnectionPool(
+                conninfo=self.url,
+                max_size=self.pool_size,
+                open=False,
+                kwargs={"autocommit": True, "prepare_threshold": 0, "row_factory": dict_row},
+            )
+            await pool.open()
+            self._resource = pool
+            saver = AsyncPostgresSaver(pool)
+        else:
+            import aiosqlite
+            from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+            # Several worker processes can share the file: WAL lets readers run during
+            # a write, and writers wait for the lock instead of failing at once
+            self._resource = await aiosqlite.connect(self.sqlite_path, timeout=30)
+            await self._resource.execute("PRAGMA journal_mode=WAL")
+            saver = AsyncSqliteSaver(self._resource)
+        try:
+            await saver.setup()
+        except Exception:
+            await self._resource.close()
+            self._resource = None
+            raise
+        self._saver = saver
+        logger.info("Using %s checkpointer (keeping last %d per thread).", self.backend, self.keep_last)
+        return saver
+
+    async def _prune(self, config):
+        params = {
+            "thread_id": config["configurable"]["thread_id"],
+            "ns": config["configurable"].get("checkpoint_ns", ""),
+            "keep": self.keep_last,
+        }
+        if self.backend == "postgres":
+            async with self._resource.connection() as conn:
+                async with conn.transaction():
+                    for statement in POSTGRES_PRUNE_SQL:
+                        await conn.execute(statement, params)
+        else:
+            async with self._saver.lock:
+                for statement in SQLITE_PRUNE_SQL:
+                    await self._saver.conn.execute(statement, params)
+                await self._saver.conn.commit()
+
+    async def aget_tuple(self, config):
+        saver = await self._ensure()
+        return await saver.aget_tuple(config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        saver = await self._ensure()
+        async for item in saver.alist(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        saver = await self._ensure()
+        result = await saver.aput(config, checkpoint, metadata, new_versions)
+        try:
+            await self._prune(result)
+        except Exception as e:
+            # Retention is best effort; never fail a graph step because of it.
+            logger.warning("Failed to prune checkpoints: %s", e)
+        return result
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        saver = await self._ensure()
+        return await saver.aput_writes(config, writes, task_id, task_path)
+
+    def get_next_version(self, current, channel):
+        # Versions must match the format of the underlying saver's blob keys.
+        if self._saver is not None:
+            return self._saver.get_next_version(current, channel)
+        return super().get_next_version(current, channel)
+
+    async def aclose(self):
+        """Release the connection pool or SQLite connection."""
+        if self._resource is None or self._loop is not asyncio.get_running_loop():
+            return
+        await self._resource.close()
+        self._resource = None
+        self._saver = None
+        self._loop = None
+
+
+def create_checkpointer() -> BaseCheckpointSaver:
+    """
+    Build the checkpointer selected by CHECKPOINTER ("postgres", "sqlite" or "memory").
+
+    Defaults to Postgres when a database URL is configured and to a local SQLite
+    file otherwise. With several workers (CYBERTRACE_WORKERS) the checkpoints
+    must be shared, so "memory" is rejected.
+    """
+    url = getenv("CHECKPOINT_DATABASE_URL") or getenv("DATABASE_URL")
+    backend = getenv("CHECKPOINTER", "postgres" if url else "sqlite").lower()
+    keep_last = int(getenv("CHECKPOINT_KEEP_LAST", "2"))
+    if backend == "memory" and worker_count() > 1:
+        raise ValueError("CHECKPOINTER=memory cannot be shared by several workers; use sqlite or postgres")
+    if backend == "memory":
+        return BoundedMemorySaver(
+            keep_last=keep_last,
+            max_threads=int(getenv("CHECKPOINT_MAX_THREADS", "1000")),
+        )
+    if backend == "postgres" and not url:
+        raise ValueError("CHECKPOINTER=postgres requires DATABASE_URL or CHECKPOINT_DATABASE_URL")
+    return DurableCheckpointer(
+        backend,
+        url=url,
+        sqlite_path=getenv("CHECKPOINT_SQLITE_PATH", "checkpoints.sqlite"),
+        keep_last=keep_last,
+        pool_size=int(getenv("CHECKPOINT_POOL_SIZE", "5")),
+    )
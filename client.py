@@ -1,7 +1,18 @@
-import asyncio
+import hashlib
+import json
+from importlib.metadata import version
 from langchain_mcp_adapters.client import MultiServerMCPClient
+from langchain_mcp_adapters.tools import convert_mcp_tool_to_langchain_tool
+from mcp.types import Tool as MCPTool
 from dotenv import load_dotenv
-from os import getenv, path
+from os import getenv, getpid, makedirs, path, replace
+from mcp_pool import MCPSessionPool
+from tool_cache import ToolResultCache, cached_tool, parse_table_ttls
+from shaping import shaped_tool
+from change_feed import ChangeFeedStore, feed_tool
+from shared_store import create_shared_store
+from startup import startup_phase
+from instrumentation import logger
 
 # Load environment variables from .env file
 load_dotenv()
@@ -30,38 +41,169 @@ client = MultiServerMCPClient(
     }
 )
 
+# Pool of warm, long-lived sessions used by every tool call. Without it each call
+# would spawn a new `uv run python <server>` process.
+pool = MCPSessionPool(
+    client.connections["suzieq_server"],
+    size=int(getenv("MCP_POOL_SIZE", "2")),
+    health_check_interval=float(getenv("MCP_HEALTH_CHECK_INTERVAL", "30")),
+)
+
+# Caches shared by all workers of a multi-worker deployment (None for a single worker)
+shared_store = create_shared_store()
+
+# Cache for identical run_suzieq_show/run_suzieq_summarize calls
+tool_cache = ToolResultCache(
+    max_entries=int(getenv("TOOL_CACHE_MAX_ENTRIES", "256")),
+    max_bytes=int(getenv("TOOL_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    default_ttl=float(getenv("TOOL_CACHE_TTL", "60")),
+    table_ttls=parse_table_ttls(getenv("TOOL_CACHE_TABLE_TTLS", "")),
+    shared=shared_store,
+)
+TOOL_CACHE_ENABLED = getenv("TOOL_CACHE_ENABLED", "true").lower() == "true"
+# Local store of time-window (view "changes") results, so repeated and sliding
+# windows only fetch the newest slice from SuzieQ
+change_feed = ChangeFeedStore(
+    retention=float(getenv("CHANGE_FEED_RETENTION", "86400")),
+    max_rows=int(getenv("CHANGE_FEED_MAX_ROWS", "100000")),
+    max_feeds=int(getenv("CHANGE_FEED_MAX_FEEDS", "64")),
+    settle=float(getenv("CHANGE_FEED_SETTLE", "60")),
+)
+CHANGE_FEED_ENABLED = getenv("CHANGE_FEED_ENABLED", "true").lower() == "true"
+# Send the model a compact view of large tables instead of the raw JSON
+SHAPING_ENABLED = getenv("SHAPING_ENABLED", "true").lower() == "true"
+
+# MCP tool schemas from the last discovery, reused while the server is unchanged.
+# Set MCP_TOOL_SCHEMA_CACHE to an empty string to always ask the server.
+TOOL_SCHEMA_CACHE = getenv("MCP_TOOL_SCHEMA_CACHE", ".cache/mcp_tool_schemas.json")
+
+def tool_schema_version() -> str:
+    """
+    Hash of everything the tool schemas depend on: the server command, the server
+    script contents and the MCP library versions. A change invalidates the cache.
+    """
+    digest = hashlib.sha256()
+    connection = client.connections["suzieq_server"]
+    digest.update(json.dumps({
+        "command": connection["command"],
+        "args": connection["args"],
+        "mcp": version("mcp"),
+        "langchain-mcp-adapters": version("langchain-mcp-adapters"),
+    }, sort_keys=True).encode())
+    if mcp_server_path and path.isfile(mcp_server_path):
+        with open(mcp_server_path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+def read_tool_schemas(schema_version: str) -> list[MCPTool] | None:
+    """Cached tool schemas, or None if there are none for this schema version."""
+    try:
+        with open(TOOL_SCHEMA_CACHE) as f:
+            cached = json.load(f)
+        if cached.get("version") != schema_version:
+            return None
+        return [MCPTool.model_validate(schema) for schema in cached["tools"]]
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning("Ignoring unreadable tool schema cache %s: %s", TOOL_SCHEMA_CACHE, e)
+        return None
+
+def write_tool_schemas(schema_version: str, mcp_tools: list[MCPTool]):
+    """Store discovered tool schemas (atomically, so concurrent workers never read half a file)."""
+    try:
+        directory = path.dirname(TOOL_SCHEMA_CACHE)
+        if directory:
+            makedirs(directory, exist_ok=True)
+        partial = f"{TOOL_SCHEMA_CACHE}.{getpid()}.tmp"
+        with open(partial, "w") as f:
+            json.dump({
+                "version": schema_version,
+                "tools": [tool.model_dump(mode="json", exclude_none=True) for tool in mcp_tools],
+            }, f, indent=2)
+        replace(partial, TOOL_SCHEMA_CACHE)
+    except OSError as e:
+        logger.warning("Could not write tool schema cache %s: %s", TOOL_SCHEMA_CACHE, e)
+
 async def load_all_mcp_tools():
     """
-    Loads all tools from all configured MCP servers using MultiServerMCPClient.
-    The client handles session creation and teardown for the get_tools call.
+    Loads all tools of the SuzieQ MCP server and binds them to the session pool.
+
+    Tool schemas come from the on-disk cache when it matches `tool_schema_version()`;
+    otherwise they are listed through the pool, which also starts its sessions.
+    Returns None if the tools could not be loaded.
     """
-    print("[MCP INFO] Loading tools using MultiServerMCPClient...")
+    if not mcp_server_path:
+        logger.warning("MCP_SERVER_COMMAND_PATH is not set; no MCP tools will be available.")
+        return []
     try:
-        # The get_tools() method handles connecting, loading tools, and disconnecting.
-        loaded_tools = await client.get_tools()
-        print(f"[MCP INFO] Loaded {len(loaded_tools)} MCP tools.")
+        schema_version = tool_schema_version()
+        mcp_tools = None
+        if TOOL_SCHEMA_CACHE:
+            with startup_phase("mcp_schema_cache"):
+                mcp_tools = read_tool_schemas(schema_version)
+        if mcp_tools is None:
+            logger.info("Discovering tools from the SuzieQ MCP server...")
+            with startup_phase("mcp_discovery"):
+                mcp_tools = (await pool.list_tools()).tools
+            if TOOL_SCHEMA_CACHE:
+                write_tool_schemas(schema_version, mcp_tools)
+        loaded_tools = [convert_mcp_tool_to_langchain_tool(pool, tool) for tool in mcp_tools]
+        # Wrapped even when disabled: the answer cache needs the poll timestamps the wrapper records
+        loaded_tools = [cached_tool(tool, tool_cache, enabled=TOOL_CACHE_ENABLED) for tool in loaded_tools]
+        if CHANGE_FEED_ENABLED:
+            loaded_tools = [feed_tool(tool, change_feed) for tool in loaded_tools]
+        # Timestamps are converted even when results are not shaped
+        loaded_tools = [shaped_tool(tool, shape=SHAPING_ENABLED) for tool in loaded_tools]
+        logger.info("Loaded %d MCP tools.", len(loaded_tools))
         return loaded_tools
     except Exception as e:
         # Provide a more detailed error message for easier debugging.
-        print(f"[MCP CRITICAL] Failed to load tools with MultiServerMCPClient: {e}")
-        print("[MCP CRITICAL] Please check that the MCP_SERVER_COMMAND_PATH in your .env file is correct and the server is operational.")
-        return []
+        logger.error("Failed to load MCP tools: %s. Please check that the MCP_SERVER_COMMAND_PATH in your .env "
+                     "file is correct and the server is operational.", e)
+        return None
+
+# Loaded on first use (see get_tools), never at import time
+tools = None
+
+async def get_tools():
+    """
+    MCP tools of this worker, loaded on first call. Returns None while they cannot
+    be loaded, so the next call tries again.
+    """
+    global tools
+    if tools is None:
+        tools = await load_all_mcp_tools()
+    return tools
+
+async def start_mcp_pool():
+    """Warm up the session pool so the first tool call does not pay the startup cost."""
+    try:
+        await pool.start()
+    except Exception as e:
+        logger.warning("Could not warm up MCP session pool: %s", e)
+
+async def shutdown_mcp_pool():
+    """Close all pooled sessions and terminate their server processes."""
+    await pool.close()
+
+def mcp_pool_stats() -> dict:
+    """Pool metrics: wait time, session reuse, restarts and health check failures."""
+    return pool.stats()
 
-# --- Load Tools on Module Import ---
-# This block runs once when the module is first imported by another script.
-tools = []
-try:
-    # asyncio.run() creates a new event loop to execute our async function.
-    tools = asyncio.run(load_all_mcp_tools())
+def tool_cache_stats() -> dict:
+    """Tool result cache metrics: hits, misses, evictions and invalidations."""
+    return tool_cache.stats()
 
-    if not tools:
-        print("[MCP WARNING] No tools were loaded. Assistant will have limited capabilities.")
+async def close_shared_store():
+    """Release the shared store's connections."""
+    if shared_store is not None:
+        await shared_store.aclose()
 
-except Exception as e:
-    # Catch any other unexpected errors during the setup process.
-    print(f"[MCP CRITICAL] Unhandled exception during MCP setup: {e}")
+def shared_store_stats() -> dict:
+    """Shared store metrics: hits, misses, writes and errors (empty without a shared store)."""
+    return shared_store.stats() if shared_store is not None else {}
 
-# No atexit shutdown is explicitly needed here. `client.get_tools()` is designed
-# to manage the lifecycle of the connection and the underlying subprocess for its
-# single operation. If the server needed to be long-lived across multiple calls,
-# a different pattern (like using `async with client.session(...)`) would be required.
\ No newline at end of file
+def change_feed_stats() -> dict:
+    """Change feed metrics: windows served locally or with a delta, and rows fetched."""
+    return change_feed.stats()
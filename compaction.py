@@ -0,0 +1,105 @@
+import json
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+
+# Columns listed in an elided tool result before truncating the schema
+MAX_SCHEMA_COLUMNS = 30
+
+
+def describe_tool_result(content) -> str:
+    """Summarize a SuzieQ JSON result as its row count and column names."""
+    if not isinstance(content, str):
+        content = json.dumps(content, default=str)
+    try:
+        data = json.loads(content)
+    except ValueError:
+        return f"{len(content)} characters of text"
+    if isinstance(data, dict) and "total_rows" in data and "columns" in data:
+        # Shaped result (see shaping.py): the full table is still in the result store
+        schema = ", ".join((data["columns"] + data.get("omitted_columns", []))[:MAX_SCHEMA_COLUMNS])
+        return f"{data['total_rows']} rows; columns: {schema}; result_id: {data.get('result_id')}"
+    if isinstance(data, dict):
+        data = [data]
+    if not isinstance(data, list):
+        return f"scalar value {str(data)[:80]}"
+    columns = []
+    for row in data:
+        if isinstance(row, dict):
+            columns.extend(key for key in row if key not in columns)
+    schema = ", ".join(columns[:MAX_SCHEMA_COLUMNS])
+    if len(columns) > MAX_SCHEMA_COLUMNS:
+        schema += f", ... ({len(columns)} columns)"
+    return f"{len(data)} rows; columns: {schema}" if columns else f"{len(data)} rows"
+
+
+def _tool_calls_by_id(messages) -> dict:
+    return {
+        call["id"]: call
+        for msg in messages if isinstance(msg, AIMessage)
+        for call in msg.tool_calls
+    }
+
+
+def _elide(msg: ToolMessage, call: dict | None) -> ToolMessage:
+    if call:
+        args = json.dumps(call.get("args", {}), sort_keys=True, default=str)
+        origin = f"{call['name']} {args}"
+    else:
+        origin = msg.name or "tool"
+    summary = (
+        f"[Earlier result of {origin} elided to save context: {describe_tool_result(msg.content)}. "
+        "Call the tool again if these details are needed.]"
+    )
+    return msg.model_copy(update={"content": summary})
+
+
+def compact_messages(messages: list, budget: int) -> tuple[list, dict]:
+    """
+    Fit a conversation into roughly `budget` tokens without touching the current turn.
+
+    Everything from the latest human message onwards is kept at full fidelity.
+    Older tool results are replaced by a one-line summary (row count and columns),
+    oldest first, until the budget is met. If that is not enough, the oldest whole
+    turns are dropped. System messages are always kept.
+
+    Returns the compacted list (the input is not modified) and a report with the
+    estimated token counts.
+    """
+    before = count_tokens_approximately(messages)
+    report = {"tokens_before": before, "tokens_after": before, "tokens_saved": 0,
+              "elided_tool_results": 0, "dropped_messages": 0}
+    if before <= budget:
+        return messages, report
+
+    system = [msg for msg in messages if isinstance(msg, SystemMessage)]
+    history = [msg for msg in messages if not isinstance(msg, SystemMessage)]
+    human_positions = [i for i, msg in enumerate(history) if isinstance(msg, HumanMessage)]
+    current_start = human_positions[-1] if human_positions else 0
+    calls = _tool_calls_by_id(history)
+
+    compacted = list(history)
+    total = before
+    for i in range(current_start):
+        if total <= budget:
+            break
+        msg = compacted[i]
+        if isinstance(msg, ToolMessage):
+            elided = _elide(msg, calls.get(msg.tool_call_id))
+            total += count_tokens_approximately([elided]) - count_tokens_approximately([msg])
+            compacted[i] = elided
+            report["elided_tool_results"] += 1
+
+    # Still too large: drop whole turns from the start. Cutting at a human message
+    # keeps every AI tool call together with its tool results.
+    for start in human_positions[1:]:
+        if total <= budget:
+            break
+        kept = compacted[start - report["dropped_messages"]:]
+        report["dropped_messages"] = len(history) - len(kept)
+        compacted = kept
+        total = count_tokens_approximately(system + compacted)
+
+    result = system + compacted
+    report["tokens_after"] = total
+    report["tokens_saved"] = before - total
+    return result, report
@@ -0,0 +1,454 @@
+import asyncio
+import contextvars
+import json
+import time
+from datetime import datetime
+from os import getenv
+from typing import Dict, List, Optional
+import asyncpg
+from chainlit.data.chainlit_data_layer import ISO_FORMAT, ChainlitDataLayer
+from chainlit.data.storage_clients.base import BaseStorageClient
+from chainlit.data.utils import queue_until_user_message
+from chainlit.types import PageInfo, PaginatedResponse, Pagination, ThreadDict, ThreadFilter
+from instrumentation import logger
+
+# Same upsert as ChainlitDataLayer.create_step, so a batch merges into existing rows the same way
+STEP_UPSERT = """
+INSERT INTO "Step" (
+    id, "threadId", "parentId", input, metadata, name, output,
+    type, "startTime", "endTime", "showInput", "isError"
+) VALUES (
+    $1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12
+)
+ON CONFLICT (id) DO UPDATE SET
+    "parentId" = COALESCE(EXCLUDED."parentId", "Step"."parentId"),
+    input = COALESCE(EXCLUDED.input, "Step".input),
+    metadata = CASE
+        WHEN EXCLUDED.metadata <> '{}' THEN EXCLUDED.metadata
+        ELSE "Step".metadata
+    END,
+    name = COALESCE(EXCLUDED.name, "Step".name),
+    output = COALESCE(EXCLUDED.output, "Step".output),
+    type = CASE
+        WHEN EXCLUDED.type = 'run' THEN "Step".type
+        ELSE EXCLUDED.type
+    END,
+    "threadId" = COALESCE(EXCLUDED."threadId", "Step"."threadId"),
+    "endTime" = COALESCE(EXCLUDED."endTime", "Step"."endTime"),
+    "startTime" = LEAST(EXCLUDED."startTime", "Step"."startTime"),
+    "showInput" = COALESCE(EXCLUDED."showInput", "Step"."showInput"),
+    "isError" = COALESCE(EXCLUDED."isError", "Step"."isError")
+"""
+
+# Rows that steps of a batch refer to, created empty if they do not exist yet
+THREAD_PLACEHOLDER = 'INSERT INTO "Thread" (id, metadata) VALUES ($1, \'{}\') ON CONFLICT (id) DO NOTHING'
+PARENT_PLACEHOLDER = """
+INSERT INTO "Step" (id, "threadId", metadata, type, "startTime", "endTime")
+VALUES ($1, $2, '{}', 'run', $3, $3)
+ON CONFLICT (id) DO NOTHING
+"""
+
+# Steps that keep their full output on resume: the chat messages themselves
+MESSAGE_STEP_TYPES = ("user_message", "assistant_message", "system_message")
+
+# Longest wait before writing a batch again after it failed
+MAX_RETRY_DELAY = 30.0
+# Failed attempts after which a batch is written step by step, so one bad step cannot hold up the others
+BATCH_RETRIES = 3
+# Errors caused by the data of a step; other errors (lost connection, ...) are worth retrying
+STEP_DATA_ERRORS = (asyncpg.DataError, asyncpg.IntegrityConstraintViolationError, ValueError, TypeError)
+
+# Set while an element is created, so the step it needs is written right away
+_write_through = contextvars.ContextVar("data_layer_write_through", default=False)
+
+
+class BatchedDataLayer(ChainlitDataLayer):
+    """
+    Chainlit's Postgres data layer with batched step writes and paginated resume.
+
+    Chainlit writes a step every time it is sent or updated, and
+    ChainlitDataLayer runs up to five queries for each write (checking that
+    the thread and the parent step exist). Here step writes are merged per
+    step in memory and written every `flush_interval` seconds (or when
+    `max_batch` steps are pending) in one transaction on the shared connection
+    pool: placeholder threads and parent steps, then all steps, each as one
+    batched statement. Everything that reads steps, or writes rows that refer
+    to them, flushes first. Like ChainlitDataLayer, writes of a session are
+    held until its first user message, so sessions without one leave no rows.
+
+    A batch that cannot be written is kept, merged with newer writes, and
+    retried with exponential backoff. After BATCH_RETRIES failed attempts its
+    steps are written one at a time, and steps rejected for their data are
+    dropped (and logged) so they cannot hold up the rest.
+
+    Resuming a thread loads its `resume_turns` most recent top-level steps
+    (normally one per question) with the steps under them. Tool step outputs
+    are cut to `resume_output_chars`; chat messages are loaded in full.
+    """
+
+    def __init__(self, database_url: str, storage_client: Optional[BaseStorageClient] = None, *,
+                 pool_size: int = 5, flush_interval: float = 0.5, max_batch: int = 200,
+                 resume_turns: int = 20, resume_output_chars: int = 4000):
+        super().__init__(database_url, storage_client)
+        self.pool_size = pool_size
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.resume_turns = resume_turns
+        self.resume_output_chars = resume_output_chars
+        self._pending = {}  # Step id -> merged step dict, in the order steps were first written
+        self._flush_task = None
+        self._flush_lock = asyncio.Lock()
+        self._failures = 0  # Consecutive failed flushes
+        self._retry_at = 0.0  # No flush is attempted before this time (monotonic) after a failure
+        # Counters
+        self.step_writes = 0
+        self.batches = 0
+        self.statements = 0
+        self.errors = 0
+        self.dropped = 0
+
+    async def connect(self):
+        if not self.pool:
+            self.pool = await asyncpg.create_pool(self.database_url, min_size=1, max_size=self.pool_size)
+
+    async def execute_query(self, query: str, params: Optional[Dict] = None) -> List[Dict]:
+        self.statements += 1
+        return await super().execute_query(query, params)
+
+    # Writes
+
+    @staticmethod
+    def _merge(pending: dict, step_dict: dict):
+        """Apply a later write of a step to its pending version."""
+        for key, value in step_dict.items():
+            # Same rules as the upsert: empty metadata and the "run" type do not overwrite
+            if value is None or (key == "metadata" and not value) or (key == "type" and value == "run"):
+                continue
+            pending[key] = value
+
+    @queue_until_user_message()
+    async def create_step(self, step_dict):
+        self.step_writes += 1
+        pending = self._pending.get(step_dict["id"])
+        if pending is None:
+            self._pending[step_dict["id"]] = {**step_dict, "firstCreatedAt": step_dict.get("createdAt")}
+        else:
+            self._merge(pending, step_dict)
+        if _write_through.get() or (len(self._pending) >= self.max_batch and time.monotonic() >= self._retry_at):
+            await self.flush()
+        else:
+            self._schedule_flush(self.flush_interval)
+
+    @queue_until_user_message()
+    async def update_step(self, step_dict):
+        await self.create_step(step_dict)
+
+    def _schedule_flush(self, delay: float):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later(delay))
+
+    async def _flush_later(self, delay: float):
+        await asyncio.sleep(max(delay, self._retry_at - time.monotonic()))
+        await self.flush()
+
+    @staticmethod
+    def _timestamp(value: Optional[str]) -> datetime:
+        return datetime.strptime(value, ISO_FORMAT) if value else datetime.now()
+
+    def _step_params(self, step: dict) -> tuple:
+        return (
+            step["id"],
+            step.get("threadId"),
+            step.get("parentId"),
+            step.get("input"),
+            json.dumps(step.get("metadata", {})),
+            step.get("name"),
+            step.get("output"),
+            step["type"],
+            self._timestamp(step.get("firstCreatedAt")),
+            self._timestamp(step.get("createdAt")),
+            str(step.get("showInput", "json")),
+            step.get("isError", False),
+        )
+
+    async def _write(self, steps: list):
+        """Write `steps` in one transaction: placeholder threads and parents, then the steps."""
+        threads = sorted({step["threadId"] for step in steps if step.get("threadId")})
+        parents = {}
+        for step in steps:
+            if step.get("parentId"):
+                parents.setdefault(step["parentId"], (step["parentId"], step.get("threadId"),
+                                                      self._timestamp(step.get("firstCreatedAt"))))
+        if not self.pool:
+            await self.connect()
+        async with self.pool.acquire() as connection, connection.transaction():
+            if threads:
+                await connection.executemany(THREAD_PLACEHOLDER, [(thread,) for thread in threads])
+            if parents:
+                await connection.executemany(PARENT_PLACEHOLDER, list(parents.values()))
+            await connection.executemany(STEP_UPSERT, [self._step_params(step) for step in steps])
+        self.batches += 1
+        self.statements += 1 + bool(threads) + bool(parents)
+
+    def _requeue(self, steps: list):
+        """Put steps that were not written back in front of the pending ones, keeping newer writes."""
+        pending = {}
+        for step in steps:
+            newer = self._pending.pop(step["id"], None)
+            if newer is not None:
+                self._merge(step, newer)
+            pending[step["id"]] = step
+        pending.update(self._pending)
+        self._pending = pending
+
+    async def flush(self):
+        """Write all pending steps in one transaction, keeping them for a retry if that fails."""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            steps, self._pending = list(self._pending.values()), {}
+            if self._failures >= BATCH_RETRIES:
+                failed = await self._write_each(steps)
+            else:
+                try:
+                    await self._write(steps)
+                    failed = []
+                except Exception as e:
+                    self.errors += 1
+                    logger.warning("Data layer: could not write %d steps: %s", len(steps), e)
+                    failed = steps
+            if not failed:
+                self._failures = 0
+                self._retry_at = 0.0
+                return
+            self._requeue(failed)
+            self._failures += 1
+            delay = min(self.flush_interval * 2 ** self._failures, MAX_RETRY_DELAY)
+            self._retry_at = time.monotonic() + delay
+            logger.warning("Data layer: %d steps pending, retrying in %.1fs", len(self._pending), delay)
+        self._schedule_flush(delay)
+
+    async def _write_each(self, steps: list) -> list:
+        """Write steps one at a time; returns those to retry. Steps rejected for their data are dropped."""
+        failed = []
+        for step in steps:
+            try:
+                await self._write([step])
+            except STEP_DATA_ERRORS as e:
+                self.errors += 1
+                self.dropped += 1
+                logger.error("Data layer: dropped step %s (%s) that cannot be written: %s",
+                             step["id"], step.get("type"), e)
+            except Exception as e:
+                self.errors += 1
+                logger.warning("Data layer: could not write step %s: %s", step["id"], e)
+                failed.append(step)
+        return failed
+
+    @queue_until_user_message()
+    async def create_element(self, element):
+        # Element.stepId refers to the step, so it must be written first. Queued calls are
+        # replayed through this method too, after the session's queued steps.
+        await self.flush()
+        token = _write_through.set(True)
+        try:
+            await super().create_element(element)
+        finally:
+            _write_through.reset(token)
+
+    async def upsert_feedback(self, feedback) -> str:
+        await self.flush()
+        return await super().upsert_feedback(feedback)
+
+    @queue_until_user_message()
+    async def delete_step(self, step_id: str):
+        await self.flush()
+        await super().delete_step(step_id)
+
+    async def delete_thread(self, thread_id: str):
+        await self.flush()
+        await super().delete_thread(thread_id)
+
+    # Reads
+
+    async def list_threads(self, pagination: Pagination, filters: ThreadFilter) -> PaginatedResponse[ThreadDict]:
+        """Threads of the sidebar, newest first (served by the Thread userId/createdAt index)."""
+        await self.flush()
+        query = """
+        SELECT t.id, t."createdAt", t.name, t."userId", t.metadata, u.identifier AS user_identifier
+        FROM "Thread" t
+        LEFT JOIN "User" u ON t."userId" = u.id
+        WHERE t."deletedAt" IS NULL
+        """
+        params = {}
+        if filters.search:
+            params["name"] = f"%{filters.search}%"
+            query += f" AND t.name ILIKE ${len(params)}"
+        if filters.userId:
+            params["user_id"] = filters.userId
+            query += f' AND t."userId" = ${len(params)}'
+        if pagination.cursor:
+            params["cursor"] = pagination.cursor
+            query += f' AND t."createdAt" < (SELECT "createdAt" FROM "Thread" WHERE id = ${len(params)})'
+        params["limit"] = pagination.first + 1
+        query += f' ORDER BY t."createdAt" DESC LIMIT ${len(params)}'
+
+        threads = await self.execute_query(query, params)
+        has_next_page = len(threads) > pagination.first
+        threads = threads[:pagination.first]
+        data = [
+            ThreadDict(
+                id=str(thread["id"]),
+                createdAt=thread["createdAt"].isoformat(),
+                name=thread["name"],
+                userId=str(thread["userId"]) if thread["userId"] else None,
+                userIdentifier=thread["user_identifier"],
+                metadata=json.loads(thread["metadata"]),
+                steps=[],
+                elements=[],
+                tags=[],
+            )
+            for thread in threads
+        ]
+        return PaginatedResponse(
+            pageInfo=PageInfo(
+                hasNextPage=has_next_page,
+                startCursor=data[0]["id"] if data else None,
+                endCursor=data[-1]["id"] if data else None,
+            ),
+            data=data,
+        )
+
+    async def get_thread(self, thread_id: str) -> Optional[ThreadDict]:
+        """The thread with its most recent turns, for resuming it."""
+        await self.flush()
+        results = await self.execute_query(
+            """
+            SELECT t.*, u.identifier AS user_identifier
+            FROM "Thread" t
+            LEFT JOIN "User" u ON t."userId" = u.id
+            WHERE t.id = $1 AND t."deletedAt" IS NULL
+            """,
+            {"thread_id": thread_id},
+        )
+        if not results:
+            return None
+        thread = results[0]
+
+        # Start of the oldest top-level step that is loaded (None: load them all)
+        cutoff = await self.execute_query(
+            """
+            SELECT "startTime" FROM "Step"
+            WHERE "threadId" = $1 AND "parentId" IS NULL
+            ORDER BY "startTime" DESC
+            OFFSET $2 LIMIT 1
+            """,
+            {"thread_id": thread_id, "offset": self.resume_turns - 1},
+        )
+        steps = await self.execute_query(
+            """
+            SELECT id, "threadId", "parentId", name, type, input, metadata, "createdAt",
+                   "startTime", "endTime", "showInput", "isError",
+                   CASE WHEN type::text = ANY($2::text[]) THEN output ELSE SUBSTR(output, 1, $3) END AS output,
+                   OCTET_LENGTH(output) AS output_bytes
+            FROM "Step"
+            WHERE "threadId" = $1 AND "startTime" >= $4
+            ORDER BY "startTime"
+            """,
+            {"thread_id": thread_id, "types": list(MESSAGE_STEP_TYPES), "chars": self.resume_output_chars,
+             "cutoff": cutoff[0]["startTime"] if cutoff else datetime.min},
+        )
+        # Keep only steps whose parent is loaded too (parents start before their children).
+        # SUBSTR and OCTET_LENGTH only read the start and the size of large outputs.
+        loaded, kept = set(), []
+        for step in steps:
+            if step["parentId"] is None or step["parentId"] in loaded:
+                loaded.add(step["id"])
+                if step["output"] is not None and step["output_bytes"] > len(step["output"]):
+                    missing = step["output_bytes"] - len(step["output"].encode())
+                    if missing > 0:
+                        step["output"] += f"\n… ({missing} more bytes not loaded)"
+                kept.append(step)
+
+        elements = await self.execute_query(
+            'SELECT * FROM "Element" WHERE "threadId" = $1 AND "stepId" = ANY($2::text[])',
+            {"thread_id": thread_id, "step_ids": list(loaded)},
+        ) if loaded else []
+        if self.storage_client is not None:
+            for element in elements:
+                if not element["url"] and element["objectKey"]:
+                    element["url"] = await self.storage_client.get_read_url(object_key=element["objectKey"])
+
+        return ThreadDict(
+            id=str(thread["id"]),
+            createdAt=thread["createdAt"].isoformat(),
+            name=thread["name"],
+            userId=str(thread["userId"]) if thread["userId"] else None,
+            userIdentifier=thread["user_identifier"],
+            metadata=json.loads(thread["metadata"]),
+            steps=[self._convert_step_row_to_dict(step) for step in kept],
+            elements=[self._convert_element_row_to_dict(element) for element in elements],
+            tags=[],
+        )
+
+    async def cleanup(self):
+        await self.flush()
+        if self._pending:
+            logger.error("Data layer: %d steps could not be written before shutdown", len(self._pending))
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+        await super().cleanup()
+
+    def stats(self) -> dict:
+        return {
+            "pending_steps": len(self._pending),
+            "step_writes": self.step_writes,
+            "batches": self.batches,
+            "statements": self.statements,
+            "errors": self.errors,
+            "dropped_steps": self.dropped,
+        }
+
+
+def storage_client_from_env() -> BaseStorageClient | None:
+    """Element storage configured like Chainlit's default data layer (S3, GCS or Azure), or None."""
+    bucket = getenv("BUCKET_NAME")
+    if getenv("APP_AWS_ACCESS_KEY") and getenv("APP_AWS_SECRET_KEY") and getenv("APP_AWS_REGION"):
+        from chainlit.data.storage_clients.s3 import S3StorageClient
+
+        return S3StorageClient(bucket=bucket, region_name=getenv("APP_AWS_REGION"),
+                               aws_access_key_id=getenv("APP_AWS_ACCESS_KEY"),
+                               aws_secret_access_key=getenv("APP_AWS_SECRET_KEY"),
+                               endpoint_url=getenv("DEV_AWS_ENDPOINT"))
+    if getenv("APP_GCS_PROJECT_ID") and getenv("APP_GCS_CLIENT_EMAIL") and getenv("APP_GCS_PRIVATE_KEY"):
+        from chainlit.data.storage_clients.gcs import GCSStorageClient
+
+        return GCSStorageClient(project_id=getenv("APP_GCS_PROJECT_ID"), client_email=getenv("APP_GCS_CLIENT_EMAIL"),
+                                private_key=getenv("APP_GCS_PRIVATE_KEY"), bucket_name=bucket)
+    if getenv("APP_AZURE_STORAGE_ACCOUNT") and getenv("APP_AZURE_STORAGE_ACCESS_KEY"):
+        from chainlit.data.storage_clients.azure_blob import AzureBlobStorageClient
+
+        return AzureBlobStorageClient(container_name=bucket, storage_account=getenv("APP_AZURE_STORAGE_ACCOUNT"),
+                                      storage_key=getenv("APP_AZURE_STORAGE_ACCESS_KEY"))
+    return None
+
+
+def create_data_layer() -> BatchedDataLayer | None:
+    """Batched data layer for DATABASE_URL, or None to keep Chainlit's default data layer."""
+    database_url = getenv("DATABASE_URL")
+    if not database_url or getenv("DATA_LAYER_BATCHING", "true").lower() != "true":
+        return None
+    storage_client = storage_client_from_env()
+    # Without element storage, full tool results are kept in their steps (see rendering.py), so load them whole
+    from rendering import RENDER_STEP_MAX_CHARS
+
+    default_output_chars = 4000 if storage_client else RENDER_STEP_MAX_CHARS
+    return BatchedDataLayer(
+        database_url,
+        storage_client,
+        pool_size=int(getenv("DATA_LAYER_POOL_SIZE", "5")),
+        flush_interval=float(getenv("DATA_LAYER_FLUSH_INTERVAL", "0.5")),
+        max_batch=int(getenv("DATA_LAYER_MAX_BATCH", "200")),
+        resume_turns=int(getenv("RESUME_MAX_TURNS", "20")),
+        resume_output_chars=int(getenv("RESUME_OUTPUT_CHARS", str(default_output_chars))),
+    )
@@ -0,0 +1,251 @@
+import contextvars
+import json
+import logging
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from os import getenv
+
+# Levelled logging for the app. Payload dumps are logged at DEBUG, which is off by default.
+logger = logging.getLogger("cybertrace")
+if not logger.handlers:
+    _handler = logging.StreamHandler(sys.stdout)
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    logger.addHandler(_handler)
+    logger.propagate = False
+logger.setLevel(getenv("LOG_LEVEL", "INFO").upper())
+
+# Append one JSON line per request (with all its spans) to this file, if set
+TRACE_JSONL_PATH = getenv("TRACE_JSONL_PATH", "")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+def _label_value(value) -> str:
+    """Escape a label value for the Prometheus text format."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_label_value(value)}"' for key, value in labels) + "}"
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self.values = {}
+
+    def inc(self, value: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        self.values[key] = self.values.get(key, 0) + value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_label_text(key)} {value}" for key, value in self.values.items()]
+        return lines
+
+
+class Histogram:
+    """Histogram with fixed buckets and optional labels (Prometheus semantics)."""
+
+    def __init__(self, name: str, help: str, buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.series = {}  # labels -> [per-bucket counts, sum, count]
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = [[0] * len(self.buckets), 0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[0][i] += 1
+                break
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in self.series.items():
+            cumulative = 0
+            for bound, bucket in zip(self.buckets, counts):
+                cumulative += bucket
+                lines.append(f"{self.name}_bucket{_label_text(key + (('le', f'{bound:g}'),))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_label_text(key + (('le', '+Inf'),))} {count}")
+            lines.append(f"{self.name}_sum{_label_text(key)} {total}")
+            lines.append(f"{self.name}_count{_label_text(key)} {count}")
+        return lines
+
+
+step_seconds = Histogram("cybertrace_step_seconds", "Duration of pipeline steps (graph nodes, LLM and MCP calls).")
+request_seconds = Histogram("cybertrace_request_seconds", "End-to-end duration of chat requests, by answering path.")
+first_token_seconds = Histogram("cybertrace_first_token_seconds", "Time from request start to the first streamed token.")
+tool_payload_bytes = Histogram("cybertrace_tool_payload_bytes", "Size of tool results sent to the model.", BYTES_BUCKETS)
+llm_tokens = Counter("cybertrace_llm_tokens_total",
+                     "LLM tokens by kind (input, output, cache_read, cache_creation) and model tier.")
+llm_cost = Counter("cybertrace_llm_cost_total", "LLM cost reported by the provider, in credits (USD), by model tier.")
+llm_calls = Counter("cybertrace_llm_calls_total", "LLM calls by model tier and the reason the tier was chosen.")
+shed_requests = Counter("cybertrace_shed_requests_total",
+                        "Chat requests rejected by admission control, by reason (queue_full, user_limit, queue_timeout).")
+run_limits = Counter("cybertrace_run_limits_total",
+                     "Chat runs stopped early by a limit, by limit (deadline, recursion, tool_iterations).")
+
+METRICS = [step_seconds, request_seconds, first_token_seconds, tool_payload_bytes, llm_tokens, llm_cost, llm_calls,
+           shed_requests, run_limits]
+
+# Callables returning {name: value} for point-in-time gauges (pool and cache stats)
+gauge_collectors = {}
+
+
+def register_gauges(prefix: str, collect):
+    """Expose the numeric values returned by `collect()` as gauges named `<prefix>_<key>`."""
+    gauge_collectors[prefix] = collect
+
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in METRICS:
+        lines += metric.render()
+    for prefix, collect in gauge_collectors.items():
+        try:
+            values = collect()
+        except Exception as e:
+            logger.warning("Could not collect %s gauges: %s", prefix, e)
+            continue
+        for key, value in values.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                lines.append(f"# TYPE {prefix}_{key} gauge")
+                lines.append(f"{prefix}_{key} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class RequestTrace:
+    """Spans of one chat request, for the timing breakdown and the JSON lines trace."""
+
+    def __init__(self, **attributes):
+        self.request_id = uuid.uuid4().hex[:16]
+        self.attributes = attributes
+        # Labels of the request metrics, e.g. the path that answered it
+        self.labels = {"path": "llm"}
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.spans = []
+        self.marks = {}
+
+    def add_span(self, step: str, started: float, seconds: float, attributes: dict):
+        self.spans.append({"step": step, "start": round(started - self.started, 4),
+                           "seconds": round(seconds, 4), **attributes})
+
+    def mark(self, name: str):
+        """Record the first time `name` happened, relative to the request start."""
+        if name not in self.marks:
+            self.marks[name] = round(time.perf_counter() - self.started, 4)
+
+    def breakdown(self) -> dict:
+        """Total seconds per step (concurrent spans of the same step are summed)."""
+        totals = {}
+        for span in self.spans:
+            totals[span["step"]] = round(totals.get(span["step"], 0.0) + span["seconds"], 4)
+        return totals
+
+    def finish(self, **attributes) -> dict:
+        """Record the request metrics, log the breakdown and append the trace line."""
+        seconds = time.perf_counter() - self.started
+        request_seconds.observe(seconds, **self.labels)
+        if "first_token" in self.marks:
+            first_token_seconds.observe(self.marks["first_token"], **self.labels)
+        record = {
+            "request_id": self.request_id,
+            "started_at": self.started_at,
+            "seconds": round(seconds, 4),
+            **self.attributes,
+            **self.labels,
+            **attributes,
+            "marks": self.marks,
+            "breakdown": self.breakdown(),
+            "spans": self.spans,
+        }
+        steps = " ".join(f"{step}={value:.3f}s" for step, value in record["breakdown"].items())
+        logger.info("Request %s took %.3fs: %s", self.request_id, seconds, steps)
+        if TRACE_JSONL_PATH:
+            try:
+                with open(TRACE_JSONL_PATH, "a") as f:
+                    f.write(json.dumps(record, default=str) + "\n")
+            except OSError as e:
+                logger.warning("Could not write trace to %s: %s", TRACE_JSONL_PATH, e)
+        return record
+
+
+current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+def start_trace(**attributes) -> RequestTrace:
+    """Start the trace of a request; spans in this context (and its tasks) are added to it."""
+    trace = RequestTrace(**attributes)
+    current_trace.set(trace)
+    return trace
+
+
+@contextmanager
+def span(step: str, **labels):
+    """
+    Time a step: observe it in `step_seconds` (labelled with `step` and `labels`)
+    and add it to the current request trace. The yielded dict can be filled
+    with extra attributes for the trace (e.g. token counts).
+    """
+    attributes = dict(labels)
+    started = time.perf_counter()
+    try:
+        yield attributes
+    finally:
+        seconds = time.perf_counter() - started
+        step_seconds.observe(seconds, step=step, **labels)
+        trace = current_trace.get()
+        if trace is not None:
+            trace.add_span(step, started, seconds, attributes)
+
+
+def record_llm_usage(message, attributes: dict | None = None, **labels):
+    """Count the input, output and prompt cache tokens reported for an LLM response (labelled with `labels`)."""
+    usage = getattr(message, "usage_metadata", None)
+    if not usage:
+        return
+    # Cache writes and cost are only in the provider's raw usage (OpenRouter, Anthropic)
+    raw = (getattr(message, "response_metadata", None) or {}).get("token_usage") or {}
+    raw_details = raw.get("prompt_tokens_details") or {}
+    tokens = {
+        "input": usage.get("input_tokens", 0),
+        "output": usage.get("output_tokens", 0),
+        "cache_read": (usage.get("input_token_details") or {}).get("cache_read", 0),
+        "cache_creation": (usage.get("input_token_details") or {}).get("cache_creation")
+        or raw_details.get("cache_write_tokens") or raw.get("cache_creation_input_tokens") or 0,
+    }
+    for kind, count in tokens.items():
+        if count:
+            llm_tokens.inc(count, kind=kind, **labels)
+    cost = raw.get("cost") or 0
+    if cost:
+        llm_cost.inc(cost, **labels)
+    if attributes is not None:
+        attributes.update({f"{kind}_tokens": count for kind, count in tokens.items()})
+        if cost:
+            attributes["cost"] = cost
+
+
+def record_tool_payload(tool: str, content, attributes: dict | None = None):
+    """Observe the size of a tool result that is sent to the model."""
+    size = len((content if isinstance(content, str) else json.dumps(content, default=str)).encode())
+    tool_payload_bytes.observe(size, tool=tool)
+    if attributes is not None:
+        attributes["payload_bytes"] = size
+    logger.debug("Tool %s returned %d bytes: %s", tool, size, content)
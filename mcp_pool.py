@@ -0,0 +1,247 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from langchain_mcp_adapters.sessions import create_session
+from instrumentation import logger, span
+
+
+class _PooledSession:
+    """A single long-lived MCP session owned by a background task."""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.session = None
+        self.task = None
+        self.stop = None
+        self.broken = False
+        self.calls = 0  # Calls served since the session was (re)started
+
+
+class MCPSessionPool:
+    """
+    Keeps a fixed number of warm MCP client sessions and hands them out per call.
+
+    Each session is entered and exited inside its own owner task, because the
+    stdio transport (anyio) requires its context to be closed by the task that
+    opened it. The pool is started lazily on the running event loop, so it can be
+    created at import time and used later from Chainlit or LangGraph.
+
+    The pool exposes `call_tool` and `list_tools`, which lets it be passed to
+    `langchain_mcp_adapters` anywhere a `ClientSession` is expected.
+    """
+
+    def __init__(self, connection: dict, size: int = 2, health_check_interval: float = 30.0,
+                 health_check_timeout: float = 10.0):
+        self.connection = connection
+        self.size = max(1, size)
+        self.health_check_interval = health_check_interval
+        self.health_check_timeout = health_check_timeout
+        self._loop = None
+        self._idle = None
+        self._slots = []
+        self._start_task = None
+        self._health_task = None
+        self._background = set()  # Restarts in flight, referenced so they are not garbage collected
+        # Metrics
+        self._acquired = 0
+        self._reused = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._sessions_started = 0
+        self._restarts = 0
+        self._health_check_failures = 0
+
+    async def start(self):
+        """Start all sessions on the running loop (no-op if already started there)."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # First use, or the previous loop is gone (e.g. an earlier asyncio.run()).
+            self._loop = loop
+            self._idle = asyncio.Queue()
+            self._slots = [_PooledSession(i) for i in range(self.size)]
+            self._start_task = asyncio.ensure_future(self._start_all())
+        await asyncio.shield(self._start_task)
+
+    async def _start_all(self):
+        results = await asyncio.gather(
+            *(self._spawn(slot) for slot in self._slots), return_exceptions=True
+        )
+        failures = [r for r in results if isinstance(r, Exception)]
+        for slot in self._slots:
+            self._idle.put_nowait(slot)
+        if len(failures) == len(self._slots):
+            # Allow a later call to retry from scratch.
+            self._loop = None
+            raise failures[0]
+        if failures:
+            logger.warning("%d/%d MCP sessions failed to start: %s", len(failures), self.size, failures[0])
+        logger.info("MCP session pool started with %d warm sessions.", self.size - len(failures))
+        if self.health_check_interval > 0:
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    async def _spawn(self, slot: _PooledSession):
+        """Start the owner task for a slot and wait until its session is initialized."""
+        ready = asyncio.get_running_loop().create_future()
+        slot.stop = asyncio.Event()
+        slot.broken = False
+        slot.calls = 0
+        slot.task = asyncio.create_task(self._run_slot(slot, ready))
+        await ready
+
+    async def _run_slot(self, slot: _PooledSession, ready: asyncio.Future):
+        try:
+            async with create_session(self.connection) as session:
+                await session.initialize()
+                slot.session = session
+                self._sessions_started += 1
+                ready.set_result(None)
+                await slot.stop.wait()
+        except BaseException as e:
+            # Also on cancellation: _spawn must not wait forever, and the slot must be revived
+            slot.broken = True
+            if not ready.done():
+                ready.set_exception(e if isinstance(e, Exception) else RuntimeError(f"MCP session {slot.index} was cancelled"))
+            elif isinstance(e, Exception):
+                logger.warning("MCP session %d closed with error: %s", slot.index, e)
+            if not isinstance(e, Exception):
+                raise
+        finally:
+            slot.session = None
+
+    async def _stop_slot(self, slot: _PooledSession, timeout: float = 5.0):
+        if slot.task is None:
+            return
+        slot.stop.set()
+        try:
+            await asyncio.wait_for(slot.task, timeout)
+        except Exception:
+            slot.task.cancel()
+        slot.task = None
+
+    async def _revive(self, slot: _PooledSession):
+        """Replace a crashed or unhealthy session with a fresh server process."""
+        await self._stop_slot(slot)
+        await self._spawn(slot)
+        self._restarts += 1
+        logger.info("Restarted MCP session %d.", slot.index)
+
+    async def _revive_and_release(self, slot: _PooledSession):
+        try:
+            await self._revive(slot)
+        except Exception as e:
+            logger.warning("Failed to restart MCP session %d: %s", slot.index, e)
+        finally:
+            self._idle.put_nowait(slot)
+
+    def _release_broken(self, slot: _PooledSession):
+        task = asyncio.create_task(self._revive_and_release(slot))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    @asynccontextmanager
+    async def session(self):
+        """Borrow a session from the pool for the duration of the block."""
+        await self.start()
+        started = time.perf_counter()
+        with span("mcp_session_wait"):
+            slot = await self._idle.get()
+        waited = time.perf_counter() - started
+        self._acquired += 1
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+
+        if slot.session is None:
+            # The session died while idle and could not be restarted in the background.
+            try:
+                await self._revive(slot)
+            except Exception:
+                self._idle.put_nowait(slot)
+                raise
+
+        if slot.calls:
+            self._reused += 1
+        slot.calls += 1
+        try:
+            yield slot.session
+        except BaseException:
+            # Tool-level errors come back as results, so an exception here means the
+            # transport or the server process is in trouble. A cancelled call (e.g. a tool
+            # timeout) leaves its request in flight, so that session is not reused either.
+            slot.broken = True
+            raise
+        finally:
+            if slot.broken:
+                self._release_broken(slot)
+            else:
+                self._idle.put_nowait(slot)
+
+    async def call_tool(self, name: str, *args, **kwargs):
+        async with self.session() as session:
+            with span("mcp_call", tool=name):
+                return await session.call_tool(name, *args, **kwargs)
+
+    async def list_tools(self, *args, **kwargs):
+        async with self.session() as session:
+            return await session.list_tools(*args, **kwargs)
+
+    async def health_check(self) -> int:
+        """Ping every idle session and restart the ones that do not answer.
+
+        Returns the number of sessions that failed the check.
+        """
+        slots = [self._idle.get_nowait() for _ in range(self._idle.qsize())]
+        # Pinged concurrently, and each slot goes back as soon as it answers
+        results = await asyncio.gather(*(self._check_slot(slot) for slot in slots))
+        return results.count(False)
+
+    async def _check_slot(self, slot: _PooledSession) -> bool:
+        healthy = slot.session is not None
+        if healthy:
+            try:
+                await asyncio.wait_for(slot.session.send_ping(), self.health_check_timeout)
+            except Exception:
+                healthy = False
+        if healthy:
+            self._idle.put_nowait(slot)
+        else:
+            self._health_check_failures += 1
+            self._release_broken(slot)
+        return healthy
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            try:
+                await self.health_check()
+            except Exception as e:
+                logger.warning("MCP health check failed: %s", e)
+
+    async def close(self):
+        """Stop all sessions and their server processes."""
+        if self._loop is None or self._loop is not asyncio.get_running_loop():
+            return
+        if self._health_task:
+            self._health_task.cancel()
+            self._health_task = None
+        for task in list(self._background):
+            task.cancel()
+        await asyncio.gather(*self._background, return_exceptions=True)
+        await asyncio.gather(*(self._stop_slot(slot) for slot in self._slots))
+        self._loop = None
+        logger.info("MCP session pool closed.")
+
+    def stats(self) -> dict:
+        """Snapshot of pool metrics."""
+        return {
+            "size": self.size,
+            "alive": sum(1 for slot in self._slots if slot.session is not None),
+            "idle": self._idle.qsize() if self._idle else 0,
+            "acquired": self._acquired,
+            "reused": self._reused,
+            "wait_seconds_total": self._wait_total,
+            "wait_seconds_max": self._wait_max,
+            "wait_seconds_avg": self._wait_total / self._acquired if self._acquired else 0.0,
+            "sessions_started": self._sessions_started,
+            "restarts": self._restarts,
+            "health_check_failures": self._health_check_failures,
+        }
@@ -0,0 +1,5 @@
+-- CreateIndex
+CREATE INDEX "Step_threadId_parentId_startTime_idx" ON "Step"("threadId", "parentId", "startTime");
+
+-- CreateIndex
+CREATE INDEX "Thread_userId_createdAt_idx" ON "Thread"("userId", "createdAt" DESC);
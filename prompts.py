@@ -0,0 +1,222 @@
+import re
+from os import getenv
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from router import TABLE_WORDS
+
+# Mark cache breakpoints so the provider can reuse the stable prefix of each prompt
+PROMPT_CACHE_ENABLED = getenv("PROMPT_CACHE_ENABLED", "true").lower() == "true"
+# Tables whose query examples are added to a question at most
+MAX_EXAMPLE_TABLES = int(getenv("MAX_EXAMPLE_TABLES", "2"))
+
+CACHE_CONTROL = {"type": "ephemeral"}
+
+# Sent unchanged on every call: together with the tool schemas, which the provider
+# places before it, this is the prefix that every prompt of every chat shares.
+BASE_PROMPT = """You are a Network Observability Assistant that uses SuzieQ tools to answer network state queries precisely.
+
+THOUGHT PROCESS:
+1. Understand the user's query and the specific network information needed.
+2. Identify the appropriate SuzieQ table (e.g., device, interface, bgp, routes, ospf, mac, lldp, evpnVni, route, mlag, vlan, fs).
+3. Choose the correct tool: 'run_suzieq_show' for detailed data or 'run_suzieq_summarize' for aggregated views.
+4. Determine necessary filters (hostname, vrf, state, namespace, status, vendor, mtu, adminState, portmode, vlan, asn, bfdStatus, afiSafi, area, helloTime, networkType, moveCount, ifname, vni, prefix, protocol, numNexthops, prefixlen, start_time, end_time, view, type, version, usedPercent, etc.) to narrow down the results.
+5. Construct the tool call with the 'table' and optional 'filters' arguments.
+6. Analyze the JSON response and formulate a clear answer for the user.
+7. Known timestamp fields are already converted to readable dates. If other epoch timestamps remain, convert them all at once with 'humanize_timestamps_tool'.
+
+AVAILABLE TOOLS:
+
+1.  **run_suzieq_show**: Retrieves detailed information from a specific SuzieQ table.
+    *   `table` (String, Required): The SuzieQ table name (e.g., "device", "interface", "bgp", "ospf", "mac", "lldp", "evpnVni", "route", "mlag", "vlan", "fs").
+    *   `filters` (Dictionary, Optional): Key-value pairs for filtering (e.g., { "hostname": "leaf01", "state": "up" }). Supports comparison operators (e.g., { "mtu": "> 9000" }, { "state": "!Established" }). Supports time-based filters (e.g., { "start_time": "2 hours ago", "end_time": "now", "view": "changes" }). Omit or use {} for no filters.
+    *   Returns: JSON string with detailed results.
+
+2.  **run_suzieq_summarize**: Provides a summarized overview of data in a SuzieQ table.
+    *   `table` (String, Required): The SuzieQ table name to summarize (e.g., "device", "interface", "bgp", "ospf", "route", "vlan").
+    *   `filters` (Dictionary, Optional): Key-value pairs for filtering (e.g., { "hostname": "leaf01", "namespace": "dual-bgp" }). Omit or use {} for no filters.
+    *   Returns: JSON string with summarized results.
+
+3.  **humanize_timestamp_tool**: Converts a UNIX epoch timestamp (in milliseconds) to a human-readable datetime string.
+    *   `timestamp_ms` (Integer, Required): The UNIX epoch timestamp in milliseconds (e.g., 1678886400000).
+    *   `tz` (String, Optional): The target timezone (e.g., 'America/New_York', 'Europe/London'). Defaults to 'UTC'.
+    *   Returns: A string representing the human-readable datetime in the specified timezone (e.g., "2023-03-15 13:20:00 UTC").
+
+4.  **humanize_timestamps_tool**: Converts many UNIX epoch timestamps (in milliseconds) in one call. Prefer it over humanize_timestamp_tool whenever there is more than one value.
+    *   `timestamps_ms` (List of Integers, Required): The UNIX epoch timestamps in milliseconds.
+    *   `tz` (String, Optional): The target timezone. Defaults to 'UTC'.
+    *   Returns: JSON object mapping each timestamp to its readable datetime.
+
+5.  **get_result_page**: Returns more of a large `run_suzieq_show` result without querying SuzieQ again.
+    *   Large results are shortened to a compact view: `columns` + `rows` arrays, `total_rows`, a `more_rows` marker, grouped `counts` and a `result_id`.
+    *   `result_id` (String, Required): The `result_id` from the shortened result.
+    *   `offset` / `limit` (Integer, Optional): Which rows to return (at most 200 per page).
+    *   `columns` (List, Optional): Columns to return, including ones listed in `omitted_columns`.
+    *   `group_by` (List, Optional): Return row counts grouped by these columns instead of rows.
+    *   Returns: JSON string with the requested rows or counts.
+
+QUERY EXAMPLES:
+Production-tested query examples for the tables in the user's question are given before the question, under "Query examples". Follow their table names, filter keys and value formats.
+
+## Working with Timestamps from SuzieQ Output
+
+### Timestamps Are Converted Automatically
+Results of run_suzieq_show already show the common timestamp fields as readable datetimes (e.g., "2023-03-15 13:20:00 UTC"); shortened results say so with `timestamps_converted_to`. Do not convert these again.
+* device table: "bootupTimestamp", "pollTimestamp", "lastBoot"
+* interface table: "timestamp", "lastChange"
+* bgp table: "estdTime", "timestamp"
+* ospf table: "timestamp", "lastChangeTime"
+* route table: "timestamp"
+
+### Converting Other Timestamps
+If a result still contains epoch timestamps in milliseconds (usually large 13-digit numbers), or the user wants another timezone, convert ALL of them with a single humanize_timestamps_tool call. Never call a timestamp tool once per value.
+
+*   Convert several timestamps to Eastern Time:
+    `timestamps_ms: [1678886400000, 1700000000000], tz: "America/New_York"` (using humanize_timestamps_tool)
+    Result: `{ "1678886400000": "2023-03-15 09:20:00 EDT", "1700000000000": "2023-11-14 17:13:20 EST" }`
+
+QUERY GUIDELINES:
+*   Be specific about the table you want to query (e.g., device, interface, bgp, ospf, mac, lldp, evpnVni, route, mlag, vlan, fs).
+*   Use filters to request data only for relevant devices, VRFs, states, interfaces, protocols, etc. Understand filter keys and potential values/operators.
+*   Use `run_suzieq_summarize` for overviews, counts, and aggregated status.
+*   Use `run_suzieq_show` for detailed attribute information, specific entries, or time-based analysis.
+
+RESPONSE FORMAT:
+1. Directly answer the user's query using the information retrieved from the tools.
+2. Present the data clearly, often referencing the source table and filters used.
+3. If applicable, suggest relevant follow-up questions based on the results.
+
+Remember:
+*   Only use the provided tools (`run_suzieq_show`, `run_suzieq_summarize`, `humanize_timestamp_tool`, `humanize_timestamps_tool`, `get_result_page`).
+*   When a result says `more_rows`, answer from `total_rows` and `counts` when possible; use `get_result_page` only if the question needs rows that were not shown.
+*   Ensure the 'table' parameter is always provided.
+*   Format filters correctly as a dictionary if used. Pay attention to data types and operators (e.g., ">", "!=").
+"""
+
+SYSTEM_MESSAGE = SystemMessage(content=[
+    {"type": "text", "text": BASE_PROMPT, **({"cache_control": CACHE_CONTROL} if PROMPT_CACHE_ENABLED else {})}
+])
+
+# Few-shot examples by table: (description, arguments, tool)
+EXAMPLES = {
+    "device": [
+        ("Show all devices in namespace 'suzieq-demo'", '{ "table": "device", "filters": { "namespace": "suzieq-demo" } }', "run_suzieq_show"),
+        ("Show devices with status 'alive'", '{ "table": "device", "filters": { "status": "alive" } }', "run_suzieq_show"),
+        ("Show Arista devices", '{ "table": "device", "filters": { "vendor": "Arista" } }', "run_suzieq_show"),
+        ("Show uptime for all devices", '{ "table": "device", "filters": { "columns": ["namespace", "hostname", "bootupTimestamp", "status"] } }', "run_suzieq_show"),
+        ("Show alive devices in a specific namespace with their uptime", '{ "table": "device", "filters": { "namespace": "suzieq-demo", "status": "alive", "columns": ["hostname", "bootupTimestamp"] } }', "run_suzieq_show"),
+        ("Show uptime for devices from a specific vendor", '{ "table": "device", "filters": { "vendor": "Arista", "columns": ["namespace", "hostname", "bootupTimestamp", "status"] } }', "run_suzieq_show"),
+        ("Show uptime for specific model devices", '{ "table": "device", "filters": { "model": "cEOSLab", "columns": ["namespace", "hostname", "bootupTimestamp", "status"] } }', "run_suzieq_show"),
+    ],
+    "interface": [
+        ("Show interfaces with MTU greater than 9000", '{ "table": "interface", "filters": { "mtu": "> 9000" } }', "run_suzieq_show"),
+        ("Show 'down' interfaces", '{ "table": "interface", "filters": { "state": "down" } }', "run_suzieq_show"),
+        ("Show ethernet interfaces", '{ "table": "interface", "filters": { "type": "ethernet" } }', "run_suzieq_show"),
+        ("Show ethernet interfaces in namespace 'suzieq-demo'", '{ "table": "interface", "filters": { "type": "ethernet", "namespace": "suzieq-demo" } }', "run_suzieq_show"),
+        ("Summarize interface states across the network", '{ "table": "interface" }', "run_suzieq_summarize"),
+    ],
+    "bgp": [
+        ("Show BGP sessions in 'NotEstd' state", '{ "table": "bgp", "filters": { "state": "NotEstd" } }', "run_suzieq_show"),
+        ("Show BGP sessions in VRF 'default'", '{ "table": "bgp", "filters": { "vrf": "default" } }', "run_suzieq_show"),
+        ("Show BGP sessions for ASN 65001", '{ "table": "bgp", "filters": { "asn": "65001" } }', "run_suzieq_show"),
+        ("Show BGP sessions in VRF 'default' and namespace 'suzieq-demo'", '{ "table": "bgp", "filters": { "vrf": "default", "namespace": "suzieq-demo" } }', "run_suzieq_show"),
+        ("Summarize BGP sessions", '{ "table": "bgp" }', "run_suzieq_summarize"),
+    ],
+    "route": [
+        ("Show routes for prefix '10.10.10.1/32'", '{ "table": "route", "filters": { "prefix": "10.10.10.1/32" } }', "run_suzieq_show"),
+        ("Show routes learned via 'ibgp'", '{ "table": "route", "filters": { "protocol": "ibgp" } }', "run_suzieq_show"),
+        ("Show routes for VRF 'default'", '{ "table": "route", "filters": { "vrf": "default" } }', "run_suzieq_show"),
+        ("Show routes with prefix length greater than 24", '{ "table": "route", "filters": { "prefixlen": "> 24" } }', "run_suzieq_show"),
+        ("Show routes with next-hop through interface 'Ethernet1'", '{ "table": "route", "filters": { "oifs": "Ethernet1" } }', "run_suzieq_show"),
+        ("Summarize route distribution", '{ "table": "route" }', "run_suzieq_summarize"),
+    ],
+}
+
+# Used when the question names no table with examples
+DEFAULT_EXAMPLES = [
+    EXAMPLES["device"][0],
+    EXAMPLES["device"][3],
+    ("Summarize BGP sessions", '{ "table": "bgp" }', "run_suzieq_summarize"),
+    ("Summarize interface states across the network", '{ "table": "interface" }', "run_suzieq_summarize"),
+    ("Summarize route distribution", '{ "table": "route" }', "run_suzieq_summarize"),
+]
+
+
+def question_tables(text: str) -> list:
+    """SuzieQ tables named in `text`, in the order of the router's table words."""
+    return [table for table, pattern in TABLE_WORDS if re.search(pattern, text, re.IGNORECASE)]
+
+
+def select_examples(text: str) -> list:
+    """Examples for the tables named in the question, or the default ones."""
+    tables = [table for table in question_tables(text) if table in EXAMPLES][:MAX_EXAMPLE_TABLES]
+    if not tables:
+        return DEFAULT_EXAMPLES
+    return [example for table in tables for example in EXAMPLES[table]]
+
+
+def render_examples(examples: list) -> str:
+    lines = ["Query examples:"]
+    for description, arguments, tool in examples:
+        lines.append(f"*   {description}:\n    `{arguments}` (using {tool})")
+    return "\n".join(lines)
+
+
+def _text_blocks(content) -> list:
+    if isinstance(content, str):
+        return [{"type": "text", "text": content}]
+    return [dict(block) if isinstance(block, dict) else {"type": "text", "text": str(block)} for block in content]
+
+
+def _with_breakpoint(msg):
+    """Copy of `msg` whose last text block ends a cached prefix."""
+    blocks = _text_blocks(msg.content)
+    blocks[-1]["cache_control"] = CACHE_CONTROL
+    return msg.model_copy(update={"content": blocks})
+
+
+def _has_text(msg) -> bool:
+    if not isinstance(msg, (HumanMessage, AIMessage)):
+        return False
+    blocks = _text_blocks(msg.content)
+    return bool(blocks) and blocks[-1].get("type") == "text" and bool(blocks[-1].get("text"))
+
+
+def with_examples(msg: HumanMessage) -> HumanMessage:
+    """Copy of a question with the query examples for its tables in front of it."""
+    examples = render_examples(select_examples(msg.text()))
+    return msg.model_copy(update={"content": [{"type": "text", "text": examples}, *_text_blocks(msg.content)]})
+
+
+def add_examples(messages: list) -> list:
+    """
+    Give every question the query examples for its own tables.
+
+    They depend only on the question's text, so earlier turns are sent exactly as
+    before. Call this before compaction, so that the examples count against the
+    context budget. Stored messages are not modified.
+    """
+    return [with_examples(msg) if isinstance(msg, HumanMessage) else msg for msg in messages]
+
+
+def layout_prompt(messages: list) -> list:
+    """
+    Arrange (already compacted) messages so that the provider can cache their prefix.
+
+    The system message is the same object on every call, so the tool schemas and
+    the base prompt form a byte-identical prefix with a cache breakpoint at its
+    end. The last text message of the older history gets a breakpoint, so the
+    next call reads the whole history from the cache. The current question gets
+    the last one, which the calls after its tool results reuse. Stored messages
+    are not modified.
+    """
+    system = [msg for msg in messages if isinstance(msg, SystemMessage)]
+    history = [msg for msg in messages if not isinstance(msg, SystemMessage)]
+    human_positions = [i for i, msg in enumerate(history) if isinstance(msg, HumanMessage)]
+    if not PROMPT_CACHE_ENABLED or not human_positions:
+        return system + history
+    current = human_positions[-1]
+    history[current] = _with_breakpoint(history[current])
+    for i in range(current - 1, -1, -1):
+        if _has_text(history[i]):
+            history[i] = _with_breakpoint(history[i])
+            break
+    return system + history
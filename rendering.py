@@ -0,0 +1,149 @@
+import hashlib
+import json
+from collections import OrderedDict
+from os import getenv
+import pandas as pd
+from shaping import TIMESTAMP_TZ, result_store, to_frame
+from utils import humanize_frame
+
+# Rows and columns of a table result shown in the Telemetry Response step
+RENDER_PREVIEW_ROWS = int(getenv("RENDER_PREVIEW_ROWS", "10"))
+RENDER_PREVIEW_COLUMNS = int(getenv("RENDER_PREVIEW_COLUMNS", "8"))
+# Results up to this size are shown in full instead of as a preview
+RENDER_INLINE_BYTES = int(getenv("RENDER_INLINE_BYTES", "2048"))
+# Longest cell value shown in a preview table
+MAX_CELL_CHARS = 40
+# Without element storage the full result is kept in the step itself, up to this many characters
+RENDER_STEP_MAX_CHARS = int(getenv("RENDER_STEP_MAX_CHARS", "65536"))
+
+render_totals = {"results": 0, "duplicates": 0, "elements": 0, "bytes_raw": 0, "bytes_step": 0}
+
+
+def content_hash(content) -> str:
+    """Short hash identifying a tool result."""
+    text = content if isinstance(content, str) else json.dumps(content, default=str, sort_keys=True)
+    return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+
+def result_frame(content, artifact) -> tuple:
+    """
+    Full table behind a tool result as (DataFrame, table), or (None, "") if it is not a table.
+
+    Shaped results are looked up in `result_store` by their result_id, so the
+    whole table is shown, not only the rows the model saw. Results of
+    `get_result_page` (columns and rows) and plain JSON tables are parsed.
+    """
+    if isinstance(artifact, dict) and (entry := result_store.get(artifact.get("result_id", ""))):
+        df, table, _ = entry
+        return df, table
+    df = to_frame(content)
+    if df is not None:
+        return df, ""
+    try:
+        data = json.loads(content) if isinstance(content, str) else None
+    except ValueError:
+        return None, ""
+    if isinstance(data, dict) and isinstance(data.get("columns"), list) and isinstance(data.get("rows"), list):
+        return pd.DataFrame(data["rows"], columns=data["columns"]), data.get("table", "")
+    return None, ""
+
+
+def _cell(value, max_chars: int | None = MAX_CELL_CHARS) -> str:
+    if isinstance(value, list):
+        value = ", ".join(map(str, value))
+    text = "" if not isinstance(value, dict) and pd.isna(value) else str(value)
+    if max_chars and len(text) > max_chars:
+        text = text[:max_chars - 1] + "…"
+    return text.replace("|", "\\|").replace("\n", " ")
+
+
+def markdown_table(df: pd.DataFrame) -> str:
+    """Markdown table of the first rows and columns of `df`."""
+    columns = list(df.columns[:RENDER_PREVIEW_COLUMNS])
+    lines = ["| " + " | ".join(_cell(column) for column in columns) + " |",
+             "|" + "---|" * len(columns)]
+    for row in df[columns].head(RENDER_PREVIEW_ROWS).itertuples(index=False):
+        lines.append("| " + " | ".join(_cell(value) for value in row) + " |")
+    return "\n".join(lines)
+
+
+def full_markdown_table(df: pd.DataFrame, max_chars: int) -> tuple:
+    """Markdown table of all columns and as many rows of `df` as fit in `max_chars`, as (table, rows)."""
+    lines = ["| " + " | ".join(_cell(column, None) for column in df.columns) + " |",
+             "|" + "---|" * len(df.columns)]
+    size = sum(len(line) + 1 for line in lines)
+    rows = 0
+    for row in df.itertuples(index=False):
+        line = "| " + " | ".join(_cell(value, None) for value in row) + " |"
+        size += len(line) + 1
+        if size > max_chars:
+            break
+        lines.append(line)
+        rows += 1
+    return "\n".join(lines), rows
+
+
+def render_tool_output(content, artifact=None, attached: OrderedDict | None = None,
+                       max_attached: int = 256, full_in_step: bool = False) -> dict:
+    """
+    Compact rendering of a tool result for the Telemetry Response step.
+
+    Small results are shown as they are. Larger tables are shown as a preview
+    of their first rows and columns, and the full table is returned in
+    `frame` to be attached once as a paged element. Other large results are
+    truncated and returned in `text` to be attached as a download. `attached`
+    holds the keys of results already attached in this chat (most recent
+    last); a result that is already attached only gets its preview.
+
+    With `full_in_step`, for data layers that cannot store elements, nothing
+    is attached: the step output holds the full result instead, up to
+    RENDER_STEP_MAX_CHARS characters, so it is still there when the thread
+    is resumed.
+
+    Returns a dict with `output` and `language` for the step and the `key`,
+    `name`, `frame` and `text` of the element to attach (None if there is none).
+    """
+    raw = content if isinstance(content, str) else json.dumps(content, default=str)
+    raw_bytes = artifact.get("bytes_raw", len(raw)) if isinstance(artifact, dict) else len(raw)
+    render_totals["results"] += 1
+    render_totals["bytes_raw"] += raw_bytes
+    key = artifact["result_id"] if isinstance(artifact, dict) and "result_id" in artifact else content_hash(raw)
+    rendered = {"key": key, "output": raw, "language": "json", "name": None, "frame": None, "text": None}
+
+    df, table = result_frame(raw, artifact)
+    if full_in_step:
+        if df is not None and (raw_bytes > RENDER_INLINE_BYTES or len(df) > RENDER_PREVIEW_ROWS):
+            df = df.copy()
+            humanize_frame(df, tz=TIMESTAMP_TZ)
+            text, rows = full_markdown_table(df, RENDER_STEP_MAX_CHARS)
+            shown = f"{len(df)} rows" if rows == len(df) else f"first {rows} of {len(df)} rows"
+            rendered.update(output=f"**{table or 'Result'}** ({shown})\n\n{text}", language=None)
+        elif len(raw) > RENDER_STEP_MAX_CHARS:
+            rendered.update(output=raw[:RENDER_STEP_MAX_CHARS] + f"\n… ({len(raw)} bytes in total)", language=None)
+    elif df is not None and (raw_bytes > RENDER_INLINE_BYTES or len(df) > RENDER_PREVIEW_ROWS):
+        df = df.copy()
+        humanize_frame(df, tz=TIMESTAMP_TZ)
+        shown = f"first {min(len(df), RENDER_PREVIEW_ROWS)} of {len(df)} rows"
+        if len(df.columns) > RENDER_PREVIEW_COLUMNS:
+            shown += f", {RENDER_PREVIEW_COLUMNS} of {len(df.columns)} columns"
+        rendered.update(output=f"**{table or 'Result'}** ({shown})\n\n{markdown_table(df)}", language=None,
+                        name=f"{table or 'result'}-{key}", frame=df)
+    elif df is None and len(raw) > RENDER_INLINE_BYTES:
+        rendered.update(output=raw[:RENDER_INLINE_BYTES] + f"\n… ({len(raw)} bytes in total)", language=None,
+                        name=f"result-{key}.txt", text=raw)
+
+    if rendered["name"] and attached is not None:
+        if key in attached:
+            # The full result is already attached to an earlier step of this chat
+            render_totals["duplicates"] += 1
+            attached.move_to_end(key)
+            rendered.update(name=None, frame=None, text=None)
+            rendered["output"] += "\n\n_Full result attached to an earlier step._"
+        else:
+            attached[key] = True
+            while len(attached) > max_attached:
+                attached.popitem(last=False)
+    if rendered["name"]:
+        render_totals["elements"] += 1
+    render_totals["bytes_step"] += len(rendered["output"])
+    return rendered
@@ -0,0 +1,233 @@
+import re
+import uuid
+from os import getenv
+from langchain_core.messages import AIMessage, HumanMessage
+from instrumentation import current_trace, span
+
+# Words that carry no meaning for the query itself
+FILLER_WORDS = {
+    "show", "list", "display", "get", "give", "find", "me", "us", "all", "the", "a", "an", "any", "please",
+    "which", "what", "are", "is", "there", "currently", "now", "how", "many", "with", "that", "have", "has",
+    "in", "on", "for", "of", "from", "at", "to", "my", "our", "network", "state", "status", "info",
+    "information", "details", "session", "sessions", "peer", "peers", "neighbor", "neighbors", "entries",
+    "entry", "table", "whose", "where", "their", "its", "and", "by", "via", "learned", "through", "using",
+}
+
+# Phrases that need context or time windows the fast path does not handle
+UNSUPPORTED_PATTERN = re.compile(
+    r"\b(ago|since|last|yesterday|today|changes?|changed|history|between|why|trend|compare|flapp\w*|"
+    r"about|those|these|them|it|same|previous|again)\b"
+)
+
+TABLE_WORDS = [
+    ("evpnVni", r"\bevpn(?:\s*vnis?)?\b|\bvnis?\b"),
+    ("mlag", r"\bmlags?\b"),
+    ("lldp", r"\blldp(?:\s+neighbou?rs?)?\b"),
+    ("bgp", r"\bbgp\b"),
+    ("ospf", r"\bospf\b"),
+    ("fs", r"\bfile\s*systems?\b|\bdisk\s+usage\b"),
+    ("mac", r"\bmac(?:\s+address(?:es)?|s)?\b"),
+    ("route", r"\brout(?:es?|ing\s+table)\b"),
+    ("interface", r"\binterfaces?\b|\bports?\b"),
+    ("device", r"\bdevices?\b|\bswitch(?:es)?\b|\brouters?\b|\buptime\b"),
+    # "vlan <number>" is a filter, not the table
+    ("vlan", r"\bvlans?\b(?!\s*(?:=|is|of|>|<|greater|more|less|above|below|over|under)?\s*\d)"),
+]
+
+# Numeric fields that accept comparison operators, by the words used for them
+NUMERIC_FIELDS = [
+    ("prefixlen", r"prefix\s*len(?:gth)?|prefixlen|mask\s+length"),
+    ("numNexthops", r"(?:number\s+of\s+)?next\s*-?hops?|numnexthops"),
+    ("usedPercent", r"used\s*percent(?:age)?|usage|utili[sz]ation"),
+    ("peerAsn", r"peer\s*asn|remote\s+as(?:n)?"),
+    ("asn", r"asn|as\s+number"),
+    ("mtu", r"mtu"),
+    ("vlan", r"vlan"),
+]
+OPERATOR_WORDS = [
+    (">=", r">=|at\s+least|greater\s+than\s+or\s+equal\s+to"),
+    ("<=", r"<=|at\s+most|less\s+than\s+or\s+equal\s+to"),
+    (">", r">|greater\s+than|more\s+than|larger\s+than|higher\s+than|above|over|bigger\s+than"),
+    ("<", r"<|less\s+than|smaller\s+than|lower\s+than|below|under"),
+    ("!=", r"!=|not\s+equal\s+to|other\s+than"),
+    ("", r"=|==|equal\s+to|equals|is|of"),
+]
+
+STATE_WORDS = {
+    "interface": [("adminState", "down", r"admin(?:istratively)?\s*-?\s*down|disabled|shut\s*down"),
+                  ("adminState", "up", r"admin(?:istratively)?\s*-?\s*up|enabled"),
+                  ("state", "down", r"down|failed"),
+                  ("state", "up", r"up|operational")],
+    "bgp": [("state", "NotEstd", r"not\s*-?\s*established|notestd|down|failed|broken"),
+            ("state", "Established", r"established|up")],
+    "ospf": [("adjState", "!full", r"not\s+full|down|failed"),
+             ("adjState", "full", r"full|up")],
+    "device": [("status", "dead", r"dead|down|unreachable"),
+               ("status", "alive", r"alive|up|reachable")],
+}
+
+INTERFACE_TYPES = r"ethernet|loopback|bond|subinterface|vxlan|vrf|bridge|tunnel"
+VENDORS = {"arista": "Arista", "cisco": "Cisco", "juniper": "Juniper", "cumulus": "Cumulus",
+           "nokia": "Nokia", "sonic": "SONiC", "palo": "Palo Alto", "vyos": "VyOS"}
+ROUTE_PROTOCOLS = r"ibgp|ebgp|bgp|ospf|static|connected|direct|kernel|isis"
+
+# Namespaces that may be named without the word "namespace" ("devices in suzieq-demo"); "in <name>"
+# could also be a hostname or anything else, so other names are left to the LLM
+KNOWN_NAMESPACES = sorted({name.strip() for name in getenv("ROUTER_NAMESPACES", "").split(",") if name.strip()},
+                          key=len, reverse=True)
+
+QUOTED = r"['\"]?([\w./:-]+)['\"]?"
+NAMESPACE = r"\bnamespace\s+" + QUOTED + (
+    r"|\bin\s+(" + "|".join(map(re.escape, KNOWN_NAMESPACES)) + r")(?![\w.-])" if KNOWN_NAMESPACES else ""
+)
+VRF = r"\bvrf\s+" + QUOTED
+HOSTNAME = (
+    r"\b(?:host(?:name)?|device|switch|router|node)\s+" + QUOTED
+    + r"|\b(?:on|for|from|at|of)\s+['\"]?([a-z][\w.-]*\d[\w.-]*)['\"]?"
+)
+PREFIX = r"\b(\d{1,3}(?:\.\d{1,3}){3}(?:/\d{1,2})?|[0-9a-f]*:[0-9a-f:]+(?:/\d{1,3})?)(?=\s|$)"
+IFNAME = (
+    r"\b((?:ethernet|eth|swp|ge-|xe-|et-|gigabitethernet|po|port-channel|bond|lo|loopback|vlan|mgmt)"
+    r"[\w/.:-]*\d[\w/.:-]*)\b"
+)
+
+# Fast path results, exported as gauges
+router_stats = {"hits": 0, "misses": 0}
+
+
+class Intent:
+    """A SuzieQ tool call derived from a question."""
+
+    def __init__(self, tool: str, table: str, filters: dict):
+        self.tool = tool
+        self.table = table
+        self.filters = filters
+
+    def args(self) -> dict:
+        return {"table": self.table, "filters": self.filters} if self.filters else {"table": self.table}
+
+    def __repr__(self):
+        return f"Intent({self.tool}, {self.table}, {self.filters})"
+
+
+def route_query(text: str) -> Intent | None:
+    """
+    Map a well-formed question to a SuzieQ call, or None if it is ambiguous.
+
+    Recognizes the table, namespace, hostname, VRF, states, vendors, interface
+    types and names, prefixes, route protocols and numeric comparisons
+    ("mtu greater than 9000" becomes {"mtu": "> 9000"}). Every word of the
+    question must be accounted for, so anything the rules do not understand
+    is left to the LLM.
+    """
+    # Match case-insensitively but keep the original case of values (hostnames, VRFs)
+    rest = " " + text.strip().rstrip("?.!") + " "
+    if UNSUPPORTED_PATTERN.search(rest.lower()):
+        return None
+
+    def take(pattern):
+        nonlocal rest
+        match = re.search(pattern, rest, re.IGNORECASE)
+        if match:
+            rest = rest[:match.start()] + " " + rest[match.end():]
+        return match
+
+    tool = "run_suzieq_summarize" if take(r"\bsummar(?:ize|ise|y)\b|\boverview\b") else "run_suzieq_show"
+    uptime = bool(re.search(r"\buptime\b", rest, re.IGNORECASE))
+    filters = {}
+
+    # Values with an explicit keyword come first, so their words are not read as anything else
+    if match := take(NAMESPACE):
+        filters["namespace"] = match.group(1) or match.group(2)
+    if match := take(VRF):
+        filters["vrf"] = match.group(1)
+    if match := take(PREFIX):
+        filters["prefix"] = match.group(1)
+    for field, words in NUMERIC_FIELDS:
+        for operator, operator_words in OPERATOR_WORDS:
+            match = take(rf"\b(?:{words})\s*(?:{operator_words})?\s*(\d+)\b" if operator == ""
+                         else rf"\b(?:{words})\s*(?:{operator_words})\s*(\d+)\b")
+            if match:
+                filters[field] = f"{operator} {match.group(1)}" if operator else match.group(1)
+                break
+
+    # "learned via bgp" names a route protocol, not the bgp table
+    protocol = take(rf"\b(?:via|learned\s+(?:via|from|by)|protocol)\s+({ROUTE_PROTOCOLS})\b")
+    if protocol:
+        filters["protocol"] = protocol.group(1).lower()
+
+    tables = []
+    for table, pattern in TABLE_WORDS:
+        while take(pattern):
+            if table not in tables:
+                tables.append(table)
+    if len(tables) != 1:
+        return None
+    table = tables[0]
+    # Addresses are prefix filters of the route table only; elsewhere they mean something else (a peer, an IP)
+    if ("vlan" in filters and table == "vlan") or (("protocol" in filters or "prefix" in filters)
+                                                   and table != "route"):
+        return None
+
+    if match := take(HOSTNAME):
+        filters["hostname"] = match.group(1) or match.group(2)
+    if match := take(IFNAME):
+        filters["oifs" if table == "route" else "ifname"] = match.group(1)
+    for field, value, words in STATE_WORDS.get(table, []):
+        if field not in filters and take(rf"\b(?:{words})\b"):
+            filters[field] = value
+    if table == "interface" and (match := take(rf"\b({INTERFACE_TYPES})\b")):
+        filters["type"] = match.group(1).lower()
+    if table == "route" and "protocol" not in filters and (match := take(rf"\b({ROUTE_PROTOCOLS})\b")):
+        filters["protocol"] = match.group(1).lower()
+    if match := take(r"\b(" + "|".join(VENDORS) + r")\b"):
+        filters["vendor"] = VENDORS[match.group(1).lower()]
+    if uptime:
+        filters["columns"] = ["namespace", "hostname", "bootupTimestamp", "status"]
+
+    words = (word.strip("'\"-").lower() for word in re.findall(r"[\w'\"-]+", rest))
+    if any(word and word not in FILLER_WORDS for word in words):
+        return None
+    if tool == "run_suzieq_summarize" and set(filters) - {"namespace", "hostname", "vrf"}:
+        # Summaries only take scoping filters; anything else needs the LLM
+        return None
+    return Intent(tool, table, filters)
+
+
+def make_router(tool_names: set):
+    """
+    Graph node that answers well-formed questions with a direct tool call.
+
+    If the latest message is a question that `route_query` understands and the
+    tool is available, the node adds an AI message with that tool call, so the
+    graph runs the tool without asking the LLM to plan it. Otherwise it adds
+    nothing and the assistant handles the question.
+    """
+
+    async def router(state) -> dict:
+        last = state["messages"][-1] if state.get("messages") else None
+        if not isinstance(last, HumanMessage) or not isinstance(last.content, str):
+            return {}
+        with span("router") as attributes:
+            intent = route_query(last.content)
+            hit = intent is not None and intent.tool in tool_names
+            attributes["hit"] = hit
+        trace = current_trace.get()
+        if not hit:
+            router_stats["misses"] += 1
+            return {}
+        router_stats["hits"] += 1
+        if trace is not None:
+            trace.labels["path"] = "fast_path"
+        call = {"id": f"call_fastpath_{uuid.uuid4().hex[:12]}", "name": intent.tool, "args": intent.args()}
+        return {"messages": [AIMessage(content="", tool_calls=[call])]}
+
+    return router
+
+
+def route_after_router(state) -> str:
+    """Go straight to the tools when the router produced a tool call."""
+    last = state["messages"][-1]
+    if isinstance(last, AIMessage) and last.tool_calls:
+        return "tools"
+    return "assistant"
@@ -0,0 +1,247 @@
+import hashlib
+import json
+from collections import OrderedDict
+from os import getenv
+from typing import List, Optional
+import pandas as pd
+from langchain_core.tools import BaseTool, StructuredTool, tool
+from utils import humanize_frame
+
+# Tools whose JSON table output is shaped (or at least gets readable timestamps) before it reaches the model
+SHAPED_TOOLS = {"run_suzieq_show"}
+
+# Columns sent to the model by default when the query did not ask for specific ones
+DEFAULT_COLUMNS = {
+    "device": ["namespace", "hostname", "model", "vendor", "version", "status", "address", "bootupTimestamp"],
+    "interface": ["namespace", "hostname", "ifname", "state", "adminState", "type", "mtu", "vlan", "ipAddressList", "lastChange"],
+    "bgp": ["namespace", "hostname", "vrf", "peer", "peerHostname", "state", "asn", "peerAsn", "afiSafi", "estdTime"],
+    "ospf": ["namespace", "hostname", "vrf", "ifname", "peerHostname", "area", "state", "adjState", "lastChangeTime"],
+    "route": ["namespace", "hostname", "vrf", "prefix", "nexthopIps", "oifs", "protocol"],
+    "mac": ["namespace", "hostname", "vlan", "macaddr", "oif", "remoteVtepIp", "flags"],
+    "lldp": ["namespace", "hostname", "ifname", "peerHostname", "peerIfname"],
+    "evpnVni": ["namespace", "hostname", "vni", "type", "vlan", "state", "vrf", "remoteVtepList"],
+    "mlag": ["namespace", "hostname", "systemId", "state", "peerAddress", "role", "portsErrDisabled"],
+    "vlan": ["namespace", "hostname", "vlan", "vlanName", "state", "interfaces"],
+    "fs": ["namespace", "hostname", "mountPoint", "usedPercent"],
+}
+
+# Columns summarized as grouped counts when a result is truncated
+GROUP_COLUMNS = {
+    "device": ["status", "vendor", "model"],
+    "interface": ["state", "adminState", "type"],
+    "bgp": ["state", "vrf", "afiSafi"],
+    "ospf": ["adjState", "area"],
+    "route": ["protocol", "vrf"],
+    "mac": ["vlan"],
+    "evpnVni": ["type", "state"],
+    "mlag": ["state"],
+    "vlan": ["state"],
+}
+FALLBACK_GROUP_COLUMNS = ["namespace", "state", "status"]
+
+
+def to_frame(content) -> pd.DataFrame | None:
+    """Parse a SuzieQ JSON table (list of row objects) into a DataFrame."""
+    if not isinstance(content, str):
+        return None
+    try:
+        data = json.loads(content)
+    except ValueError:
+        return None
+    if not isinstance(data, list) or not data or not all(isinstance(row, dict) for row in data):
+        return None
+    return pd.DataFrame.from_records(data)
+
+
+def grouped_counts(df: pd.DataFrame, columns: list, top: int = 10) -> dict:
+    """Value counts for each of `columns` present in `df` (top values only)."""
+    counts = {}
+    for column in columns:
+        if column not in df.columns:
+            continue
+        values = df[column].map(lambda v: ",".join(map(str, v)) if isinstance(v, list) else v)
+        counts[column] = {str(k): int(v) for k, v in values.value_counts(dropna=False).head(top).items()}
+    return counts
+
+
+def frame_rows(df: pd.DataFrame) -> dict:
+    """Columns and row values of `df` in compact (split) form, with readable timestamps."""
+    df = df.copy()
+    converted = humanize_frame(df, tz=TIMESTAMP_TZ)
+    split = json.loads(df.to_json(orient="split", index=False))
+    rows = {"columns": split["columns"], "rows": split["data"]}
+    if converted:
+        rows["timestamps_converted_to"] = TIMESTAMP_TZ
+    return rows
+
+
+class ResultStore:
+    """LRU store of full tool results (as DataFrames) so they can be paged on demand."""
+
+    def __init__(self, max_entries: int = 64, max_bytes: int = 128 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._results = OrderedDict()
+        self._bytes = 0
+
+    def put(self, content: str, df: pd.DataFrame, table: str) -> str:
+        """Store a parsed result and return its id (derived from the raw content)."""
+        result_id = "r-" + hashlib.sha1(content.encode()).hexdigest()[:12]
+        raw_bytes = len(content)
+        if result_id not in self._results:
+            self._results[result_id] = (df, table, raw_bytes)
+            self._bytes += raw_bytes
+        self._results.move_to_end(result_id)
+        while len(self._results) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, _, size) = self._results.popitem(last=False)
+            self._bytes -= size
+        return result_id
+
+    def get(self, result_id: str):
+        entry = self._results.get(result_id)
+        if entry is None:
+            return None
+        self._results.move_to_end(result_id)
+        return entry
+
+
+result_store = ResultStore(
+    max_entries=int(getenv("RESULT_STORE_MAX_ENTRIES", "64")),
+    max_bytes=int(getenv("RESULT_STORE_MAX_BYTES", str(128 * 1024 * 1024))),
+)
+
+SHAPING_MAX_ROWS = int(getenv("SHAPING_MAX_ROWS", "50"))
+# Results smaller than this are passed to the model unchanged
+SHAPING_MIN_BYTES = int(getenv("SHAPING_MIN_BYTES", "4096"))
+# Timezone used for the timestamp columns converted automatically
+TIMESTAMP_TZ = getenv("TIMESTAMP_TZ", "UTC")
+
+shaping_totals = {"results": 0, "shaped": 0, "bytes_raw": 0, "bytes_shaped": 0}
+
+
+def shape_result(content, table: str, filters: dict | None, max_rows: int = SHAPING_MAX_ROWS,
+                 min_bytes: int = SHAPING_MIN_BYTES):
+    """
+    Turn a raw SuzieQ JSON table into a compact view for the model.
+
+    Applies the table's default column projection (unless the query chose its
+    own columns), drops columns that are empty in every row, keeps the first
+    `max_rows` rows and adds grouped counts for the remainder. The full result is
+    kept in `result_store` and can be paged with `get_result_page`. Known
+    timestamp columns are converted to readable datetimes, also in small results
+    that are otherwise passed through.
+
+    Returns the content for the model and an artifact describing the result.
+    """
+    raw_bytes = len(content) if isinstance(content, str) else 0
+    shaping_totals["results"] += 1
+    shaping_totals["bytes_raw"] += raw_bytes
+    df = to_frame(content)
+    if df is None:
+        shaping_totals["bytes_shaped"] += raw_bytes
+        return content, None
+    if raw_bytes < min_bytes:
+        # Small result: keep every row and column, only make timestamps readable
+        if humanize_frame(df, tz=TIMESTAMP_TZ):
+            content = df.to_json(orient="records")
+        shaping_totals["bytes_shaped"] += len(content)
+        return content, None
+
+    result_id = result_store.put(content, df, table)
+    view = df
+    if not (filters or {}).get("columns") and table in DEFAULT_COLUMNS:
+        projected = [column for column in DEFAULT_COLUMNS[table] if column in df.columns]
+        if projected:
+            view = df[projected]
+    empty = [
+        column for column in view.columns
+        if view[column].map(lambda v: v is None or v == "" or v == [] or v != v).all()
+    ]
+    view = view.drop(columns=empty)
+
+    shaped = {"table": table, "result_id": result_id, "total_rows": len(df), **frame_rows(view.head(max_rows))}
+    if len(view.columns) < len(df.columns):
+        shaped["omitted_columns"] = [column for column in df.columns if column not in view.columns]
+    if len(df) > max_rows:
+        shaped["more_rows"] = f"{len(df) - max_rows} more rows not shown"
+        shaped["counts"] = grouped_counts(df, GROUP_COLUMNS.get(table, FALLBACK_GROUP_COLUMNS))
+    if len(df) > max_rows or "omitted_columns" in shaped:
+        shaped["hint"] = "Use get_result_page with this result_id for more rows, other columns or grouped counts."
+
+    shaped_content = json.dumps(shaped, default=str, separators=(",", ":"))
+    shaping_totals["shaped"] += 1
+    shaping_totals["bytes_shaped"] += len(shaped_content)
+    artifact = {"result_id": result_id, "total_rows": len(df), "bytes_raw": raw_bytes,
+                "bytes_shaped": len(shaped_content)}
+    return shaped_content, artifact
+
+
+def humanize_result(content):
+    """A raw SuzieQ JSON table with its known timestamp columns made readable; other content unchanged."""
+    df = to_frame(content)
+    if df is not None and humanize_frame(df, tz=TIMESTAMP_TZ):
+        return df.to_json(orient="records")
+    return content
+
+
+def shaped_tool(tool: BaseTool, shape: bool = True) -> BaseTool:
+    """
+    Wrap an MCP tool so its JSON table output is shaped before the model sees it.
+
+    With `shape` False the output is passed through whole, with only the known
+    timestamp columns converted, as the system prompt tells the model.
+    """
+    if tool.name not in SHAPED_TOOLS or tool.coroutine is None:
+        return tool
+
+    async def call_tool(**arguments):
+        content, _ = await tool.coroutine(**arguments)
+        if not shape:
+            return humanize_result(content), None
+        return shape_result(content, arguments.get("table", ""), arguments.get("filters"))
+
+    return StructuredTool(
+        name=tool.name,
+        description=tool.description,
+        args_schema=tool.args_schema,
+        coroutine=call_tool,
+        response_format="content_and_artifact",
+        metadata=tool.metadata,
+    )
+
+
+@tool
+def get_result_page(result_id: str, offset: int = 0, limit: int = 50,
+                    columns: Optional[List[str]] = None, group_by: Optional[List[str]] = None) -> str:
+    """Returns more of a SuzieQ result that was shortened, without querying SuzieQ again.
+
+    Args:
+        result_id: The result_id from a shortened run_suzieq_show result.
+        offset: Index of the first row to return. Defaults to 0.
+        limit: Maximum number of rows to return (at most 200). Defaults to 50.
+        columns: Optional list of columns to return instead of the default ones.
+        group_by: Optional list of columns; if given, returns row counts grouped by
+            these columns instead of rows.
+
+    Returns:
+        A JSON string with the requested rows or grouped counts, or an error message.
+    """
+    entry = result_store.get(result_id)
+    if entry is None:
+        return f"Error: result {result_id} is no longer available. Run the query again."
+    df, table, _ = entry
+    unknown = [column for column in (columns or []) + (group_by or []) if column not in df.columns]
+    if unknown:
+        return f"Error: unknown columns {unknown}. Available columns: {list(df.columns)}"
+    if group_by:
+        counts = df.astype({column: str for column in group_by}).groupby(group_by).size()
+        counts = counts.sort_values(ascending=False).reset_index(name="count")
+        return json.dumps({"table": table, "result_id": result_id, "total_rows": len(df),
+                           **frame_rows(counts.head(200))}, separators=(",", ":"))
+    view = df[columns] if columns else df[[c for c in DEFAULT_COLUMNS.get(table, df.columns) if c in df.columns] or df.columns]
+    limit = max(1, min(limit, 200))
+    page = view.iloc[offset:offset + limit]
+    shaped = {"table": table, "result_id": result_id, "total_rows": len(df), "offset": offset, **frame_rows(page)}
+    if offset + limit < len(df):
+        shaped["next_offset"] = offset + limit
+    return json.dumps(shaped, default=str, separators=(",", ":"))
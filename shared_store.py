@@ -0,0 +1,186 @@
+import asyncio
+import time
+from os import getenv, makedirs, path
+from instrumentation import logger
+
+# Drop expired entries every this many writes
+PURGE_EVERY = 500
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS shared_cache (
+    ns TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (ns, key)
+)
+"""
+
+POSTGRES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS shared_cache (
+    ns TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires_at DOUBLE PRECISION NOT NULL,
+    PRIMARY KEY (ns, key)
+)
+"""
+
+
+class SharedStore:
+    """
+    Key-value store with expiry that all workers of a deployment share.
+
+    Backed by a SQLite file (workers on one host) or Postgres (any number of
+    hosts). Like DurableCheckpointer, the connection is opened lazily on the
+    running event loop. Values are strings; callers serialize them. Errors are
+    logged and counted, never raised: the shared store is a second-level
+    cache, so a failed read is a miss and a failed write is skipped.
+    """
+
+    def __init__(self, backend: str, *, url: str | None = None, sqlite_path: str = ".cache/shared_cache.sqlite",
+                 pool_size: int = 5):
+        self.backend = backend
+        self.url = url
+        self.sqlite_path = sqlite_path
+        self.pool_size = pool_size
+        self._resource = None  # Connection pool or SQLite connection
+        self._loop = None
+        self._open_task = None
+        self._writes = 0
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.errors = 0
+
+    async def _ensure(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._open_task = asyncio.ensure_future(self._open())
+        try:
+            return await asyncio.shield(self._open_task)
+        except Exception:
+            self._loop = None
+            raise
+
+    async def _open(self):
+        if self.backend == "postgres":
+            from psycopg_pool import AsyncConnectionPool
+
+            pool = AsyncConnectionPool(conninfo=self.url, max_size=self.pool_size, open=False,
+                                       kwargs={"autocommit": True, "prepare_threshold": 0})
+            await pool.open()
+            async with pool.connection() as conn:
+                await conn.execute(POSTGRES_SCHEMA)
+            self._resource = pool
+        else:
+            import aiosqlite
+
+            if path.dirname(self.sqlite_path):
+                makedirs(path.dirname(self.sqlite_path), exist_ok=True)
+            # WAL lets readers in other worker processes run while one writes
+            conn = await aiosqlite.connect(self.sqlite_path, timeout=10)
+            await conn.execute("PRAGMA journal_mode=WAL")
+            await conn.execute("PRAGMA synchronous=NORMAL")
+            await conn.execute(SQLITE_SCHEMA)
+            await conn.commit()
+            self._resource = conn
+        logger.info("Using %s shared store", self.backend)
+        return self._resource
+
+    async def get(self, ns: str, key: str) -> str | None:
+        """Value stored under (ns, key) that has not expired, or None."""
+        try:
+            resource = await self._ensure()
+            if self.backend == "postgres":
+                async with resource.connection() as conn:
+                    cursor = await conn.execute(
+                        "SELECT value FROM shared_cache WHERE ns = %s AND key = %s AND expires_at > %s",
+                        (ns, key, time.time()),
+                    )
+                    row = await cursor.fetchone()
+            else:
+                async with resource.execute(
+                    "SELECT value FROM shared_cache WHERE ns = ? AND key = ? AND expires_at > ?",
+                    (ns, key, time.time()),
+                ) as cursor:
+                    row = await cursor.fetchone()
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Shared store read failed: %s", e)
+            return None
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    async def put(self, ns: str, key: str, value: str, ttl: float):
+        """Store `value` under (ns, key) for `ttl` seconds."""
+        expires_at = time.time() + ttl
+        self._writes += 1
+        purge = self._writes % PURGE_EVERY == 0
+        try:
+            resource = await self._ensure()
+            if self.backend == "postgres":
+                async with resource.connection() as conn:
+                    await conn.execute(
+                        "INSERT INTO shared_cache (ns, key, value, expires_at) VALUES (%s, %s, %s, %s) "
+                        "ON CONFLICT (ns, key) DO UPDATE SET value = EXCLUDED.value, "
+                        "expires_at = EXCLUDED.expires_at",
+                        (ns, key, value, expires_at),
+                    )
+                    if purge:
+                        await conn.execute("DELETE FROM shared_cache WHERE expires_at <= %s", (time.time(),))
+            else:
+                await resource.execute(
+                    "INSERT OR REPLACE INTO shared_cache (ns, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                    (ns, key, value, expires_at),
+                )
+                if purge:
+                    await resource.execute("DELETE FROM shared_cache WHERE expires_at <= ?", (time.time(),))
+                await resource.commit()
+            self.writes += 1
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Shared store write failed: %s", e)
+
+    async def aclose(self):
+        """Release the connection pool or SQLite connection."""
+        if self._resource is None or self._loop is not asyncio.get_running_loop():
+            return
+        await self._resource.close()
+        self._resource = None
+        self._loop = None
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "writes": self.writes, "errors": self.errors}
+
+
+def worker_count() -> int:
+    """Number of workers of this deployment (set by workers.py)."""
+    return int(getenv("CYBERTRACE_WORKERS", "1"))
+
+
+def create_shared_store() -> SharedStore | None:
+    """
+    Build the shared store selected by SHARED_CACHE ("postgres", "sqlite" or "none").
+
+    Defaults to "none" for a single worker. With several workers it defaults to
+    Postgres when a database URL is configured and to a SQLite file otherwise.
+    """
+    url = getenv("SHARED_CACHE_DATABASE_URL") or getenv("CHECKPOINT_DATABASE_URL") or getenv("DATABASE_URL")
+    default = "none" if worker_count() <= 1 else ("postgres" if url else "sqlite")
+    backend = getenv("SHARED_CACHE", default).lower()
+    if backend == "none":
+        return None
+    if backend == "postgres" and not url:
+        raise ValueError("SHARED_CACHE=postgres requires DATABASE_URL or SHARED_CACHE_DATABASE_URL")
+    return SharedStore(
+        backend,
+        url=url,
+        sqlite_path=getenv("SHARED_CACHE_SQLITE_PATH", ".cache/shared_cache.sqlite"),
+        pool_size=int(getenv("SHARED_CACHE_POOL_SIZE", "5")),
+    )
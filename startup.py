@@ -0,0 +1,18 @@
+import time
+from contextlib import contextmanager
+from instrumentation import logger
+
+# Duration of each startup phase of this worker, in seconds
+startup_timings = {}
+
+
+@contextmanager
+def startup_phase(name: str):
+    """Time a startup phase, record it in `startup_timings` and log it."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        startup_timings[name] = round(elapsed, 4)
+        logger.info("Startup phase %s: %.0f ms", name, elapsed * 1000)
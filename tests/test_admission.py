@@ -0,0 +1,87 @@
+import asyncio
+import pytest
+from admission import AdmissionController, AdmissionRejected
+
+
+async def hold(admission: AdmissionController, user: str, release: asyncio.Event, started: list):
+    async with admission.admit(user):
+        started.append(user)
+        await release.wait()
+
+
+def test_full_queue_is_shed():
+    async def run():
+        admission = AdmissionController(max_running=1, max_per_user=1, max_queue=0)
+        release, started = asyncio.Event(), []
+        task = asyncio.create_task(hold(admission, "alice", release, started))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with admission.admit("bob"):
+                pass
+        release.set()
+        await task
+        return rejected.value.reason, admission.stats()
+
+    reason, stats = asyncio.run(run())
+    assert reason == "queue_full"
+    assert stats["shed"] == 1 and stats["running"] == 0
+
+
+def test_user_limit_is_shed():
+    async def run():
+        admission = AdmissionController(max_running=1, max_per_user=1, max_queue=8)
+        release, started = asyncio.Event(), []
+        running = asyncio.create_task(hold(admission, "alice", release, started))
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(hold(admission, "alice", release, started))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with admission.admit("alice"):
+                pass
+        release.set()
+        await asyncio.gather(running, queued)
+        return rejected.value.reason, started
+
+    reason, started = asyncio.run(run())
+    assert reason == "user_limit"
+    assert started == ["alice", "alice"]
+
+
+def test_queue_timeout_is_shed():
+    async def run():
+        admission = AdmissionController(max_running=1, max_per_user=1, max_queue=8, queue_timeout=0.05)
+        release, started = asyncio.Event(), []
+        task = asyncio.create_task(hold(admission, "alice", release, started))
+        await asyncio.sleep(0)
+        positions = []
+
+        async def on_queued(position):
+            positions.append(position)
+
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with admission.admit("bob", on_queued):
+                pass
+        release.set()
+        await task
+        return rejected.value.reason, positions, admission.stats()
+
+    reason, positions, stats = asyncio.run(run())
+    assert reason == "queue_timeout"
+    assert positions == [1]
+    assert stats["queue_depth"] == 0
+
+
+def test_busy_user_does_not_hold_up_others():
+    async def run():
+        admission = AdmissionController(max_running=2, max_per_user=1, max_queue=8)
+        release, started = asyncio.Event(), []
+        tasks = [asyncio.create_task(hold(admission, user, release, started)) for user in ("alice", "alice", "bob")]
+        await asyncio.sleep(0.01)
+        waiting = list(started)
+        release.set()
+        await asyncio.gather(*tasks)
+        return waiting, started
+
+    waiting, started = asyncio.run(run())
+    assert waiting == ["alice", "bob"]
+    assert started == ["alice", "bob", "alice"]
@@ -0,0 +1,56 @@
+import asyncio
+import json
+from answer_cache import AnswerCache, normalize_question, unstated_filters
+from tool_cache import ToolResultCache, poll_scope
+
+
+def show(table: str, **filters) -> dict:
+    return {"name": "run_suzieq_show", "args": {"table": table, "filters": filters}}
+
+
+def poll(cache: ToolResultCache, table: str, hostname: str, timestamp: int):
+    arguments = {"table": table, "filters": {"hostname": hostname}}
+    cache.record_poll(poll_scope(table, arguments), json.dumps([{"hostname": hostname, "timestamp": timestamp}]))
+
+
+def test_answer_is_served_for_the_same_question():
+    answers = AnswerCache(ToolResultCache())
+    assert asyncio.run(answers.store("Show interfaces on leaf01", "All up.", [show("interface", hostname="leaf01")]))
+    hit = asyncio.run(answers.lookup("show the interfaces on leaf01?"))
+    assert hit is not None and hit["answer"] == "All up."
+
+
+def test_filters_from_earlier_turns_are_not_cached():
+    # "show interfaces" scoped to leaf01 by an earlier turn must not answer the bare question later
+    answers = AnswerCache(ToolResultCache())
+    assert not asyncio.run(answers.store("show interfaces", "All up.", [show("interface", hostname="leaf01")]))
+    assert asyncio.run(answers.lookup("show interfaces")) is None
+    assert answers.stats()["skipped"] == 1
+
+
+def test_follow_up_questions_are_not_cached():
+    answers = AnswerCache(ToolResultCache())
+    assert not asyncio.run(answers.store("and on leaf01?", "All up.", [show("interface", hostname="leaf01")]))
+
+
+def test_newer_poll_of_the_same_scope_makes_answer_stale():
+    tool_cache = ToolResultCache()
+    answers = AnswerCache(tool_cache)
+    poll(tool_cache, "interface", "leaf01", 1000)
+    asyncio.run(answers.store("show interfaces on leaf01", "All up.", [show("interface", hostname="leaf01")]))
+    poll(tool_cache, "interface", "spine01", 2000)
+    assert asyncio.run(answers.lookup("show interfaces on leaf01")) is not None
+    poll(tool_cache, "interface", "leaf01", 2000)
+    assert asyncio.run(answers.lookup("show interfaces on leaf01")) is None
+    assert answers.stats()["stale"] == 1
+
+
+def test_unstated_filters():
+    assert unstated_filters("show bgp on leaf01", {"table": "bgp", "filters": {"hostname": "leaf01"}}) == []
+    assert unstated_filters("show bgp", {"table": "bgp", "filters": {"hostname": "leaf01"}}) == ["hostname"]
+    # Only filters that pick devices or entities count
+    assert unstated_filters("show bgp", {"table": "bgp", "filters": {"state": "Established"}}) == []
+
+
+def test_normalize_question():
+    assert normalize_question("Can you show me the BGP sessions?") == normalize_question("bgp session")
@@ -0,0 +1,32 @@
+import pytest
+from router import route_query
+
+
+@pytest.mark.parametrize("question, tool, table, filters", [
+    ("show devices", "run_suzieq_show", "device", {}),
+    ("show bgp sessions on leaf01", "run_suzieq_show", "bgp", {"hostname": "leaf01"}),
+    ("show down interfaces on spine01", "run_suzieq_show", "interface", {"hostname": "spine01", "state": "down"}),
+    ("show interfaces with mtu greater than 9000", "run_suzieq_show", "interface", {"mtu": "> 9000"}),
+    ("show routes for 10.0.0.1/32", "run_suzieq_show", "route", {"prefix": "10.0.0.1/32"}),
+    ("summarize bgp in namespace eos", "run_suzieq_summarize", "bgp", {"namespace": "eos"}),
+])
+def test_well_formed_questions_are_routed(question, tool, table, filters):
+    intent = route_query(question)
+    assert intent is not None
+    assert (intent.tool, intent.table, intent.filters) == (tool, table, filters)
+
+
+@pytest.mark.parametrize("question", [
+    "show bgp changes in the last hour",  # Time window
+    "why is bgp down on leaf01",  # Needs analysis
+    "show interfaces and bgp",  # More than one table
+    "what about those?",  # Refers to an earlier turn
+    "show interfaces that flap a lot",  # Words the rules do not understand
+])
+def test_other_questions_go_to_the_llm(question):
+    assert route_query(question) is None
+
+
+def test_intent_args_omit_empty_filters():
+    assert route_query("show devices").args() == {"table": "device"}
+    assert route_query("show bgp on leaf01").args() == {"table": "bgp", "filters": {"hostname": "leaf01"}}
@@ -0,0 +1,67 @@
+import asyncio
+import json
+from tool_cache import ToolResultCache, poll_scope
+
+
+def result(hostname: str, timestamp: int) -> str:
+    return json.dumps([{"hostname": hostname, "ifname": "eth1", "state": "up", "timestamp": timestamp}])
+
+
+def call(cache: ToolResultCache, hostname: str, timestamp: int, fetched: list) -> str:
+    arguments = {"table": "interface", "filters": {"hostname": hostname}}
+
+    async def fetch():
+        fetched.append(hostname)
+        return result(hostname, timestamp)
+
+    key = cache.make_key("run_suzieq_show", arguments)
+    return asyncio.run(cache.get_or_fetch(key, "interface", fetch, poll_scope("interface", arguments)))
+
+
+def test_repeated_call_is_served_from_cache():
+    cache, fetched = ToolResultCache(), []
+    first = call(cache, "leaf01", 1000, fetched)
+    assert call(cache, "leaf01", 1000, fetched) == first
+    assert fetched == ["leaf01"]
+    assert cache.stats()["hits"] == 1
+
+
+def test_newer_poll_of_another_device_keeps_entry():
+    # spine01 is cached from an older poll than leaf01's: a different scope, so it stays valid
+    cache, fetched = ToolResultCache(), []
+    call(cache, "spine01", 1000, fetched)
+    call(cache, "leaf01", 2000, fetched)
+    call(cache, "spine01", 1000, fetched)
+    call(cache, "leaf01", 2000, fetched)
+    assert fetched == ["spine01", "leaf01"]
+    assert cache.stats()["invalidations"] == 0
+
+
+def test_newer_poll_of_same_scope_invalidates():
+    cache, fetched = ToolResultCache(), []
+    call(cache, "spine01", 1000, fetched)
+    scope = poll_scope("interface", {"filters": {"hostname": "spine01"}})
+    cache.record_poll(scope, result("spine01", 2000))
+    assert cache.latest_poll(scope) == 2000
+    call(cache, "spine01", 2000, fetched)
+    assert fetched == ["spine01", "spine01"]
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_expired_entry_is_fetched_again():
+    cache, fetched = ToolResultCache(default_ttl=0, table_ttls={"interface": 0}), []
+    call(cache, "leaf01", 1000, fetched)
+    call(cache, "leaf01", 1000, fetched)
+    assert fetched == ["leaf01", "leaf01"]
+
+
+def test_time_windows_are_not_cached():
+    arguments = {"table": "interface", "filters": {"hostname": "leaf01", "start_time": "1 hour ago"}}
+    assert ToolResultCache.make_key("run_suzieq_show", arguments) is None
+
+
+def test_poll_scope_includes_namespace_and_hostname():
+    assert poll_scope("bgp") != poll_scope("bgp", {"filters": {"namespace": "eos"}})
+    assert poll_scope("bgp", {"filters": {"hostname": "leaf01"}}) != poll_scope("bgp", {"filters": {"hostname": "spine01"}})
+    # Other filters do not change which poll the rows come from
+    assert poll_scope("bgp", {"filters": {"state": "Established"}}) == poll_scope("bgp")
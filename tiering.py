@@ -0,0 +1,128 @@
+import re
+from os import getenv
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from router import TABLE_WORDS
+
+# Send simple turns to a small, fast model and keep the large model for analysis
+TIERING_ENABLED = getenv("TIERING_ENABLED", "true").lower() == "true"
+SMALL_MODEL = getenv("SMALL_MODEL", "anthropic/claude-3.5-haiku")
+LARGE_MODEL = getenv("LARGE_MODEL", "anthropic/claude-3.7-sonnet")
+TIERS = ("small", "large")
+
+
+def parse_turn_tiers(value: str) -> dict:
+    """Parse a "turn_type=tier,turn_type=tier" string into a mapping."""
+    tiers = {}
+    for item in (value or "").split(","):
+        if "=" in item:
+            turn_type, tier = item.split("=", 1)
+            if tier.strip() not in TIERS:
+                raise ValueError(f"Unknown model tier {tier.strip()!r} for {turn_type.strip()!r}")
+            tiers[turn_type.strip()] = tier.strip()
+    return tiers
+
+
+# Model tier by turn type:
+# - plan: a new question, the model picks the tool calls
+# - answer: tool results are in, the model summarizes them (or asks for more)
+# - analysis: questions that need reasoning over several tables, large results or many rounds
+TIER_TURN_TYPES = {"plan": "small", "answer": "small", "analysis": "large",
+                   **parse_turn_tiers(getenv("TIER_TURN_TYPES", ""))}
+# Tool results of the current question larger than this (what the model reads) make it an analysis turn
+TIER_SMALL_MAX_RESULT_BYTES = int(getenv("TIER_SMALL_MAX_RESULT_BYTES", "12000"))
+# Tables named in the question or queried for it from which a turn is an analysis turn
+TIER_ANALYSIS_TABLES = int(getenv("TIER_ANALYSIS_TABLES", "2"))
+# Tool rounds of one question after which the large model takes over
+TIER_ESCALATE_AFTER_ROUNDS = int(getenv("TIER_ESCALATE_AFTER_ROUNDS", "2"))
+# Check small-model replies and ask the large model again when they look unsure or broken
+TIER_ESCALATE_ON_LOW_CONFIDENCE = getenv("TIER_ESCALATE_ON_LOW_CONFIDENCE", "true").lower() == "true"
+# Characters of a checked small-model reply the UI holds back before streaming it, so replies that
+# open with a hedge are replaced before they show
+TIER_STREAM_HOLD_CHARS = int(getenv("TIER_STREAM_HOLD_CHARS", "200"))
+
+# Questions asking for reasoning rather than a lookup
+ANALYSIS_PATTERN = re.compile(
+    r"\b(why|compare[ds]?|comparison|correlat\w*|root\s*-?\s*cause|troubleshoot\w*|diagnos\w*|explain\w*|"
+    r"impact\w*|investigat\w*|analy[sz]\w*|caus(?:e|es|ed|ing)|relat(?:e|ed|ion\w*)|across|affect\w*|"
+    r"recommend\w*|should\s+i)\b",
+    re.IGNORECASE,
+)
+# Replies in which the model says it could not do the job
+HEDGING_PATTERN = re.compile(
+    r"\b(i'?m\s+not\s+(?:sure|certain)|i\s+(?:cannot|can'?t|am\s+unable\s+to|was\s+unable\s+to|could\s+not|"
+    r"couldn'?t)\s+(?:determine|tell|find|answer|interpret|identify)|(?:it\s+is\s+|it'?s\s+)?unclear\s+from\s+"
+    r"the\s+(?:data|results?|output)|not\s+enough\s+(?:information|data|context))\b",
+    re.IGNORECASE,
+)
+
+
+def message_text(content) -> str:
+    """The text of a message: a plain string or the text of its content blocks."""
+    if isinstance(content, str):
+        return content
+    return " ".join(block.get("text", "") for block in content if isinstance(block, dict))
+
+
+def current_turn(messages: list) -> tuple:
+    """The latest user question and the messages after it, as (question, messages)."""
+    for index in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[index], HumanMessage):
+            return message_text(messages[index].content), messages[index + 1:]
+    return "", messages
+
+
+def named_tables(text: str) -> set:
+    """SuzieQ tables named in a question."""
+    return {table for table, pattern in TABLE_WORDS if re.search(pattern, text, re.IGNORECASE)}
+
+
+def classify_turn(messages: list) -> tuple:
+    """
+    Turn type of the next LLM call, as (turn type, reason).
+
+    `messages` is the conversation without the system prompt. The turn is an
+    analysis turn if the question asks for reasoning, involves several
+    tables, has gone through several tool rounds or returned large or failed
+    results. Otherwise it is a plan turn (a new question) or an answer turn
+    (tool results are in).
+    """
+    question, turn = current_turn(messages)
+    if ANALYSIS_PATTERN.search(question):
+        return "analysis", "analysis_question"
+    calls = [call for msg in turn if isinstance(msg, AIMessage) for call in msg.tool_calls]
+    tables = named_tables(question) | {call["args"]["table"] for call in calls
+                                       if isinstance(call.get("args", {}).get("table"), str)}
+    if len(tables) >= TIER_ANALYSIS_TABLES:
+        return "analysis", "multi_table"
+    if sum(1 for msg in turn if isinstance(msg, AIMessage) and msg.tool_calls) >= TIER_ESCALATE_AFTER_ROUNDS:
+        return "analysis", "tool_rounds"
+    results = [msg for msg in turn if isinstance(msg, ToolMessage)]
+    if not results or not isinstance(messages[-1], ToolMessage):
+        return "plan", "question"
+    if any(msg.status == "error" for msg in results):
+        return "analysis", "tool_error"
+    if sum(len(message_text(msg.content)) for msg in results) > TIER_SMALL_MAX_RESULT_BYTES:
+        return "analysis", "large_result"
+    return "answer", "small_result"
+
+
+def choose_tier(messages: list) -> tuple:
+    """Model tier for the next LLM call, as (tier, reason)."""
+    if not TIERING_ENABLED:
+        return "large", "disabled"
+    turn_type, reason = classify_turn(messages)
+    return TIER_TURN_TYPES.get(turn_type, "large"), reason
+
+
+def low_confidence(response: AIMessage) -> str | None:
+    """Why a reply should be asked of the large model instead, or None if it looks fine."""
+    if response.invalid_tool_calls:
+        return "invalid_tool_call"
+    if (response.response_metadata or {}).get("finish_reason") == "length":
+        return "truncated"
+    text = message_text(response.content).strip()
+    if not response.tool_calls and not text:
+        return "empty_reply"
+    if HEDGING_PATTERN.search(text):
+        return "hedging"
+    return None
@@ -0,0 +1,295 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from langchain_core.tools import BaseTool, StructuredTool
+
+# Tools whose results depend only on their arguments and the current SuzieQ data
+CACHEABLE_TOOLS = {"run_suzieq_show", "run_suzieq_summarize"}
+
+# Filters that select a time window; these results are never cached
+TIME_WINDOW_FILTERS = {"start_time", "end_time", "view"}
+
+# Per-table TTLs in seconds. Tables that change rarely can be cached longer.
+DEFAULT_TABLE_TTLS = {
+    "device": 300,
+    "fs": 300,
+    "lldp": 300,
+    "vlan": 120,
+    "route": 120,
+    "interface": 60,
+    "bgp": 60,
+    "ospf": 60,
+    "evpnVni": 60,
+    "mlag": 60,
+    "mac": 30,
+}
+
+
+def parse_table_ttls(value: str) -> dict:
+    """Parse a "table=seconds,table=seconds" string into a TTL mapping."""
+    ttls = {}
+    for item in (value or "").split(","):
+        if "=" in item:
+            table, seconds = item.split("=", 1)
+            ttls[table.strip()] = float(seconds)
+    return ttls
+
+
+def latest_poll_timestamp(content) -> int | None:
+    """Return the newest SuzieQ 'timestamp' value found in a JSON tool result."""
+    if not isinstance(content, str):
+        return None
+    try:
+        data = json.loads(content)
+    except ValueError:
+        return None
+    if isinstance(data, dict):
+        data = [data]
+    if not isinstance(data, list):
+        return None
+    stamps = [
+        row["timestamp"] for row in data
+        if isinstance(row, dict) and isinstance(row.get("timestamp"), (int, float))
+    ]
+    return max(stamps) if stamps else None
+
+
+def poll_scope(table: str, arguments: dict | None = None) -> str:
+    """
+    The part of SuzieQ a query reads: its table, namespace and hostname.
+
+    Poll timestamps are compared within a scope only. A newer poll of
+    spine01 says nothing about whether a cached leaf01 result is stale.
+    """
+    arguments = arguments or {}
+    filters = arguments.get("filters")
+    filters = filters if isinstance(filters, dict) else {}
+    scope = [table] + [filters.get(name, arguments.get(name)) or "" for name in ("namespace", "hostname")]
+    return json.dumps(scope, sort_keys=True, default=str)
+
+
+class _Entry:
+    __slots__ = ("value", "table", "scope", "size", "expires_at", "poll_ts")
+
+    def __init__(self, value, table, scope, size, expires_at, poll_ts):
+        self.value = value
+        self.table = table
+        self.scope = scope
+        self.size = size
+        self.expires_at = expires_at
+        self.poll_ts = poll_ts
+
+
+class ToolResultCache:
+    """
+    LRU cache for SuzieQ tool results, bounded by entry count and total size.
+
+    Entries expire after a per-table TTL. When a fresh result reveals a newer
+    poll timestamp for a scope (table, namespace and hostname, see
+    `poll_scope`), cached results of that scope taken from an older poll are
+    dropped. With a `shared` store (see shared_store.py),
+    local misses are looked up there before SuzieQ is queried, and fetched
+    results are written there, so workers reuse each other's results.
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 64 * 1024 * 1024,
+                 default_ttl: float = 60.0, table_ttls: dict | None = None, shared=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.table_ttls = {**DEFAULT_TABLE_TTLS, **(table_ttls or {})}
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._latest_poll = {}  # Scope -> newest poll timestamp
+        self._inflight = {}
+        self.shared = shared
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+        self.bypassed = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(tool_name: str, arguments: dict) -> str | None:
+        """Canonical key for a tool call, or None if the call must not be cached."""
+        filters = arguments.get("filters") or {}
+        if not isinstance(filters, dict):
+            return None
+        if TIME_WINDOW_FILTERS & (set(filters) | set(arguments)):
+            return None
+        normalized = {
+            key: value.strip() if isinstance(value, str) else value
+            for key, value in arguments.items() if key != "filters"
+        }
+        normalized["filters"] = {
+            key: value.strip() if isinstance(value, str) else value
+            for key, value in filters.items()
+        }
+        return tool_name + ":" + json.dumps(normalized, sort_keys=True, separators=(",", ":"), default=str)
+
+    def ttl_for(self, table: str) -> float:
+        return self.table_ttls.get(table, self.default_ttl)
+
+    def latest_poll(self, scope: str) -> int | None:
+        """Newest poll timestamp seen in any result for `scope` (see `poll_scope`), if any."""
+        return self._latest_poll.get(scope)
+
+    def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            return None
+        if entry.poll_ts is not None and entry.poll_ts < self._latest_poll.get(entry.scope, 0):
+            self._remove(key)
+            self.invalidations += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry.value
+
+    def record_poll(self, scope: str, value) -> int | None:
+        """Note the poll timestamp of a result for `scope`, dropping cached results of the scope from older polls."""
+        content = value[0] if isinstance(value, tuple) else value
+        poll_ts = latest_poll_timestamp(content)
+        if poll_ts is not None and poll_ts > self._latest_poll.get(scope, 0):
+            self._latest_poll[scope] = poll_ts
+            stale = [key for key, entry in self._entries.items()
+                     if entry.scope == scope and (entry.poll_ts is None or entry.poll_ts < poll_ts)]
+            for key in stale:
+                self._remove(key)
+            self.invalidations += len(stale)
+        return poll_ts
+
+    def put(self, key: str, table: str, value, scope: str | None = None):
+        scope = scope or poll_scope(table)
+        content = value[0] if isinstance(value, tuple) else value
+        poll_ts = self.record_poll(scope, content)
+        size = len(content) if isinstance(content, str) else len(str(content))
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = _Entry(value, table, scope, size, time.monotonic() + self.ttl_for(table), poll_ts)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate(self, table: str | None = None, older_than: int | None = None) -> int:
+        """Drop cached results for a table (or all tables). Returns the number dropped."""
+        stale = [
+            key for key, entry in self._entries.items()
+            if (table is None or entry.table == table)
+            and (older_than is None or entry.poll_ts is None or entry.poll_ts < older_than)
+        ]
+        for key in stale:
+            self._remove(key)
+        self.invalidations += len(stale)
+        return len(stale)
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    async def get_or_fetch(self, key: str, table: str, fetch, scope: str | None = None):
+        """Return a cached result or call `fetch()` once, even for concurrent callers."""
+        scope = scope or poll_scope(table)
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.hits += 1
+            return await asyncio.shield(pending)
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await self._load(key, table, scope, fetch)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved when nobody else is waiting
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        future.set_result(value)
+        self.put(key, table, value, scope)
+        return value
+
+    async def _load(self, key: str, table: str, scope: str, fetch):
+        """Result from the shared store, or from `fetch()` (then written to the shared store)."""
+        if self.shared is None:
+            return await fetch()
+        stored = await self.shared.get("tool_result", key)
+        if stored is not None:
+            content, is_tuple = json.loads(stored)
+            poll_ts = latest_poll_timestamp(content)
+            # Taken from an older poll than this worker has already seen: stale
+            if poll_ts is None or poll_ts >= self._latest_poll.get(scope, 0):
+                self.shared_hits += 1
+                return (content, None) if is_tuple else content
+        value = await fetch()
+        content, artifact = value if isinstance(value, tuple) else (value, None)
+        # Non-text MCP content (artifacts) is not shared
+        if not artifact:
+            await self.shared.put("tool_result", key, json.dumps([content, isinstance(value, tuple)]),
+                                  self.ttl_for(table))
+        return value
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared_hits": self.shared_hits,
+            "bypassed": self.bypassed,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+def cached_tool(tool: BaseTool, cache: ToolResultCache, enabled: bool = True) -> BaseTool:
+    """
+    Wrap an MCP tool so identical show/summarize calls are served from `cache`.
+
+    Results that are not cached (with `enabled` False, or calls the cache
+    bypasses) still update the poll timestamps of `cache`, which the answer
+    cache relies on.
+    """
+    if tool.name not in CACHEABLE_TOOLS or tool.coroutine is None:
+        return tool
+
+    async def call_tool(**arguments):
+        key = cache.make_key(tool.name, arguments) if enabled else None
+        if key is None:
+            if enabled:
+                cache.bypassed += 1
+            value = await tool.coroutine(**arguments)
+            cache.record_poll(poll_scope(arguments.get("table", ""), arguments), value)
+            return value
+        return await cache.get_or_fetch(
+            key, arguments.get("table", ""), lambda: tool.coroutine(**arguments),
+            poll_scope(arguments.get("table", ""), arguments),
+        )
+
+    return StructuredTool(
+        name=tool.name,
+        description=tool.description,
+        args_schema=tool.args_schema,
+        coroutine=call_tool,
+        response_format=tool.response_format,
+        metadata=tool.metadata,
+    )
@@ -0,0 +1,50 @@
+import asyncio
+from langchain_core.messages import ToolMessage
+from langgraph.prebuilt import ToolNode
+from instrumentation import record_tool_payload, span
+
+
+class ParallelToolNode(ToolNode):
+    """
+    ToolNode that runs all tool calls of an assistant turn concurrently, with a
+    per-process concurrency bound and a timeout for each call.
+
+    A call that fails or times out becomes an error ToolMessage, so the other
+    results of the turn still reach the model.
+    """
+
+    def __init__(self, tools, *, max_concurrency: int = 8, timeout: float = 60.0, **kwargs):
+        super().__init__(tools, **kwargs)
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _afunc(self, input, config, *, store):
+        with span("tools"):
+            return await super()._afunc(input, config, store=store)
+
+    async def _arun_one(self, call, input_type, config) -> ToolMessage:
+        async with self._semaphore:
+            with span("tool", tool=call["name"]) as attributes:
+                try:
+                    output = await asyncio.wait_for(
+                        super()._arun_one(call, input_type, config), self.timeout
+                    )
+                except asyncio.TimeoutError:
+                    attributes["status"] = "timeout"
+                    return self._timeout_message(call)
+                if isinstance(output, ToolMessage):
+                    attributes["status"] = output.status
+                    record_tool_payload(call["name"], output.content, attributes)
+                return output
+
+    def _timeout_message(self, call) -> ToolMessage:
+        return ToolMessage(
+            content=(
+                f"Error: {call['name']} did not finish within {self.timeout:g} seconds. "
+                "Try narrower filters or answer with the other results."
+            ),
+            name=call["name"],
+            tool_call_id=call["id"],
+            status="error",
+        )
@@ -1,7 +1,15 @@
+import json
 import pandas as pd
 from datetime import datetime
+from typing import List
 from langchain_core.tools import tool
 
+# SuzieQ columns that hold UNIX epoch timestamps in milliseconds
+TIMESTAMP_COLUMNS = {
+    "timestamp", "bootupTimestamp", "pollTimestamp", "lastBoot", "lastChange",
+    "estdTime", "lastChangeTime", "statusChangeTimestamp", "lastUpdate",
+}
+
 @tool
 def humanize_timestamp_tool(timestamp_ms: int, tz: str = 'UTC') -> str:
     """Converts a UNIX epoch timestamp (in milliseconds) to a human-readable datetime string.
@@ -27,6 +35,59 @@ def humanize_timestamp_tool(timestamp_ms: int, tz: str = 'UTC') -> str:
     except Exception as e:
         return f"Error converting timestamp {timestamp_ms} to timezone {tz}: {str(e)}"
 
+def humanize_timestamps(timestamps_ms, tz: str = 'UTC') -> list:
+    """Converts a sequence of millisecond epoch timestamps in one vectorized pandas operation.
+
+    Args:
+        timestamps_ms: Iterable of UNIX epoch timestamps in milliseconds.
+        tz: The target timezone. Defaults to 'UTC'.
+
+    Returns:
+        A list of strings formatted as YYYY-MM-DD HH:MM:SS ZZZ, with None for values
+        that are missing, not numeric or not positive.
+    """
+    values = pd.to_numeric(pd.Series(list(timestamps_ms), dtype="object"), errors="coerce")
+    values = values.where(values > 0)
+    converted = pd.to_datetime(values, unit="ms", utc=True, errors="coerce").dt.tz_convert(tz)
+    formatted = converted.dt.strftime('%Y-%m-%d %H:%M:%S %Z')
+    return [None if pd.isna(value) else value for value in formatted]
+
+def humanize_frame(df: pd.DataFrame, columns=None, tz: str = 'UTC') -> list:
+    """Replaces epoch millisecond columns of a DataFrame with readable datetimes (in place).
+
+    Args:
+        df: The DataFrame to update.
+        columns: Columns to convert. Defaults to the known SuzieQ timestamp columns present in `df`.
+        tz: The target timezone. Defaults to 'UTC'.
+
+    Returns:
+        The list of converted columns.
+    """
+    if columns is None:
+        columns = [column for column in df.columns if column in TIMESTAMP_COLUMNS]
+    for column in columns:
+        df[column] = humanize_timestamps(df[column], tz)
+    return list(columns)
+
+@tool
+def humanize_timestamps_tool(timestamps_ms: List[int], tz: str = 'UTC') -> str:
+    """Converts many UNIX epoch timestamps (in milliseconds) to human-readable datetime strings in one call.
+
+    Args:
+        timestamps_ms: The UNIX epoch timestamps in milliseconds.
+        tz: The target timezone (e.g., 'America/New_York', 'Europe/London'). Defaults to 'UTC'.
+
+    Returns:
+        A JSON object mapping each timestamp to its datetime string in the specified
+        timezone, formatted as YYYY-MM-DD HH:MM:SS ZZZ (null if it could not be converted).
+        Returns an error message string if the timezone is invalid.
+    """
+    try:
+        converted = humanize_timestamps(timestamps_ms, tz)
+        return json.dumps({str(ts): value for ts, value in zip(timestamps_ms, converted)})
+    except Exception as e:
+        return f"Error converting timestamps to timezone {tz}: {str(e)}"
+
 # Example usage (not part of the tool, just for testing)
 if __name__ == '__main__':
     print(humanize_timestamp_tool.invoke({"timestamp_ms": 1678886400000})) 
@@ -34,4 +95,6 @@ if __name__ == '__main__':
     print(humanize_timestamp_tool.invoke({"timestamp_ms": 1678886400000, "tz": "America/New_York"})) 
     # Expected: 2023-03-15 08:00:00 EDT (or EST depending on date)
     print(humanize_timestamp_tool.invoke({"timestamp_ms": "invalid_input"}))
-    # Expected: Error message 
\ No newline at end of file
+    # Expected: Error message
+    print(humanize_timestamps_tool.invoke({"timestamps_ms": [1678886400000, 1700000000000], "tz": "Europe/London"}))
+    # Expected: {"1678886400000": "2023-03-15 13:20:00 GMT", "1700000000000": "2023-11-14 22:13:20 GMT"} 
\ No newline at end of file
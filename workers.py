@@ -0,0 +1,69 @@
+"""
+Run several Chainlit workers on one host, for use behind a load balancer.
+
+Each worker is a separate `chainlit run` process on its own port, with its own
+graph and MCP session pool. CYBERTRACE_WORKERS tells every worker that the
+deployment has several, so checkpoints and caches go to shared stores (SQLite
+files by default, or Postgres when DATABASE_URL is set; see README). Chainlit
+talks to the browser over a websocket, so the load balancer must keep each
+client on one worker (e.g. nginx `ip_hash` or a sticky cookie). A thread can
+still be resumed on any worker.
+
+Usage:
+    python workers.py --workers 4 --port 8001
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+
+
+def nginx_upstream(host: str, ports: list) -> str:
+    servers = "\n".join(f"    server {host}:{port};" for port in ports)
+    return f"upstream cybertrace {{\n    ip_hash;\n{servers}\n}}"
+
+
+def main(args):
+    if os.getenv("CHECKPOINTER", "").lower() == "memory":
+        sys.exit("CHECKPOINTER=memory cannot be shared by several workers; use sqlite or postgres")
+    ports = [args.port + i for i in range(args.workers)]
+    processes = []
+    for index, port in enumerate(ports):
+        env = {**os.environ, "CYBERTRACE_WORKERS": str(args.workers), "CYBERTRACE_WORKER_ID": str(index)}
+        command = [sys.executable, "-m", "chainlit", "run", args.app, "--headless",
+                   "--host", args.host, "--port", str(port)]
+        processes.append(subprocess.Popen(command, env=env))
+        print(f"[WORKERS INFO] Worker {index} (pid {processes[-1].pid}) on {args.host}:{port}")
+    print("[WORKERS INFO] Load balancer upstream (sticky per client):")
+    print(nginx_upstream(args.host, ports))
+
+    def stop(signum, frame):
+        for process in processes:
+            if process.poll() is None:
+                process.send_signal(signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    try:
+        # Stop everything as soon as any worker exits
+        while all(process.poll() is None for process in processes):
+            time.sleep(1)
+    finally:
+        stop(None, None)
+        for process in processes:
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+    sys.exit(max(process.returncode or 0 for process in processes))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Number of worker processes")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001, help="Port of the first worker")
+    parser.add_argument("--app", default="chainlit_app.py")
+    main(parser.parse_args())